@@ -13,8 +13,10 @@ from config import settings
 # Alembic Config
 config = context.config
 
-# Устанавливаем DATABASE_URL из config.py
-config.set_main_option('sqlalchemy.url', settings.DATABASE_URL)
+# Устанавливаем DATABASE_URL из config.py; `alembic -x url=...` важнее
+# (так бенчмарк накатывает миграции на одноразовую базу).
+database_url = context.get_x_argument(as_dictionary=True).get("url") or settings.DATABASE_URL
+config.set_main_option('sqlalchemy.url', database_url.replace('%', '%%'))
 
 # Настройка логирования
 if config.config_file_name is not None:
@@ -0,0 +1,37 @@
+"""create QR outbox
+
+Revision ID: c3d5e7f9a1b2
+Revises: b7a8f4c2d901
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "c3d5e7f9a1b2"
+down_revision: Union[str, Sequence[str], None] = "b7a8f4c2d901"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE qr_outbox
+        (
+            id            BIGSERIAL PRIMARY KEY,
+            routing_key   VARCHAR(255) NOT NULL,
+            body          BYTEA NOT NULL,
+            message_type  VARCHAR(64) NOT NULL,
+            message_id    VARCHAR(64),
+            priority      SMALLINT,
+            created_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS qr_outbox")
@@ -0,0 +1,40 @@
+"""create scheduled deletions
+
+Revision ID: d4e6f8a0b2c3
+Revises: c3d5e7f9a1b2
+Create Date: 2026-10-19 13:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "d4e6f8a0b2c3"
+down_revision: Union[str, Sequence[str], None] = "c3d5e7f9a1b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE scheduled_deletions
+        (
+            id          BIGSERIAL PRIMARY KEY,
+            chat_id     BIGINT NOT NULL,
+            message_id  BIGINT NOT NULL,
+            delete_at   TIMESTAMPTZ NOT NULL
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_scheduled_deletions_delete_at
+        ON scheduled_deletions (delete_at)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS scheduled_deletions")
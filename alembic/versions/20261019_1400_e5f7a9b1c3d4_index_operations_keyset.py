@@ -0,0 +1,30 @@
+"""index operations for keyset pagination
+
+Revision ID: e5f7a9b1c3d4
+Revises: d4e6f8a0b2c3
+Create Date: 2026-10-19 14:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "e5f7a9b1c3d4"
+down_revision: Union[str, Sequence[str], None] = "d4e6f8a0b2c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Страницы /sv и /h: WHERE balance_id = ... ORDER BY timestamp, id.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_operations_balance_timestamp_id
+        ON operations (balance_id, timestamp DESC, id DESC)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_operations_balance_timestamp_id")
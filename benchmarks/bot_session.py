@@ -0,0 +1,132 @@
+"""Задержка вызовов Bot API при разных настройках сессии aiohttp.
+
+Поднимает локальный фейковый Bot API (aiohttp.web) с задержкой ответа
+``--latency`` и волнами шлёт ``deleteMessage``: ``--rounds`` раз по
+``--concurrency`` одновременных вызовов с паузой ``--pause`` между волнами.
+Сравниваются:
+
+* ``aiogram`` - ``AiohttpSession`` по умолчанию;
+* ``tuned`` - ``services.bot_session.create_bot_session`` (пул ``--pool``);
+* ``small-pool`` - тот же, но пул на 10 соединений;
+* ``no-keepalive`` - соединение на каждый вызов.
+
+Для каждого варианта - p50/p99 задержки вызова, время прогона и сколько
+TCP-соединений увидел сервер.
+
+Запуск из корня проекта::
+
+    python -m benchmarks.bot_session --concurrency 50,200 --rounds 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from benchmarks.dispatcher_load import percentiles
+from services.bot_session import create_bot_session
+
+
+async def start_fake_api(latency: float) -> tuple[web.AppRunner, str, set]:
+    connections: set = set()
+
+    async def handle(request: web.Request) -> web.Response:
+        connections.add(request.transport)
+        await asyncio.sleep(latency)
+        return web.json_response({"ok": True, "result": True})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", connections
+
+
+def make_session(variant: str, api: TelegramAPIServer, pool: int):
+    if variant == "aiogram":
+        return AiohttpSession(api=api)
+    if variant == "tuned":
+        return create_bot_session(api=api, limit=pool)
+    if variant == "small-pool":
+        return create_bot_session(api=api, limit=10)
+    if variant == "no-keepalive":
+        session = create_bot_session(api=api, limit=pool)
+        session._connector_init.pop("keepalive_timeout")
+        session._connector_init["force_close"] = True
+        return session
+    raise ValueError(variant)
+
+
+async def run_variant(variant: str, args, base_url: str, connections: set) -> dict:
+    connections.clear()
+    session = make_session(variant, TelegramAPIServer.from_base(base_url), args.pool)
+    bot = Bot(token="42:BENCHMARK", session=session)
+    latencies: list[float] = []
+
+    async def call(message_id: int) -> None:
+        start = time.perf_counter()
+        await bot.delete_message(chat_id=-100, message_id=message_id)
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    try:
+        for round_no in range(args.rounds):
+            await asyncio.gather(*(
+                call(round_no * args.concurrency + i) for i in range(args.concurrency)
+            ))
+            await asyncio.sleep(args.pause)
+    finally:
+        await session.close()
+
+    busy = time.perf_counter() - started - args.rounds * args.pause
+    return {
+        "latency": percentiles(latencies),
+        "calls_per_second": round(len(latencies) / busy, 1),
+        "connections": len(connections),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="50,200", help="список через запятую")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--pause", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа сервера, сек.")
+    parser.add_argument("--pool", type=int, default=100)
+    parser.add_argument(
+        "--variants",
+        default="aiogram,tuned,small-pool,no-keepalive",
+    )
+    return parser.parse_args(argv)
+
+
+async def run(args) -> dict:
+    runner, base_url, connections = await start_fake_api(args.latency)
+    report = {}
+    try:
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            args.concurrency = concurrency
+            report[concurrency] = {
+                variant: await run_variant(variant, args, base_url, connections)
+                for variant in args.variants.split(",")
+            }
+    finally:
+        await runner.cleanup()
+    return report
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Время холодного старта бота и воркеров по ``python -X importtime``.
+
+Каждая точка входа импортируется в свежем процессе ``--repeat`` раз, в
+отчёт идёт медиана полного времени импорта и самые тяжёлые модули.
+Прогон завершается с кодом 1, если:
+
+* при старте загрузилась тяжёлая библиотека из ``HEAVY_MODULES`` - они
+  должны импортироваться при первом использовании;
+* время старта выросло больше чем на ``--tolerance`` относительно
+  ``--baseline`` (отчёт прошлого прогона на той же машине).
+
+Запуск из корня проекта::
+
+    python -m benchmarks.import_time --baseline benchmarks/results/import-time.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+ENTRYPOINTS = ("main", "qr_worker", "export_worker")
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "openpyxl",
+    "PIL",
+    "selenium",
+    "undetected_chromedriver",
+)
+
+
+@dataclass(slots=True)
+class ImportSample:
+    total_us: int
+    modules: dict[str, int] = field(default_factory=dict)
+
+    def heavy(self) -> list[str]:
+        return sorted(name for name in self.modules if name in HEAVY_MODULES)
+
+    def slowest(self, limit: int = 15) -> list[tuple[str, int]]:
+        return sorted(
+            self.modules.items(),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:limit]
+
+
+def parse_importtime(output: str, entrypoint: str) -> ImportSample:
+    """Разбирает stderr ``-X importtime``: ``self | cumulative | module``."""
+    modules: dict[str, int] = {}
+    total = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            # Заголовок таблицы.
+            continue
+        name = name.strip()
+        modules[name] = int(cumulative)
+        if name == entrypoint:
+            total = int(cumulative)
+    return ImportSample(total_us=total, modules=modules)
+
+
+def measure(entrypoint: str) -> ImportSample:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entrypoint}"],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, "PYTHONPATH": str(PROJECT_ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = "\n".join(
+            line for line in result.stderr.splitlines()
+            if not line.startswith("import time:")
+        )
+        raise RuntimeError(f"Импорт {entrypoint} упал:\n{tail}")
+    return parse_importtime(result.stderr, entrypoint)
+
+
+def run(entrypoints: list[str], repeat: int) -> dict:
+    report = {}
+    for entrypoint in entrypoints:
+        samples = [measure(entrypoint) for _ in range(repeat)]
+        last = samples[-1]
+        report[entrypoint] = {
+            "total_ms": round(
+                statistics.median(sample.total_us for sample in samples) / 1000, 1
+            ),
+            "heavy_modules": last.heavy(),
+            "slowest_ms": {
+                name: round(us / 1000, 1) for name, us in last.slowest()
+            },
+        }
+    return report
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    problems = []
+    for entrypoint, result in report.items():
+        if result["heavy_modules"]:
+            problems.append(
+                f"{entrypoint}: при старте загружены "
+                f"{', '.join(result['heavy_modules'])}"
+            )
+        previous = baseline.get(entrypoint)
+        if previous is None:
+            continue
+        limit = previous["total_ms"] * (1 + tolerance)
+        if result["total_ms"] > limit:
+            problems.append(
+                f"{entrypoint}: {result['total_ms']} мс "
+                f"при базовых {previous['total_ms']} мс (лимит {limit:.0f} мс)"
+            )
+    return problems
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "entrypoints",
+        nargs="*",
+        default=list(ENTRYPOINTS),
+        help="модули для импорта",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="допустимый рост времени старта относительно базового",
+    )
+    parser.add_argument("--baseline", type=Path, help="отчёт прошлого прогона")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=PROJECT_ROOT / "benchmarks" / "results" / "import-time.json",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    baseline = {}
+    if args.baseline is not None and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    report = run(args.entrypoints, args.repeat)
+    problems = find_regressions(report, baseline, args.tolerance)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if problems:
+        print("\n".join(problems), file=sys.stderr)
+        sys.exit(1)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Сохранено: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Скорость сверки выписки с БД (/compare, /compare_exl) на синтетике.
+
+Генерирует выписку и чеки из БД на ``--rows`` операций: часть сумм
+повторяется, часть есть только с одной стороны, время чеков сдвинуто
+относительно выписки. Сравнивает ``services.reconciliation.reconcile`` с
+прежним подсчётом через ``Counter`` и повторные проходы по спискам
+(``--legacy``; на 100k строк занимает минуты).
+
+Запуск из корня проекта::
+
+    python -m benchmarks.reconciliation --rows 100000 --legacy
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from services.reconciliation import reconcile
+
+
+def generate(rows: int, distinct_amounts: int, missing: float, seed: int):
+    rng = random.Random(seed)
+    day = datetime(2026, 1, 12)
+    amounts = [
+        Decimal(rng.randrange(100_00, 500_000_00)) / 100
+        for _ in range(distinct_amounts)
+    ]
+
+    file_operations = []
+    db_operations = []
+    for i in range(rows):
+        amount = rng.choice(amounts)
+        paid_at = day + timedelta(seconds=rng.randrange(86_400))
+        if rng.random() >= missing:
+            file_operations.append({
+                "transaction_id": f"tx-{i}",
+                "amount": float(amount),
+                "datetime": paid_at,
+            })
+        if rng.random() >= missing:
+            db_operations.append({
+                "operation_id": i,
+                "amount": amount,
+                "timestamp": paid_at + timedelta(seconds=rng.randrange(600)),
+            })
+    return file_operations, db_operations
+
+
+def legacy(file_operations, db_operations):
+    file_amounts = Counter([op["amount"] for op in file_operations])
+    db_amounts = Counter([float(op["amount"]) for op in db_operations])
+
+    only_in_file = []
+    only_in_db = []
+    for amount, count in file_amounts.items():
+        db_count = db_amounts.get(amount, 0)
+        if count > db_count:
+            matching_ops = [op for op in file_operations if op["amount"] == amount]
+            only_in_file.extend(matching_ops[:count - db_count])
+    for amount, count in db_amounts.items():
+        file_count = file_amounts.get(amount, 0)
+        if count > file_count:
+            matching_ops = [op for op in db_operations if float(op["amount"]) == amount]
+            only_in_db.extend(matching_ops[:count - file_count])
+    return only_in_file, only_in_db
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--distinct-amounts", type=int, default=20_000)
+    parser.add_argument("--missing", type=float, default=0.02, help="доля пропусков с каждой стороны")
+    parser.add_argument("--window-minutes", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--legacy", action="store_true", help="замерить и прежний алгоритм")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    file_operations, db_operations = generate(
+        args.rows, args.distinct_amounts, args.missing, args.seed
+    )
+
+    by_amount, by_amount_seconds = timed(reconcile, file_operations, db_operations)
+    windowed, windowed_seconds = timed(
+        reconcile,
+        file_operations,
+        db_operations,
+        window=timedelta(minutes=args.window_minutes),
+    )
+    report = {
+        "file_rows": len(file_operations),
+        "db_rows": len(db_operations),
+        "by_amount": {
+            "seconds": round(by_amount_seconds, 3),
+            "matched": len(by_amount.matched),
+            "only_in_file": len(by_amount.only_in_file),
+            "only_in_db": len(by_amount.only_in_db),
+        },
+        "windowed": {
+            "seconds": round(windowed_seconds, 3),
+            "matched": len(windowed.matched),
+            "only_in_file": len(windowed.only_in_file),
+            "only_in_db": len(windowed.only_in_db),
+        },
+    }
+
+    if args.legacy:
+        (only_in_file, only_in_db), legacy_seconds = timed(
+            legacy, file_operations, db_operations
+        )
+        report["legacy"] = {
+            "seconds": round(legacy_seconds, 3),
+            "only_in_file": len(only_in_file),
+            "only_in_db": len(only_in_db),
+        }
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
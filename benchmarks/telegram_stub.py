@@ -0,0 +1,74 @@
+"""Bot API session that answers locally, for benchmarks."""
+
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, File, Message
+
+FAKE_FILE = b"\xff\xd8\xff\xe0 benchmark jpeg"
+
+
+class StubSession(BaseSession):
+    """Отвечает на любые методы Bot API без сети.
+
+    ``latency`` имитирует время ответа Telegram; вызовы считаются по
+    имени метода в ``calls``.
+    """
+
+    def __init__(self, latency: float = 0.0, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1_000_000)
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod,
+        timeout: Optional[int] = None,
+    ) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        returning = method.__returning__
+        if returning is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            if not isinstance(chat_id, int):
+                chat_id = 0
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="supergroup"),
+                text=getattr(method, "text", None),
+            ).as_(bot)
+        if returning is File:
+            return File(
+                file_id=method.file_id,
+                file_unique_id=method.file_id,
+                file_size=len(FAKE_FILE),
+                file_path=f"photos/{method.file_id}.jpg",
+            ).as_(bot)
+        return True
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        self.calls["download"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        yield FAKE_FILE
+
+    async def close(self) -> None:
+        pass
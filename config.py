@@ -43,6 +43,93 @@ class Settings(BaseSettings):
     RABBITMQ_PASSWORD: SecretStr = SecretStr("guest")
     RABBITMQ_VHOST: str = "/"
 
+    # Как часто удалять сообщения, срок которых наступил.
+    DELETION_SCHEDULER_INTERVAL_SECONDS: int = 5
+
+    # Сколько ждать следующий элемент альбома чеков перед обработкой.
+    MEDIA_GROUP_TIMEOUT_MS: int = 500
+
+    # Апдейты одного чата обрабатываются по очереди (актор на чат), разные
+    # чаты - параллельно. Обработчик дольше HOLD не задерживает очередь чата.
+    CHAT_ACTORS_ENABLED: bool = False
+    CHAT_ACTOR_MAILBOX_SIZE: int = 100
+    CHAT_ACTOR_IDLE_SECONDS: int = 60
+    CHAT_ACTOR_HOLD_SECONDS: float = 5
+
+    # Сколько отчётов export_worker строит одновременно.
+    EXPORT_WORKER_CONCURRENCY: int = 1
+
+    # /compare и /compare_exl: операция выписки и чек одной суммы сходятся,
+    # если время отличается не больше окна; 0 - только по сумме.
+    RECONCILE_TIME_WINDOW_MINUTES: int = 0
+
+    # Клиент Bot API: размер пула соединений, keep-alive и кэш DNS;
+    # таймауты отдельно для коротких вызовов, загрузки и скачивания файлов.
+    BOT_API_POOL_SIZE: int = 100
+    BOT_API_KEEPALIVE_SECONDS: float = 60
+    BOT_API_DNS_CACHE_SECONDS: int = 3600
+    BOT_API_TIMEOUT_SECONDS: float = 15
+    BOT_API_UPLOAD_TIMEOUT_SECONDS: float = 120
+    BOT_API_DOWNLOAD_TIMEOUT_SECONDS: float = 120
+    # Свой сервер telegram-bot-api (пусто - api.telegram.org). В режиме
+    # --local файлы чеков берутся с его диска ссылкой, а не по HTTP;
+    # FILES_DIR сервера и путь к нему у бота - если они различаются.
+    BOT_API_SERVER_URL: str = ""
+    BOT_API_LOCAL_MODE: bool = False
+    BOT_API_SERVER_FILES_DIR: str = ""
+    BOT_API_LOCAL_FILES_DIR: str = ""
+    # Порт /metrics и /api_stats бота со статистикой вызовов Bot API; 0 - выключено.
+    BOT_METRICS_PORT: int = 9109
+
+    # Лимиты исходящих сообщений: всего в секунду, в группу в минуту,
+    # в личный чат в секунду.
+    OUTBOUND_GLOBAL_RATE: float = 30
+    OUTBOUND_GROUP_PER_MINUTE: float = 20
+    OUTBOUND_PRIVATE_RATE: float = 1
+
+    # Блокировка event loop дольше порога попадает в /loopstats со стеком.
+    LOOP_STALL_THRESHOLD_MS: int = 250
+    LOOP_STALL_HISTORY: int = 50
+
+    QR_BROWSER_POOL_SIZE: int = 1
+    QR_BROWSER_MAX_JOBS: int = 50
+
+    # Сколько QR один воркер делает одновременно (prefetch и слоты Chrome).
+    QR_WORKER_CONCURRENCY: int = 1
+    # True - во всём кластере работает один потребитель qr.generate.
+    # Смена значения требует удалить очередь: RabbitMQ не даёт
+    # переобъявить её с другими аргументами.
+    QR_SINGLE_ACTIVE_CONSUMER: bool = True
+    # Не запускать параллельно два QR на одном Р/С.
+    QR_SERIALIZE_TABS: bool = False
+    # Сколько публикаций ждут подтверждения RabbitMQ одновременно.
+    QR_PUBLISH_WINDOW: int = 100
+    QR_OUTBOX_FLUSH_SECONDS: int = 10
+    QR_METRICS_INTERVAL_SECONDS: int = 60
+    # Сколько заданий воркер держит в локальной очереди сверх параллельных:
+    # для них показываются позиция и примерное время ожидания.
+    QR_WAITING_BUFFER: int = 20
+    QR_PROGRESS_INTERVAL_SECONDS: int = 10
+    # Одинаковые QR (чат, сумма, Р/С), запрошенные в пределах окна, получают
+    # один результат; 0 - не склеивать.
+    QR_COALESCE_WINDOW_SECONDS: int = 15
+    # HTTP /stats и /metrics воркера; 0 - не поднимать.
+    QR_METRICS_PORT: int = 9108
+    QR_METRICS_URL: str = "http://qr_worker:9108"
+
+    # selenium - браузер; http - прямые запросы к агенту (Selenium - запасной).
+    QR_BACKEND: str = "selenium"
+    QR_API_URL: str = ""
+    QR_HTTP_TIMEOUT_SECONDS: int = 15
+
+    # Кэш готовых QR для частых сумм. TTL должен быть меньше времени
+    # жизни QR у агента, иначе клиент получит уже просроченный код.
+    QR_CACHE_ENABLED: bool = False
+    QR_CACHE_TTL_SECONDS: int = 600
+    QR_CACHE_PER_AMOUNT: int = 1
+    QR_CACHE_HOT_AMOUNTS: int = 5
+    QR_CACHE_REFILL_INTERVAL_SECONDS: int = 30
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
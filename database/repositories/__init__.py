@@ -4,6 +4,8 @@ from .user_repo import UserRepo
 from .balance_repo import BalanceRepo
 from .rate_repo import RateRepo
 from .qr_settings_repo import QRSettingsRepo
+from .qr_outbox_repo import QROutboxRepo
+from .scheduled_deletion_repo import ScheduledDeletionRepo
 
 __all__ = [
     "ChatRepo",
@@ -12,4 +14,6 @@ __all__ = [
     "BalanceRepo",
     "RateRepo",
     "QRSettingsRepo",
+    "QROutboxRepo",
+    "ScheduledDeletionRepo",
 ]
@@ -37,30 +37,6 @@ class OperationRepo(BaseRepository):
         )
         return operation_id
 
-    @classmethod
-    async def get_history(cls, balance_id: int, limit: int = 10) -> List[dict]:
-        results = await cls._fetch(
-            """
-                                   SELECT operation_id,
-                                          user_id,
-                                          username,
-                                          operation_type,
-                                          amount,
-                                          currency,
-                                          exchange_rate,
-                                          TO_CHAR(timestamp, 'YYYY-MM-DD HH24:MI:SS') as timestamp,
-                                          description
-                                   FROM operations
-                                   WHERE balance_id = $1
-                                     AND operation_type != 'пополнение_руб_чек'
-                                   ORDER BY timestamp DESC
-                                   LIMIT $2
-                                   """,
-            balance_id,
-            limit,
-        )
-        return [dict(row) for row in results]
-
     @classmethod
     async def get_operation(cls, operation_id: str) -> Optional[dict]:
         row = await cls._fetchrow(
@@ -225,18 +201,139 @@ class OperationRepo(BaseRepository):
         )
         return [dict(row) for row in results]
 
+    @classmethod
+    async def _keyset_page(
+        cls,
+        columns: str,
+        where: str,
+        params: list,
+        limit: int,
+        before: tuple[datetime, int] | None = None,
+        after: tuple[datetime, int] | None = None,
+    ) -> tuple[List[dict], bool]:
+        """Страница операций по (timestamp, id) от новых к старым.
+
+        Строки с ``timestamp IS NULL`` курсор не выражает - ``where`` должен
+        их отсекать.
+
+        ``before`` - последняя строка текущей страницы (листаем к старым),
+        ``after`` - первая (листаем к новым). Второй элемент ответа - есть
+        ли ещё строки в направлении листания.
+        """
+        order = "DESC"
+        if before is not None:
+            where += f" AND (timestamp, id) < (${len(params) + 1}, ${len(params) + 2})"
+            params = [*params, *before]
+        elif after is not None:
+            where += f" AND (timestamp, id) > (${len(params) + 1}, ${len(params) + 2})"
+            params = [*params, *after]
+            order = "ASC"
+
+        results = await cls._fetch(
+            f"""
+            SELECT {columns}
+            FROM operations
+            WHERE {where}
+            ORDER BY timestamp {order}, id {order}
+            LIMIT ${len(params) + 1}
+            """,
+            *params,
+            limit + 1,
+        )
+        rows = [dict(row) for row in results[:limit]]
+        if order == "ASC":
+            rows.reverse()
+        return rows, len(results) > limit
+
+    @classmethod
+    async def get_checks_page(
+        cls,
+        balance_id: int,
+        start_date: datetime,
+        end_date: datetime,
+        limit: int,
+        before: tuple[datetime, int] | None = None,
+        after: tuple[datetime, int] | None = None,
+    ) -> tuple[List[dict], bool]:
+        return await cls._keyset_page(
+            "id, operation_id, username, amount, timestamp, description, exchange_rate",
+            """balance_id = $1
+              AND operation_type = 'пополнение_руб_чек'
+              AND timestamp >= $2
+              AND timestamp < $3""",
+            [balance_id, start_date, end_date],
+            limit,
+            before,
+            after,
+        )
+
+    @classmethod
+    async def get_checks_summary(
+        cls, balance_id: int, start_date: datetime, end_date: datetime
+    ) -> dict:
+        row = await cls._fetchrow(
+            """
+            SELECT COUNT(*) AS count, COALESCE(SUM(amount), 0) AS total
+            FROM operations
+            WHERE balance_id = $1
+              AND operation_type = 'пополнение_руб_чек'
+              AND timestamp >= $2
+              AND timestamp < $3
+            """,
+            balance_id,
+            start_date,
+            end_date,
+        )
+        return dict(row)
+
+    @classmethod
+    async def get_history_page(
+        cls,
+        balance_id: int,
+        limit: int,
+        before: tuple[datetime, int] | None = None,
+        after: tuple[datetime, int] | None = None,
+    ) -> tuple[List[dict], bool]:
+        return await cls._keyset_page(
+            """id, operation_id, user_id, username, operation_type, amount,
+               currency, exchange_rate, timestamp, description""",
+            """balance_id = $1
+              AND operation_type != 'пополнение_руб_чек'
+              AND timestamp IS NOT NULL""",
+            [balance_id],
+            limit,
+            before,
+            after,
+        )
+
+    @classmethod
+    async def count_history(cls, balance_id: int) -> int:
+        return await cls._fetchval(
+            """
+            SELECT COUNT(*)
+            FROM operations
+            WHERE balance_id = $1
+              AND operation_type != 'пополнение_руб_чек'
+              AND timestamp IS NOT NULL
+            """,
+            balance_id,
+        )
+
     @classmethod
     async def get_all_checks_by_date(
             cls, start_date: datetime, end_date: datetime
     ) -> List[dict]:
         results = await cls._fetch(
             """
-            SELECT operation_id, balance_id, username, amount, timestamp, description
-            FROM operations
-            WHERE operation_type = 'пополнение_руб_чек'
-              AND timestamp >= $1
-              AND timestamp < $2
-            ORDER BY timestamp DESC
+            SELECT o.operation_id, o.balance_id, o.username, o.amount,
+                   o.timestamp, o.description,
+                   COALESCE(b.name, 'Не установлено') AS contractor
+            FROM operations o
+                     LEFT JOIN balances b ON b.id = o.balance_id
+            WHERE o.operation_type = 'пополнение_руб_чек'
+              AND o.timestamp >= $1
+              AND o.timestamp < $2
+            ORDER BY o.timestamp DESC
             """,
             start_date,
             end_date,
@@ -267,6 +364,30 @@ class OperationRepo(BaseRepository):
         result = await cls._fetchval(query, *params)
         return float(result)
 
+    @classmethod
+    async def get_commissions_by_balance(
+            cls,
+            start_date: datetime | None = None,
+            end_date: datetime | None = None
+    ) -> dict:
+        """Сумма комиссий по каждому балансу одним запросом."""
+        query = """
+                SELECT balance_id, SUM(amount) AS total
+                FROM operations
+                WHERE operation_type = 'комиссия'
+                """
+
+        params = []
+
+        if start_date and end_date:
+            query += " AND timestamp >= $1 AND timestamp < $2"
+            params.extend([start_date, end_date])
+
+        query += " GROUP BY balance_id"
+
+        results = await cls._fetch(query, *params)
+        return {row["balance_id"]: float(row["total"]) for row in results}
+
     @classmethod
     async def update_operation(
             cls,
@@ -0,0 +1,46 @@
+from typing import List, Optional
+
+import asyncpg
+
+from database.repositories.base import BaseRepository
+
+
+class QROutboxRepo(BaseRepository):
+    """Messages that could not be published to RabbitMQ."""
+
+    @classmethod
+    async def add(
+        cls,
+        routing_key: str,
+        body: bytes,
+        message_type: str,
+        message_id: Optional[str],
+        priority: Optional[int],
+    ) -> None:
+        await cls._execute(
+            """
+            INSERT INTO qr_outbox (routing_key, body, message_type, message_id, priority)
+            VALUES ($1, $2, $3, $4, $5)
+            """,
+            routing_key,
+            body,
+            message_type,
+            message_id,
+            priority,
+        )
+
+    @classmethod
+    async def fetch_batch(cls, limit: int) -> List[asyncpg.Record]:
+        return await cls._fetch(
+            """
+            SELECT id, routing_key, body, message_type, message_id, priority
+            FROM qr_outbox
+            ORDER BY id
+            LIMIT $1
+            """,
+            limit,
+        )
+
+    @classmethod
+    async def delete(cls, ids: List[int]) -> None:
+        await cls._execute("DELETE FROM qr_outbox WHERE id = ANY($1::bigint[])", ids)
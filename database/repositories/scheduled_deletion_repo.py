@@ -0,0 +1,72 @@
+from typing import List, Sequence
+
+import asyncpg
+
+from database.repositories.base import BaseRepository
+
+
+class ScheduledDeletionRepo(BaseRepository):
+    """Messages that must be deleted from Telegram chats later."""
+
+    @classmethod
+    async def schedule(
+        cls,
+        chat_id: int,
+        message_ids: Sequence[int],
+        delay_seconds: float,
+    ) -> None:
+        await cls._execute(
+            """
+            INSERT INTO scheduled_deletions (chat_id, message_id, delete_at)
+            SELECT $1, message_id, NOW() + make_interval(secs => $3)
+            FROM unnest($2::bigint[]) AS message_id
+            """,
+            chat_id,
+            list(message_ids),
+            float(delay_seconds),
+        )
+
+    @classmethod
+    async def claim_due(cls, limit: int, lease_seconds: float) -> List[asyncpg.Record]:
+        """Leases due rows so that several processes can share them.
+
+        A claimed row is pushed ``lease_seconds`` into the future instead of
+        being removed: if the process dies before ``delete`` the row becomes
+        due again and another scheduler picks it up.
+        """
+        return await cls._fetch(
+            """
+            UPDATE scheduled_deletions
+            SET delete_at = NOW() + make_interval(secs => $2)
+            WHERE id IN (
+                SELECT id
+                FROM scheduled_deletions
+                WHERE delete_at <= NOW()
+                ORDER BY delete_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, chat_id, message_id
+            """,
+            limit,
+            float(lease_seconds),
+        )
+
+    @classmethod
+    async def reschedule(cls, ids: Sequence[int], delay_seconds: float) -> None:
+        await cls._execute(
+            """
+            UPDATE scheduled_deletions
+            SET delete_at = NOW() + make_interval(secs => $2)
+            WHERE id = ANY($1::bigint[])
+            """,
+            list(ids),
+            float(delay_seconds),
+        )
+
+    @classmethod
+    async def delete(cls, ids: Sequence[int]) -> None:
+        await cls._execute(
+            "DELETE FROM scheduled_deletions WHERE id = ANY($1::bigint[])",
+            list(ids),
+        )
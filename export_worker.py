@@ -0,0 +1,214 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.types import BufferedInputFile
+from aio_pika.abc import AbstractIncomingMessage
+
+from config import settings
+from database.connection import close_db, init_db
+from services.bot_session import create_bot_session
+from services.export_queue import (
+    COMPARE_EXCEL,
+    COMPARE_TXT,
+    EXPORT,
+    EXPORT_ALL,
+    ExportJob,
+    ExportQueueClient,
+    declare_export_queues,
+)
+from services.exports import (
+    ExportError,
+    ExportResult,
+    build_chat_export,
+    build_excel_comparison,
+    build_full_export,
+    build_txt_comparison,
+)
+from utils.keyboards import get_delete_keyboard
+
+
+logger = logging.getLogger(__name__)
+# Отчёт, который не удалось отправить из-за сети, строится заново не больше
+# MAX_ATTEMPTS раз с паузой RETRY_DELAY_SECONDS * номер попытки.
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 10
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramRetryAfter)
+
+
+class ExportWorker:
+    """Строит отчёты из очереди export.build и отправляет их в чат.
+
+    Ошибки построения и отказы Telegram (бота удалили из чата, файл не
+    принят) показываются в статусном сообщении или пишутся в лог, и задание
+    подтверждается. Сетевые ошибки и flood control откладывают задание через
+    export.build.retry с увеличенным ``attempt``, пока не исчерпано
+    ``MAX_ATTEMPTS``; слот воркера на время паузы не занят.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        queue_client: ExportQueueClient,
+        *,
+        concurrency: int = 1,
+    ) -> None:
+        self.bot = bot
+        self.queue_client = queue_client
+        self.concurrency = concurrency
+
+    async def run(self) -> None:
+        if self.queue_client.connection is None:
+            raise RuntimeError("RabbitMQ connection is not initialized")
+
+        channel = await self.queue_client.connection.channel()
+        await channel.set_qos(prefetch_count=self.concurrency)
+        _, queue = await declare_export_queues(channel)
+        await queue.consume(self.process_job, no_ack=False)
+        logger.info("Export worker запущен, параллельных отчетов: %s", self.concurrency)
+        await asyncio.Future()
+
+    async def process_job(self, message: AbstractIncomingMessage) -> None:
+        async with message.process(requeue=True):
+            try:
+                job = ExportJob.from_bytes(message.body)
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.error("Некорректное задание отчета: %s", exc)
+                return
+
+            logger.info("Отчет %s job_id=%s chat_id=%s", job.kind, job.job_id, job.chat_id)
+            try:
+                await self.handle(job)
+            except TRANSIENT_ERRORS as exc:
+                await self._retry_later(job, exc)
+
+    async def handle(self, job: ExportJob) -> None:
+        try:
+            result = await self.build(job)
+        except ExportError as exc:
+            await self._edit_status(job, str(exc))
+            return
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as exc:
+            logger.exception("Не удалось построить отчет job_id=%s", job.job_id)
+            await self._edit_status(job, f"❌ Ошибка при создании отчета: {exc}")
+            return
+
+        await self._send_result(job, result)
+
+    async def _retry_later(self, job: ExportJob, exc: TelegramAPIError) -> None:
+        if job.attempt + 1 >= MAX_ATTEMPTS:
+            logger.error(
+                "Отчет job_id=%s не отправлен за %s попыток: %s",
+                job.job_id,
+                MAX_ATTEMPTS,
+                exc,
+            )
+            await self._edit_status(job, "❌ Не удалось отправить отчет, попробуйте позже")
+            return
+
+        job.attempt += 1
+        if isinstance(exc, TelegramRetryAfter):
+            delay = exc.retry_after
+        else:
+            delay = RETRY_DELAY_SECONDS * job.attempt
+        logger.warning(
+            "Повтор отчета job_id=%s через %s сек.: %s", job.job_id, delay, exc
+        )
+        await self.queue_client.publish_job(job, delay=delay)
+
+    async def build(self, job: ExportJob) -> ExportResult:
+        start_date, end_date = job.period()
+        if job.kind == EXPORT:
+            return await build_chat_export(job.chat_id, start_date, end_date)
+        if job.kind == EXPORT_ALL:
+            return await build_full_export(start_date, end_date)
+
+        content = await self.bot.download(job.file_id)
+        if job.kind == COMPARE_TXT:
+            return await build_txt_comparison(content.read(), start_date, end_date)
+        if job.kind == COMPARE_EXCEL:
+            return await build_excel_comparison(content.read(), start_date, end_date)
+        raise ValueError(f"Unknown export kind: {job.kind}")
+
+    async def _send_result(self, job: ExportJob, result: ExportResult) -> None:
+        if result.document is None:
+            await self._edit_status(job, result.text, parse_mode=result.parse_mode)
+            return
+
+        try:
+            await self.bot.send_document(
+                chat_id=job.chat_id,
+                document=BufferedInputFile(result.document, filename=result.filename),
+                caption=result.text,
+                parse_mode=result.parse_mode,
+                reply_markup=get_delete_keyboard(),
+            )
+        except TRANSIENT_ERRORS:
+            raise
+        except TelegramAPIError as exc:
+            logger.warning("Telegram не принял отчет job_id=%s: %s", job.job_id, exc)
+            await self._edit_status(job, f"❌ Не удалось отправить отчет: {exc.message}")
+            return
+
+        # Документ уже в чате - дальше ничего не повторяем.
+        try:
+            await self.bot.delete_message(
+                chat_id=job.chat_id,
+                message_id=job.status_message_id,
+            )
+        except TelegramAPIError as exc:
+            logger.debug("Статус отчета не удален job_id=%s: %s", job.job_id, exc)
+
+    async def _edit_status(
+        self,
+        job: ExportJob,
+        text: str,
+        parse_mode: str | None = None,
+    ) -> None:
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=job.chat_id,
+                message_id=job.status_message_id,
+                parse_mode=parse_mode,
+                reply_markup=get_delete_keyboard(),
+            )
+        except TelegramAPIError as exc:
+            logger.info(
+                "Статус отчета недоступен job_id=%s: %s",
+                job.job_id,
+                exc,
+            )
+
+
+async def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    bot = Bot(
+        token=settings.BOT_TOKEN.get_secret_value(),
+        session=create_bot_session(),
+    )
+    queue_client = ExportQueueClient()
+    worker = ExportWorker(
+        bot,
+        queue_client,
+        concurrency=max(settings.EXPORT_WORKER_CONCURRENCY, 1),
+    )
+
+    try:
+        await init_db()
+        await queue_client.connect()
+        await worker.run()
+    finally:
+        await queue_client.close()
+        await close_db()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
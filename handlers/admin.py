@@ -4,17 +4,24 @@ import re
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery
+from aiogram.methods import SendMessage, SendPhoto
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.utils.markdown import html_decoration as hd
 
-from config import settings
+from config import logger, settings
 from database.repositories import ChatRepo, UserRepo
 from database.repositories.balance_repo import BalanceRepo
 from filters.admin import IsAdminFilter
+from handlers.qr import fetch_worker_stats
+from services.api_metrics import api_metrics
+from services.loop_monitor import LoopMonitor, loop_monitor
+from services.outbound import PRIORITY_BULK, get_outbound
 from states import NewsletterStates
 
 from utils.helpers import delete_message, temp_msg
 from utils.keyboards import get_delete_keyboard
+from utils.messages import pack_messages
 
 router = Router(name="admin")
 
@@ -337,41 +344,40 @@ async def send_newsletter(message: Message, state: FSMContext):
         f"Всего чатов: {len(all_chats)}"
     )
 
-    success_count = 0
-    failed_count = 0
-    failed_chats = []
+    if content_type == "photo":
+        methods = [
+            SendPhoto(
+                chat_id=chat['chat_id'],
+                photo=data['file_id'],
+                caption=data['caption'],
+                parse_mode="HTML"
+            )
+            for chat in all_chats
+        ]
+    else:
+        methods = [
+            SendMessage(chat_id=chat['chat_id'], text=data['text'], parse_mode="HTML")
+            for chat in all_chats
+        ]
+
+    # Чаты обслуживаются параллельно, темп задают лимиты очереди отправки.
+    outbound = get_outbound()
+    results = await asyncio.gather(
+        *(outbound.submit(method, PRIORITY_BULK) for method in methods),
+        return_exceptions=True,
+    )
 
-    for chat in all_chats:
-        try:
-            if content_type == "photo":
-                await message.bot.send_photo(
-                    chat_id=chat['chat_id'],
-                    photo=data['file_id'],
-                    caption=data['caption'],
-                    parse_mode="HTML"
-                )
-            # elif content_type == "document":
-            #     await message.bot.send_document(
-            #         chat_id=chat['chat_id'],
-            #         document=data['file_id'],
-            #         caption=data['caption'],
-            #         parse_mode="HTML"
-            #     )
-            else:
-                await message.bot.send_message(
-                    chat_id=chat['chat_id'],
-                    text=data['text'],
-                    parse_mode="HTML"
-                )
-            success_count += 1
-            await asyncio.sleep(0.05)
-        except Exception as e:
-            failed_count += 1
-            failed_chats.append({
-                'chat_id': chat['chat_id'],
-                'contractor': chat.get('contractor_name', 'Неизвестно'),
-                'error': str(e)
-            })
+    failed_chats = [
+        {
+            'chat_id': chat['chat_id'],
+            'contractor': chat.get('contractor_name', 'Неизвестно'),
+            'error': str(result)
+        }
+        for chat, result in zip(all_chats, results)
+        if isinstance(result, Exception)
+    ]
+    failed_count = len(failed_chats)
+    success_count = len(all_chats) - failed_count
 
     try:
         await progress_msg.delete()
@@ -392,15 +398,16 @@ async def send_newsletter(message: Message, state: FSMContext):
         f"• Всего чатов: {len(all_chats)}"
     )
 
+    entries = [report]
     if failed_chats:
-        report += "\n\n❌ <b>Не удалось отправить:</b>\n"
-        for chat in failed_chats[:5]:
-            report += f"• {chat['contractor']} (ID: {chat['chat_id']})\n"
-
-        if len(failed_chats) > 5:
-            report += f"... и ещё {len(failed_chats) - 5}"
+        entries.append("\n❌ <b>Не удалось отправить:</b>")
+        entries.extend(
+            f"• {hd.quote(str(chat['contractor']))} (ID: {chat['chat_id']})"
+            for chat in failed_chats
+        )
 
-    await message.answer(report, parse_mode="HTML", reply_markup=get_delete_keyboard())
+    for text in pack_messages(entries, separator="\n"):
+        await message.answer(text, parse_mode="HTML", reply_markup=get_delete_keyboard())
     await state.clear()
 
 
@@ -455,6 +462,99 @@ async def cmd_remove_general(message: Message):
         await temp_msg(message, "❌ Ошибка при снятии статуса ГКА")
 
 
+def format_loop_stats(monitor: LoopMonitor) -> str:
+    lag = monitor.lag.summary()
+    lines = [
+        "🩺 <b>Event loop</b>",
+        f"Лаг p50 / p99 / max: {lag['p50'] * 1000:.0f} / "
+        f"{lag['p99'] * 1000:.0f} / {lag['max'] * 1000:.0f} мс",
+        f"Блокировок в буфере: {len(monitor.stalls)}",
+        "",
+        "<b>Обработчики</b> (вызовов, среднее / max мс, блокировок):",
+    ]
+    for name, stats in monitor.slowest_handlers():
+        lines.append(
+            f"<code>{hd.quote(name.rsplit('.', 1)[-1])}</code>: {stats.calls}, "
+            f"{stats.total / stats.calls * 1000:.0f} / {stats.max * 1000:.0f}, "
+            f"{stats.stalls}"
+        )
+    return "\n".join(lines)
+
+
+def format_loop_stalls(monitor: LoopMonitor) -> str:
+    return "\n\n".join(
+        f"{stall.started_at:%d.%m.%Y %H:%M:%S} "
+        f"{stall.blocked * 1000:.0f} мс "
+        f"{stall.handler or 'вне обработчика'}\n{stall.stack}"
+        for stall in reversed(monitor.stalls)
+    )
+
+
+@router.message(Command("loopstats"))
+async def cmd_loop_stats(message: Message):
+    await delete_message(message)
+    if await is_not_super_admin(message):
+        return
+
+    await message.answer(
+        format_loop_stats(loop_monitor),
+        parse_mode="HTML",
+        reply_markup=get_delete_keyboard(),
+    )
+    if loop_monitor.stalls:
+        await message.answer_document(
+            BufferedInputFile(
+                format_loop_stalls(loop_monitor).encode(),
+                filename="loop_stalls.txt",
+            ),
+            reply_markup=get_delete_keyboard(),
+        )
+
+
+def format_api_stats(title: str, stats: dict, limit: int = 10) -> str:
+    # Методы с наибольшим суммарным ожиданием; long polling не в счёт.
+    methods = sorted(
+        ((name, item) for name, item in stats["methods"].items() if name != "getUpdates"),
+        key=lambda pair: pair[1]["seconds"],
+        reverse=True,
+    )[:limit]
+    lines = [
+        f"📡 <b>{title}</b>",
+        f"Скачано: {stats['downloads']} файлов, {stats['bytes_down'] / 1024:.0f} КБ",
+        "",
+        "<b>Методы</b> (вызовов, p50 / p99 мс, ошибок, 429 / пауза сек., выгружено КБ):",
+    ]
+    for name, item in methods:
+        latency = item["latency"]
+        lines.append(
+            f"<code>{hd.quote(name)}</code>: {item['calls']}, "
+            f"{latency['p50'] * 1000:.0f} / {latency['p99'] * 1000:.0f}, "
+            f"{item['errors']}, {item['flood']} / {item['retry_after']:g}, "
+            f"{item['bytes_up'] / 1024:.0f}"
+        )
+    return "\n".join(lines)
+
+
+@router.message(Command("apistats"))
+async def cmd_api_stats(message: Message):
+    await delete_message(message)
+    if await is_not_super_admin(message):
+        return
+
+    texts = [format_api_stats("Bot API: бот", api_metrics.snapshot())]
+    try:
+        texts.append(format_api_stats("Bot API: QR-воркер", await fetch_worker_stats("/api_stats")))
+    except Exception:
+        logger.warning("Не удалось получить статистику Bot API QR-воркера", exc_info=True)
+        texts.append("📡 <b>Bot API: QR-воркер</b>\nВоркер не отвечает")
+
+    await message.answer(
+        "\n\n".join(texts),
+        parse_mode="HTML",
+        reply_markup=get_delete_keyboard(),
+    )
+
+
 async def is_not_super_admin(message: Message) -> bool:
     if message.from_user.id not in settings.SUPER_ADMIN_ID:
         await temp_msg(message, "❌ У вас нет прав для этой команды")
@@ -2,6 +2,7 @@ import asyncio
 import os
 import re
 from datetime import datetime
+from weakref import WeakValueDictionary
 import logging
 
 from aiogram import F, Router
@@ -14,9 +15,13 @@ from aiogram.utils.markdown import html_decoration as hd
 from config import settings
 from database.repositories import ChatRepo, OperationRepo, BalanceRepo
 from filters.admin import IsAdminFilter
+from services.outbound import get_outbound
+from services.telegram_files import save_telegram_file
 from states import CheckStates
 from utils.helpers import delete_message, temp_msg, format_amount
 from utils.keyboards import get_delete_keyboard
+from utils.media_group import MediaGroupAggregator
+from utils.messages import pack_messages
 
 router = Router()
 
@@ -25,6 +30,9 @@ os.makedirs(FILES_DIR, exist_ok=True)
 
 logger = logging.getLogger(__name__)
 
+media_groups = MediaGroupAggregator(idle_timeout=settings.MEDIA_GROUP_TIMEOUT_MS / 1000)
+_queue_locks: WeakValueDictionary[tuple[int, int], asyncio.Lock] = WeakValueDictionary()
+
 
 # ============= /check С ФОТО И ФИО =============
 
@@ -93,13 +101,12 @@ async def cmd_check_without_photo(message: Message, state: FSMContext):
         results_queue=[],
         processing=False,
         initial_msg_id=bot_message.message_id,
-        waiting_for_more=False,
     )
 
 
 @router.message(CheckStates.waiting_for_file, F.photo | F.document)
 async def receive_file_after_check(message: Message, state: FSMContext):
-    await add_to_queue(message, state)
+    await receive_files(message, state)
 
 
 # ============= ФОТО БЕЗ КОМАНДЫ =============
@@ -109,10 +116,16 @@ async def receive_file_after_check(message: Message, state: FSMContext):
 async def handle_photo_without_command(message: Message, state: FSMContext):
     if message.caption and "/check" in message.caption:
         return
-    await add_to_queue(message, state)
+    await receive_files(message, state)
+
+
+async def receive_files(message: Message, state: FSMContext):
+    messages = await media_groups.collect(message)
+    if messages:
+        await add_to_queue(messages, state)
 
 
-async def add_to_queue(message: Message, state: FSMContext):
+def queue_item(message: Message) -> dict:
     if message.photo:
         file_id = message.photo[-1].file_id
         file_type = "фото"
@@ -126,48 +139,76 @@ async def add_to_queue(message: Message, state: FSMContext):
             else "file"
         )
 
-    data = await state.get_data()
-    queue = data.get("queue", [])
-    processing = data.get("processing", False)
-    waiting_for_more = data.get("waiting_for_more", False)
-
-    queue.append({
+    return {
         "file_id": file_id,
         "file_type": file_type,
         "file_ext": file_ext,
         "msg_id": message.message_id,
         "user_id": message.from_user.id,
         "username": message.from_user.username or message.from_user.first_name,
-    })
+    }
 
-    await state.update_data(queue=queue, last_file_time=datetime.now())
-    await state.set_state(CheckStates.waiting_for_amount)
 
-    if processing or waiting_for_more:
-        return
+def queue_lock(state: FSMContext) -> asyncio.Lock:
+    """Блокировка queue одного пользователя в чате.
 
-    await state.update_data(waiting_for_more=True)
-    asyncio.create_task(
-        start_processing_after_delay(message.bot, message.chat.id, state)
-    )
+    Чтение и запись queue в FSM не атомарны: без блокировки параллельные
+    обработчики теряют файлы друг друга.
+    """
+    key = (state.key.chat_id, state.key.user_id)
+    return _queue_locks.setdefault(key, asyncio.Lock())
 
 
-async def start_processing_after_delay(bot, chat_id, state: FSMContext):
-    await asyncio.sleep(1)
+async def add_to_queue(messages: list[Message], state: FSMContext):
+    first = messages[0]
 
-    data = await state.get_data()
+    async with queue_lock(state):
+        data = await state.get_data()
+        queue = data.get("queue", [])
+        queue.extend(queue_item(message) for message in messages)
+
+        update = {"queue": queue}
+        if "total_files" in data:
+            update["total_files"] = data["total_files"] + len(messages)
+        await state.update_data(**update)
+        await state.set_state(CheckStates.waiting_for_amount)
 
+        if data.get("processing", False):
+            return
+        await state.update_data(processing=True, initial_msg_id=None)
+
+    await start_processing(first.bot, first.chat.id, state, data.get("initial_msg_id"))
+
+
+async def drop_from_queue(
+    state: FSMContext,
+    msg_id: int,
+    result: dict | None = None,
+    **update,
+) -> bool:
+    """Убирает обработанный файл из queue по ``msg_id``.
+
+    Состояние перечитывается под блокировкой - пока файл обрабатывался, в
+    queue могли добавиться новые. Возвращает False, если файла там уже нет.
+    """
+    async with queue_lock(state):
+        data = await state.get_data()
+        queue = data.get("queue", [])
+        remaining = [item for item in queue if item["msg_id"] != msg_id]
+        if result is not None:
+            update["results_queue"] = [*data.get("results_queue", []), result]
+        await state.update_data(queue=remaining, **update)
+    return len(remaining) < len(queue)
+
+
+async def start_processing(bot, chat_id, state: FSMContext, initial_msg_id: int | None):
     try:
-        initial_msg_id = data.get("initial_msg_id")
         if initial_msg_id:
             await bot.delete_message(chat_id, initial_msg_id)
     except Exception:
         pass
 
-    await state.update_data(
-        processing=True, waiting_for_more=False, initial_msg_id=None
-    )
-
+    data = await state.get_data()
     queue = data.get("queue", [])
 
     if queue:
@@ -184,7 +225,6 @@ async def start_processing_after_delay(bot, chat_id, state: FSMContext):
             processing_msg_id=processing_msg_id,
             bot_messages_to_delete=bot_messages
         )
-        await asyncio.sleep(1)
 
     await process_next_in_queue(bot, chat_id, state)
 
@@ -236,20 +276,21 @@ async def process_next_in_queue(bot, chat_id, state: FSMContext):
                 reply_markup=builder.as_markup(),
             )
 
-        bot_messages = data.get('bot_messages_to_delete', [])
-        bot_messages.append(bot_msg.message_id)
+        async with queue_lock(state):
+            data = await state.get_data()
+            bot_messages = data.get('bot_messages_to_delete', [])
+            bot_messages.append(bot_msg.message_id)
 
-        await state.update_data(
-            current_bot_msg=bot_msg.message_id,
-            current_file=current_file,
-            total_files=total_files,
-            bot_messages_to_delete=bot_messages
-        )
+            await state.update_data(
+                current_bot_msg=bot_msg.message_id,
+                current_file=current_file,
+                total_files=data.get("total_files", total_files),
+                bot_messages_to_delete=bot_messages
+            )
 
     except Exception as e:
         print(f"Ошибка отправки: {e}")
-        queue.pop(0)
-        await state.update_data(queue=queue)
+        await drop_from_queue(state, current_file["msg_id"])
         await process_next_in_queue(bot, chat_id, state)
 
 
@@ -321,17 +362,13 @@ async def receive_amount_and_payer(message: Message, state: FSMContext):
 
         try:
             bot = message.bot
-            file = await bot.get_file(file_id)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"check_{chat_id}_{timestamp}.{file_ext}"
             filepath = os.path.join(FILES_DIR, filename)
-            await bot.download_file(file.file_path, filepath)
+            await save_telegram_file(bot, file_id, filepath)
         except Exception as e:
             await temp_msg(message, f"❌ Ошибка сохранения: {e}")
-            queue = data.get("queue", [])
-            if queue:
-                queue.pop(0)
-            await state.update_data(queue=queue, bot_messages_to_delete=[])
+            await drop_from_queue(state, current_file["msg_id"], bot_messages_to_delete=[])
             await process_next_in_queue(message.bot, chat_id, state)
             return
 
@@ -354,24 +391,19 @@ async def receive_amount_and_payer(message: Message, state: FSMContext):
         safe_username = hd.quote(username)
         safe_contractor = hd.quote(balance["name"])
 
-        results_queue = data.get("results_queue", [])
-        results_queue.append({
+        result = {
             "file_type": file_type,
             "op_id": op_id,
             "payer": safe_payer,
             "amount": amount,
             "username": safe_username,
             "contractor": safe_contractor,
-        })
-
-        queue = data.get("queue", [])
-        if queue:
-            queue.pop(0)
-
-        await state.update_data(
-            queue=queue,
-            results_queue=results_queue,
-            bot_messages_to_delete=[]
+        }
+        await drop_from_queue(
+            state,
+            current_file["msg_id"],
+            result=result,
+            bot_messages_to_delete=[],
         )
 
         await process_next_in_queue(message.bot, chat_id, state)
@@ -412,6 +444,7 @@ async def show_all_results(bot, chat_id, state: FSMContext):
     if not results_queue:
         return
 
+    entries = []
     for result in results_queue:
         amount = result["amount"]
         if amount == int(amount):
@@ -419,21 +452,18 @@ async def show_all_results(bot, chat_id, state: FSMContext):
         else:
             f_amount = f'{amount:,.2f}'.replace(',', ' ').replace('.', ',')
 
-        builder = InlineKeyboardBuilder()
-        await bot.send_message(
-            chat_id=chat_id,
-            text=(
-                f'✅ <b>Баланс пополнен</b> по чеку ({result["file_type"]})\n'
-                f'ID:<code>{result["op_id"]}</code>\n'
-                f'Плательщик: {result["payer"]}\n'
-                f'Сумма: <b>{f_amount}</b> ₽\n'
-                f'Внес: @{result["username"]}\n'
-                f'КА: {result["contractor"]}\n\n'
-                f'Для просмотра:<code>/hcheck {result["op_id"]}</code>'
-            ).replace(".", ","),
-            parse_mode="HTML",
-            reply_markup=builder.as_markup()
-        )
+        entries.append((
+            f'✅ <b>Баланс пополнен</b> по чеку ({result["file_type"]})\n'
+            f'ID:<code>{result["op_id"]}</code>\n'
+            f'Плательщик: {result["payer"]}\n'
+            f'Сумма: <b>{f_amount}</b> ₽\n'
+            f'Внес: @{result["username"]}\n'
+            f'КА: {result["contractor"]}\n\n'
+            f'Для просмотра:<code>/hcheck {result["op_id"]}</code>'
+        ).replace(".", ","))
+
+    for text in pack_messages(entries):
+        await get_outbound().send_message(chat_id, text, parse_mode="HTML")
 
 
 # ============= КНОПКИ =============
@@ -449,10 +479,10 @@ async def skip_current_file(callback: CallbackQuery, state: FSMContext):
     except Exception:
         pass
 
-    queue = data.get("queue", [])
-    if queue:
-        queue.pop(0)
-    await state.update_data(queue=queue)
+    current_file = data.get("current_file")
+    if current_file and not await drop_from_queue(state, current_file["msg_id"]):
+        # Повторное нажатие: файл уже пропущен.
+        return
     await process_next_in_queue(callback.bot, callback.message.chat.id, state)
 
 
@@ -498,7 +528,7 @@ async def wrong_file_type(message: Message, state: FSMContext):
 
 @router.message(CheckStates.waiting_for_amount, F.photo | F.document)
 async def handle_extra_photo(message: Message, state: FSMContext):
-    await add_to_queue(message, state)
+    await receive_files(message, state)
 
 
 # ============= ОБЩАЯ ФУНКЦИЯ =============
@@ -524,13 +554,11 @@ async def process_check_operation(message: Message, amount: float, payer_info: s
 
     try:
         bot = message.bot
-        file = await bot.get_file(file_id)
-
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"check_{chat_id}_{timestamp}.{file_ext}"
         filepath = os.path.join(FILES_DIR, filename)
 
-        await bot.download_file(file.file_path, filepath)
+        await save_telegram_file(bot, file_id, filepath)
 
     except Exception as e:
         await temp_msg(message, f"❌ Ошибка при сохранении файла")
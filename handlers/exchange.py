@@ -4,17 +4,20 @@ import pytz
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
+from aiogram.methods import SendMessage
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import settings, logger
 from database.repositories import OperationRepo, BalanceRepo, ChatRepo, RateRepo
 from filters.admin import IsAdminFilter
+from services.outbound import PRIORITY_BULK, get_outbound
 from states import MassExchange, RateState
 from utils.dateparse import parse_date_period
 from utils.exchange_date_helper import get_exchange_date_for_today
 from utils.helpers import delete_message, temp_msg, format_amount
 from utils.keyboards import get_delete_keyboard
+from utils.messages import pack_messages
 
 router = Router(name="exchange")
 
@@ -413,14 +416,11 @@ async def exchange_all(message: Message, start_date: datetime, end_date: datetim
 
         for chat_id in chats:
             if chat_id in gen_chats:
-                try:
-                    await bot.send_message(
-                        chat_id=chat_id,
-                        text=chat_report,
-                        parse_mode="HTML"
-                    )
-                except Exception as e:
-                    logger.error(f"Ошибка отправки в чат {chat_id}: {e}")
+                # Не ждём доставки: очередь отправит с учётом лимитов чата.
+                get_outbound().submit(
+                    SendMessage(chat_id=chat_id, text=chat_report, parse_mode="HTML"),
+                    PRIORITY_BULK,
+                )
 
         total_rub += amount_rub
         total_usdt += amount_after_commission
@@ -439,8 +439,8 @@ async def exchange_all(message: Message, start_date: datetime, end_date: datetim
          f"Установленный курс: {rate}").replace(".", ",")
     )
 
-    report = "\n".join(report_lines)
-    await message.answer(report, parse_mode="HTML", reply_markup=get_delete_keyboard())
+    for report in pack_messages(report_lines, separator="\n"):
+        await message.answer(report, parse_mode="HTML", reply_markup=get_delete_keyboard())
 
 
 async def calculate_commission(balance_id, amount_usdt, user_id, username, commission):
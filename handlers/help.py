@@ -289,6 +289,11 @@ async def process_help_callback(callback: CallbackQuery):
 <b>/setqr</b> - Выбрать Р/С для генерации QR
 <b>/stopqr</b> - Временно выключить команду /qr
 <b>/startqr</b> - Включить команду /qr
+<b>/qrqueue</b> - Глубина очереди QR и число воркеров
+<b>/qrstats</b> - Время этапов генерации QR
+
+<b>/loopstats</b> - Медленные обработчики и блокировки бота
+<b>/apistats</b> - Вызовы Bot API: задержки, ошибки, 429
 
 <b>/rate [date]</b> - Указать курс
 При использовании команды с датой бот попросит указать
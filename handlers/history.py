@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from aiogram import F, Router
 from aiogram.exceptions import TelegramNetworkError, TelegramBadRequest
 from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, InlineKeyboardButton, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -15,39 +16,147 @@ from filters.admin import IsAdminFilter
 from states import ReconciliationStates
 from utils.helpers import delete_message, temp_msg
 from utils.keyboards import get_delete_keyboard
+from utils.permissions import has_admin_access
 
 router = Router(name="reconciliation")
 
 
-@router.message(Command("history", "h"), IsAdminFilter())
-async def cmd_h(message: Message):
-    await delete_message(message)
-    chat_id = message.chat.id
+SV_PAGE_SIZE = 15
+H_PAGE_SIZE = 10
+EPOCH = datetime(1970, 1, 1)
 
-    balance_id = await ChatRepo.get_balance_id(chat_id)
 
-    history = await OperationRepo.get_history(balance_id)
+class HistoryPage(CallbackData, prefix="hp"):
+    """Курсор страницы /sv или /h: день сверки, номер и граничная строка."""
+
+    view: str
+    day: int
+    page: int
+    ts: int
+    id: int
+    newer: bool
+
+
+def encode_timestamp(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def decode_timestamp(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
 
-    if not history:
-        await temp_msg(message, "📜 История операций пуста")
-        return
 
+def period_title(day: datetime) -> str:
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if day == today:
+        return "Сегодня"
+    if day == today - timedelta(days=1):
+        return "Вчера"
+    return day.strftime("%d.%m.%Y")
+
+
+def page_keyboard(
+    view: str,
+    day: int,
+    page: int,
+    rows: list[dict],
+    has_newer: bool,
+    has_older: bool,
+):
+    builder = InlineKeyboardBuilder()
+    buttons = []
+    if has_newer:
+        buttons.append(
+            InlineKeyboardButton(
+                text="◀️ Новее",
+                callback_data=HistoryPage(
+                    view=view,
+                    day=day,
+                    page=page - 1,
+                    ts=encode_timestamp(rows[0]["timestamp"]),
+                    id=rows[0]["id"],
+                    newer=True,
+                ).pack(),
+            )
+        )
+    if has_older:
+        buttons.append(
+            InlineKeyboardButton(
+                text="Старее ▶️",
+                callback_data=HistoryPage(
+                    view=view,
+                    day=day,
+                    page=page + 1,
+                    ts=encode_timestamp(rows[-1]["timestamp"]),
+                    id=rows[-1]["id"],
+                    newer=False,
+                ).pack(),
+            )
+        )
+    if buttons:
+        builder.row(*buttons)
+    builder.row(InlineKeyboardButton(text="Скрыть", callback_data="delete_message"))
+    return builder.as_markup()
+
+
+async def fetch_page(fetch, cursor: HistoryPage | None, **kwargs):
+    """Страница и флаги «есть новее/старее» с учётом направления листания."""
+    if cursor is None:
+        rows, has_older = await fetch(**kwargs)
+        return rows, 0, False, has_older
+
+    position = (decode_timestamp(cursor.ts), cursor.id)
+    if cursor.newer:
+        rows, has_newer = await fetch(after=position, **kwargs)
+        return rows, cursor.page, has_newer, True
+    rows, has_older = await fetch(before=position, **kwargs)
+    return rows, cursor.page, True, has_older
+
+
+async def build_history_view(balance_id: int, cursor: HistoryPage | None = None):
+    rows, page, has_newer, has_older = await fetch_page(
+        OperationRepo.get_history_page,
+        cursor,
+        balance_id=balance_id,
+        limit=H_PAGE_SIZE,
+    )
+    if not rows:
+        return None
+
+    total = await OperationRepo.count_history(balance_id)
     contractor = await BalanceRepo.get_contractor_name(balance_id)
-    msg = f"📜 Последние 10 операций\nКонтрагент: {contractor}\n\n"
+    msg = (
+        f"📜 История операций: {total}\n"
+        f"Контрагент: {hd.quote(contractor)}\n"
+        f"Страница {page + 1}\n\n"
+    )
 
-    for op in history:
+    for op in rows:
         msg += f'🔹 ID: {op["operation_id"]}\n'
-        msg += f'Пользователь: @{op["username"]}\n'
+        msg += f'Пользователь: @{hd.quote(op["username"] or "")}\n'
         msg += f'Тип: {op["operation_type"]}\n'
         msg += f'Сумма: {float(op["amount"]):.2f} {op["currency"]}\n'
         if op["exchange_rate"]:
             msg += f'Курс: {float(op["exchange_rate"])}\n'
-        msg += f'Время: {op["timestamp"]}\n'
+        msg += f'Время: {op["timestamp"]:%Y-%m-%d %H:%M:%S}\n'
         if op["description"]:
-            msg += f'Описание: {op["description"]}\n'
+            msg += f'Описание: {hd.quote(op["description"])}\n'
         msg += "\n"
 
-    await message.answer(msg, parse_mode="HTML", reply_markup=get_delete_keyboard())
+    return msg, page_keyboard("h", 0, page, rows, has_newer, has_older)
+
+
+@router.message(Command("history", "h"), IsAdminFilter())
+async def cmd_h(message: Message):
+    await delete_message(message)
+    balance_id = await ChatRepo.get_balance_id(message.chat.id)
+
+    view = await build_history_view(balance_id)
+    if view is None:
+        await temp_msg(message, "📜 История операций пуста")
+        return
+
+    text, markup = view
+    await message.answer(text, parse_mode="HTML", reply_markup=markup)
 
 
 @router.message(Command("sv"))
@@ -94,11 +203,8 @@ async def sv_today(callback: CallbackQuery, state: FSMContext):
         pass
 
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    tomorrow = today + timedelta(days=1)
 
-    await show_checks_for_period(
-        callback.message, balance_id, today, tomorrow, "Сегодня", state
-    )
+    await show_checks_for_period(callback.message, balance_id, today, "Сегодня", state)
 
 
 @router.callback_query(F.data == "sv_yesterday")
@@ -119,9 +225,7 @@ async def sv_yesterday(callback: CallbackQuery, state: FSMContext):
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     yesterday = today - timedelta(days=1)
 
-    await show_checks_for_period(
-        callback.message, balance_id, yesterday, today, "Вчера", state
-    )
+    await show_checks_for_period(callback.message, balance_id, yesterday, "Вчера", state)
 
 
 @router.callback_query(F.data == "sv_custom")
@@ -206,25 +310,72 @@ async def process_custom_date(message: Message, state: FSMContext):
             )
             return
 
-    next_date = target_date + timedelta(days=1)
-    await show_checks_for_period(
-        message, balance_id, target_date, next_date, period_name, state
+    await show_checks_for_period(message, balance_id, target_date, period_name, state)
+
+
+def format_check(idx: int, check: dict) -> str:
+    payer_match = re.search(r"Плательщик: ([^.]+)", check["description"])
+    payer = payer_match.group(1) if payer_match else "Не указано"
+    return (
+        f"{idx}. <code>{check['operation_id'][:8]}</code> | "
+        f"{check['timestamp']:%H:%M} | {check['amount']:.2f} ₽\n"
+        f"   👤 {hd.quote(payer)}"
     )
 
 
+async def build_checks_view(
+    balance_id: int,
+    start_date: datetime,
+    period_name: str,
+    cursor: HistoryPage | None = None,
+):
+    """Страница сверки за сутки ``start_date``; курсор хранит только день."""
+    end_date = start_date + timedelta(days=1)
+    rows, page, has_newer, has_older = await fetch_page(
+        OperationRepo.get_checks_page,
+        cursor,
+        balance_id=balance_id,
+        start_date=start_date,
+        end_date=end_date,
+        limit=SV_PAGE_SIZE,
+    )
+    if not rows:
+        return None
+
+    summary = await OperationRepo.get_checks_summary(balance_id, start_date, end_date)
+    contractor_name = await BalanceRepo.get_contractor_name(balance_id)
+
+    checks_text = "\n\n".join(
+        format_check(page * SV_PAGE_SIZE + idx, check)
+        for idx, check in enumerate(rows, 1)
+    )
+    pages = -(-summary["count"] // SV_PAGE_SIZE)
+    text = (
+        f"📊 <b>Сверка чеков</b>\n\n"
+        f"📅 Период: <b>{period_name}</b>\n"
+        f"🏢 КА: {hd.quote(contractor_name)}\n\n"
+        f"📋 <b>Найдено чеков: {summary['count']}</b>\n"
+        f"💰 <b>Общая сумма: {summary['total']:.2f} ₽</b>\n\n"
+        f"{checks_text}\n\n"
+        f"Страница {page + 1} из {max(pages, page + 1)}\n"
+        f"<i>Для просмотра чека:</i> <code>/hcheck ID</code>"
+    )
+    day = int(start_date.strftime("%Y%m%d"))
+    return text, page_keyboard("sv", day, page, rows, has_newer, has_older)
+
+
 async def show_checks_for_period(
     message: Message,
     balance_id: int,
-    start_date,
-    end_date,
+    start_date: datetime,
     period_name: str,
     state: FSMContext,
 ):
-    checks = await OperationRepo.get_checks_by_date(balance_id, start_date, end_date)
-    contractor_name = await BalanceRepo.get_contractor_name(balance_id)
+    await state.clear()
+    view = await build_checks_view(balance_id, start_date, period_name)
 
-    if not checks:
-        await state.clear()
+    if view is None:
+        contractor_name = await BalanceRepo.get_contractor_name(balance_id)
         await message.answer(
             f"📭 <b>Чеки не найдены</b>\n\n"
             f"За период: <b>{period_name}</b>\n"
@@ -234,73 +385,38 @@ async def show_checks_for_period(
         )
         return
 
-    total_amount = sum(check["amount"] for check in checks)
-
-    checks_list = []
-    for idx, check in enumerate(checks, 1):
-        desc = check["description"]
-        payer_match = re.search(r"Плательщик: ([^.]+)", desc)
-        payer = payer_match.group(1) if payer_match else "Не указано"
-
-        time_str = check["timestamp"].strftime("%H:%M")
+    text, markup = view
+    await message.answer(text, parse_mode="HTML", reply_markup=markup)
 
-        checks_list.append(
-            f"{idx}. <code>{check['operation_id'][:8]}</code> | "
-            f"{time_str} | {check['amount']:.2f} ₽\n"
-            f"   👤 {hd.quote(payer)}"
-        )
-
-    checks_text = "\n\n".join(checks_list)
-
-    result_text = (
-        f"📊 <b>Сверка чеков</b>\n\n"
-        f"📅 Период: <b>{period_name}</b>\n"
-        f"🏢 КА: {hd.quote(contractor_name)}\n\n"
-        f"📋 <b>Найдено чеков: {len(checks)}</b>\n"
-        f"💰 <b>Общая сумма: {total_amount:.2f} ₽</b>\n\n"
-        f"{checks_text}\n\n"
-        f"<i>Для просмотра чека:</i> <code>/hcheck ID</code>"
-    )
 
-    if len(result_text) > 4096:
-        header = (
-            f"📊 <b>Сверка чеков</b>\n\n"
-            f"📅 Период: <b>{period_name}</b>\n"
-            f"🏢 КА: {hd.quote(contractor_name)}\n\n"
-            f"📋 <b>Найдено чеков: {len(checks)}</b>\n"
-            f"💰 <b>Общая сумма: {total_amount:.2f} ₽</b>"
-        )
-        await message.answer(
-            header, parse_mode="HTML", reply_markup=get_delete_keyboard()
-        )
+@router.callback_query(HistoryPage.filter())
+async def history_page(callback: CallbackQuery, callback_data: HistoryPage):
+    balance_id = await ChatRepo.get_balance_id(callback.message.chat.id)
 
-        chunk_size = 10
-        for i in range(0, len(checks), chunk_size):
-            chunk = checks[i : i + chunk_size]
-            chunk_list = []
-            for idx, check in enumerate(chunk, i + 1):
-                desc = check["description"]
-                payer_match = re.search(r"Плательщик: ([^.]+)", desc)
-                payer = payer_match.group(1) if payer_match else "Не указано"
-                time_str = check["timestamp"].strftime("%H:%M")
-
-                chunk_list.append(
-                    f"{idx}. <code>{check['operation_id'][:8]}</code> | "
-                    f"{time_str} | {check['amount']:.2f} ₽\n"
-                    f"   👤 {hd.quote(payer)}"
-                )
-
-            await message.answer(
-                "\n\n".join(chunk_list),
-                parse_mode="HTML",
-                reply_markup=get_delete_keyboard(),
-            )
+    if callback_data.view == "h":
+        if not await has_admin_access(callback.from_user.id):
+            await callback.answer("❌ Нет доступа", show_alert=True)
+            return
+        view = await build_history_view(balance_id, callback_data)
+        if view is None:
+            view = await build_history_view(balance_id)
     else:
-        await message.answer(
-            result_text, parse_mode="HTML", reply_markup=get_delete_keyboard()
-        )
+        start_date = datetime.strptime(str(callback_data.day), "%Y%m%d")
+        period_name = period_title(start_date)
+        view = await build_checks_view(balance_id, start_date, period_name, callback_data)
+        if view is None:
+            view = await build_checks_view(balance_id, start_date, period_name)
+
+    if view is None:
+        await callback.answer("Операций больше нет", show_alert=True)
+        return
 
-    await state.clear()
+    text, markup = view
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+    except TelegramBadRequest as e:
+        logger.debug(f"Page not edited: {e}")
+    await callback.answer()
 
 
 @router.callback_query(F.data == "sv_cancel")
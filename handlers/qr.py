@@ -1,7 +1,9 @@
 import asyncio
 import logging
+import time
 from uuid import uuid4
 
+import aiohttp
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.types import (
@@ -10,11 +12,13 @@ from aiogram.types import (
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from database.repositories import QRSettingsRepo
+from config import settings
+from database.repositories import QRSettingsRepo, ScheduledDeletionRepo
 from filters.admin import IsAdminFilter
 from services.qr_queue import (
-    CLEANUP_DELAY_MS,
-    QRCleanupTask,
+    CLEANUP_DELAY_SECONDS,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
     QRJob,
     get_qr_queue,
 )
@@ -28,9 +32,20 @@ logger = logging.getLogger(__name__)
 
 MIN_QR_AMOUNT = 2_500
 MAX_QR_AMOUNT = 150_000
-LOCAL_CLEANUP_SECONDS = CLEANUP_DELAY_MS / 1000
 _background_tasks: set[asyncio.Task] = set()
 
+QR_STATS_TIMEOUT_SECONDS = 5
+QR_STAGE_NAMES = {
+    "queue_wait": "Очередь",
+    "chrome_start": "Запуск Chrome",
+    "auth": "Авторизация",
+    "page_load": "Загрузка страницы",
+    "submit": "Отправка формы",
+    "image_wait": "Ожидание QR",
+    "telegram_upload": "Отправка в Telegram",
+    "total": "Всего",
+}
+
 QR_MODES = {
     1: "Веронт Долинск",
     2: "ВестКост",
@@ -69,7 +84,7 @@ async def delete_messages_later(
     chat_id: int,
     message_ids: tuple[int, ...],
 ) -> None:
-    await asyncio.sleep(LOCAL_CLEANUP_SECONDS)
+    await asyncio.sleep(CLEANUP_DELAY_SECONDS)
     for message_id in message_ids:
         try:
             await bot.delete_message(chat_id=chat_id, message_id=message_id)
@@ -87,14 +102,13 @@ async def schedule_cleanup(
     message_ids: tuple[int, ...],
 ) -> None:
     try:
-        await get_qr_queue().publish_cleanup(
-            QRCleanupTask(
-                chat_id=message.chat.id,
-                message_ids=message_ids,
-            )
+        await ScheduledDeletionRepo.schedule(
+            message.chat.id,
+            message_ids,
+            CLEANUP_DELAY_SECONDS,
         )
     except Exception:
-        logger.exception("RabbitMQ cleanup недоступен, используется локальный таймер")
+        logger.exception("Не удалось запланировать удаление, используется локальный таймер")
         schedule_local_cleanup(message, message_ids)
 
 
@@ -160,6 +174,71 @@ async def cmd_start_qr(message: Message):
     await temp_msg(message, "✅ Генерация QR включена")
 
 
+@router.message(Command("qrqueue"))
+async def cmd_qr_queue(message: Message):
+    if await reject_non_super_admin(message):
+        return
+
+    await delete_message(message)
+    try:
+        depth = await get_qr_queue().get_generation_depth()
+    except Exception:
+        logger.exception("Не удалось получить глубину очереди QR")
+        await temp_msg(message, "❌ Очередь QR временно недоступна")
+        return
+
+    await message.answer(
+        f"📊 Очередь QR\n\n"
+        f"Ожидают: {depth.messages}\n"
+        f"Воркеров: {depth.consumers}",
+        reply_markup=get_delete_keyboard(),
+    )
+
+
+async def fetch_worker_stats(path: str = "/stats") -> dict:
+    timeout = aiohttp.ClientTimeout(total=QR_STATS_TIMEOUT_SECONDS)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(f"{settings.QR_METRICS_URL}{path}") as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+def format_qr_stats(stats: dict) -> str:
+    lines = [
+        "⏱ <b>Этапы QR</b> (p50 / p90 / p99 / max, сек.)",
+        f"Заданий: {stats['jobs']}, ошибок: {stats['failures']}, "
+        f"повторов: {stats['retries']}",
+        "",
+    ]
+    for name, summary in stats["stages"].items():
+        lines.append(
+            f"{QR_STAGE_NAMES.get(name, name)}: "
+            f"{summary['p50']:.2f} / {summary['p90']:.2f} / "
+            f"{summary['p99']:.2f} / {summary['max']:.2f}"
+        )
+    return "\n".join(lines)
+
+
+@router.message(Command("qrstats"))
+async def cmd_qr_stats(message: Message):
+    if await reject_non_super_admin(message):
+        return
+
+    await delete_message(message)
+    try:
+        stats = await fetch_worker_stats()
+    except Exception:
+        logger.exception("Не удалось получить статистику QR-воркера")
+        await temp_msg(message, "❌ QR-воркер не отвечает")
+        return
+
+    await message.answer(
+        format_qr_stats(stats),
+        parse_mode="HTML",
+        reply_markup=get_delete_keyboard(),
+    )
+
+
 @router.message(Command("qr"), IsAdminFilter())
 async def cmd_new(message: Message):
     tab_index, is_enabled = await QRSettingsRepo.get_settings()
@@ -207,6 +286,10 @@ async def cmd_new(message: Message):
         processing_message_id=processing_msg.message_id,
         amount=amount,
         tab_index=tab_index,
+        created_at=time.time(),
+        priority=(
+            PRIORITY_HIGH if is_super_admin(message.from_user.id) else PRIORITY_NORMAL
+        ),
     )
 
     try:
@@ -217,7 +300,7 @@ async def cmd_new(message: Message):
             "❌ Очередь QR временно недоступна",
             reply_markup=get_delete_keyboard(),
         )
-        schedule_local_cleanup(
+        await schedule_cleanup(
             message,
             (message.message_id, processing_msg.message_id),
         )
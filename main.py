@@ -6,13 +6,22 @@ from config import logger
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, BotCommandScopeDefault
+from middlewares.chat_actor import ChatActorMiddleware
 from middlewares.chat_init_check import ChatInitMiddleware
+from middlewares.loop_monitor import LoopMonitorMiddleware
 from config import settings
 from database.connection import init_db, close_db
 from handlers import router
 from middlewares.register_user import RegisterUserMiddleware
 from middlewares.timeout_middleware import StateTimeoutMiddleware
-from services.qr_queue import close_qr_queue, init_qr_queue
+from database.repositories import QROutboxRepo
+from services.api_metrics import api_metrics, start_api_metrics_server
+from services.bot_session import create_bot_session
+from services.deletion_scheduler import DeletionScheduler
+from services.export_queue import close_export_queue, init_export_queue
+from services.loop_monitor import loop_monitor
+from services.outbound import close_outbound, init_outbound
+from services.qr_queue import close_qr_queue, get_qr_queue, init_qr_queue
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
@@ -28,32 +37,58 @@ async def set_bot_commands(bot: Bot):
     await bot.set_my_commands(user_commands, scope=BotCommandScopeDefault())
 
 
+def create_dispatcher() -> Dispatcher:
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+
+    if settings.CHAT_ACTORS_ENABLED:
+        dp.update.outer_middleware(
+            ChatActorMiddleware(
+                mailbox_size=settings.CHAT_ACTOR_MAILBOX_SIZE,
+                idle_timeout=settings.CHAT_ACTOR_IDLE_SECONDS,
+                hold_timeout=settings.CHAT_ACTOR_HOLD_SECONDS,
+                group_timeout=settings.MEDIA_GROUP_TIMEOUT_MS / 1000,
+            )
+        )
+    dp.message.middleware(StateTimeoutMiddleware(timeout_seconds=60))
+    dp.callback_query.middleware(StateTimeoutMiddleware(timeout_seconds=60))
+    dp.message.middleware(RegisterUserMiddleware())
+    dp.callback_query.middleware(RegisterUserMiddleware())
+    dp.message.middleware(ChatInitMiddleware())
+    dp.callback_query.middleware(ChatInitMiddleware())
+    dp.message.middleware(LoopMonitorMiddleware(loop_monitor))
+    dp.callback_query.middleware(LoopMonitorMiddleware(loop_monitor))
+
+    dp.include_router(router)
+    return dp
+
+
 async def main():
     await init_db()
     try:
-        await init_qr_queue()
+        await init_qr_queue(outbox=QROutboxRepo)
     except Exception:
         logger.exception(
             "RabbitMQ недоступен при запуске; /qr будет повторять подключение"
         )
+    try:
+        await init_export_queue()
+    except Exception:
+        logger.exception(
+            "RabbitMQ недоступен при запуске; отчеты будут повторять подключение"
+        )
 
     logging.basicConfig(
         level=logging.INFO,
         format=("%(asctime)s | " "%(levelname)s | " "%(name)s | " "%(message)s"),
     )
 
-    bot = Bot(token=settings.BOT_TOKEN.get_secret_value())
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
-
-    dp.message.middleware(StateTimeoutMiddleware(timeout_seconds=60))
-    dp.callback_query.middleware(StateTimeoutMiddleware(timeout_seconds=60))
-    dp.message.middleware(RegisterUserMiddleware())
-    dp.callback_query.middleware(RegisterUserMiddleware())
-    dp.message.middleware(ChatInitMiddleware())
-    dp.callback_query.middleware(ChatInitMiddleware())
-
-    dp.include_router(router)
+    bot = Bot(
+        token=settings.BOT_TOKEN.get_secret_value(),
+        session=create_bot_session(),
+    )
+    init_outbound(bot)
+    dp = create_dispatcher()
 
     scheduler = AsyncIOScheduler(timezone=timezone("Europe/Moscow"))
 
@@ -68,10 +103,32 @@ async def main():
     await set_bot_commands(bot)
     logger.info("Бот запущен")
 
+    loop_monitor.start()
+    outbox_task = asyncio.create_task(
+        get_qr_queue().flush_outbox_forever(settings.QR_OUTBOX_FLUSH_SECONDS)
+    )
+    deletion_task = asyncio.create_task(
+        DeletionScheduler(bot).run(settings.DELETION_SCHEDULER_INTERVAL_SECONDS)
+    )
+    metrics_runner = None
+    if settings.BOT_METRICS_PORT:
+        metrics_runner = await start_api_metrics_server(
+            api_metrics,
+            host="0.0.0.0",
+            port=settings.BOT_METRICS_PORT,
+        )
+
     try:
         await dp.start_polling(bot)
     finally:
+        outbox_task.cancel()
+        deletion_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await loop_monitor.stop()
+        await close_outbound()
         await close_qr_queue()
+        await close_export_queue()
         await close_db()
         await bot.session.close()
 
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
+from aiogram.types import TelegramObject, Update
+
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class CoalescingFSMContext(FSMContext):
+    """FSMContext, который копит изменения и пишет их в хранилище разом.
+
+    Пока обработчик апдейта работает, чтения идут из памяти, а все
+    ``set_state``/``update_data``/``clear`` сливаются в одну запись на
+    ``flush()``. ``update_data`` пишет только изменённые ключи поверх
+    свежих данных хранилища - чтобы не затереть то, что за это время
+    записал отпущенный в фон обработчик прошлого апдейта. После ``flush()``
+    контекст работает напрямую с хранилищем - на случай фоновых задач,
+    которые держат ссылку на него.
+    """
+
+    def __init__(self, inner: FSMContext) -> None:
+        super().__init__(storage=inner.storage, key=inner.key)
+        self._buffering = True
+        self._state: Any = _UNSET
+        self._data: Optional[Dict[str, Any]] = None
+        self._state_dirty = False
+        # set_data/clear заменяют данные целиком, update_data - только ключи.
+        self._data_replaced = False
+        self._changed_keys: set[str] = set()
+
+    async def set_state(self, state: StateType = None) -> None:
+        if not self._buffering:
+            return await super().set_state(state)
+        self._state = state.state if isinstance(state, State) else state
+        self._state_dirty = True
+
+    async def get_state(self) -> Optional[str]:
+        if not self._buffering:
+            return await super().get_state()
+        if self._state is _UNSET:
+            self._state = await super().get_state()
+        return self._state
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        if not self._buffering:
+            return await super().set_data(data)
+        self._data = dict(data)
+        self._data_replaced = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        if not self._buffering:
+            return await super().get_data()
+        if self._data is None:
+            self._data = await super().get_data()
+        return self._data.copy()
+
+    async def get_value(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        return (await self.get_data()).get(key, default)
+
+    async def update_data(
+        self, data: Optional[Mapping[str, Any]] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        if not self._buffering:
+            return await super().update_data(data, **kwargs)
+        if data:
+            kwargs.update(data)
+        current = await self.get_data()
+        current.update(kwargs)
+        self._data = current
+        self._changed_keys.update(kwargs)
+        return current.copy()
+
+    async def flush(self) -> None:
+        if not self._buffering:
+            return
+        self._buffering = False
+        if self._state_dirty:
+            await super().set_state(self._state)
+        if self._data_replaced:
+            await super().set_data(self._data)
+        elif self._changed_keys:
+            await super().update_data(
+                {key: self._data[key] for key in self._changed_keys}
+            )
+
+
+@dataclass(slots=True)
+class _Envelope:
+    handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+    event: TelegramObject
+    data: Dict[str, Any]
+    future: asyncio.Future
+    media_group_id: str | None
+
+
+class ChatActor:
+    """Обрабатывает апдейты одного чата по очереди из ограниченного ящика.
+
+    Элементы одного альбома запускаются вместе - иначе сборщик альбома
+    ждал бы элементы, стоящие в ящике за ним. Обработчик, который держит
+    ящик дольше ``hold_timeout``, отпускается доработать в фоне, чтобы
+    долгие ожидания (temp_msg, отложенные удаления) не задерживали чат.
+    """
+
+    def __init__(
+        self,
+        key: int,
+        registry: Dict[int, "ChatActor"],
+        mailbox_size: int,
+        idle_timeout: float,
+        hold_timeout: float,
+        group_timeout: float,
+    ) -> None:
+        self.key = key
+        self.registry = registry
+        self.mailbox: asyncio.Queue[_Envelope] = asyncio.Queue(mailbox_size)
+        self.idle_timeout = idle_timeout
+        self.hold_timeout = hold_timeout
+        self.group_timeout = group_timeout
+        self._stash: _Envelope | None = None
+        self.task = asyncio.create_task(self._run())
+
+    async def _next(self, timeout: float) -> _Envelope | None:
+        if self._stash is not None:
+            envelope, self._stash = self._stash, None
+            return envelope
+        try:
+            return await asyncio.wait_for(self.mailbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _run(self) -> None:
+        while True:
+            envelope = await self._next(self.idle_timeout)
+            if envelope is None:
+                if self.mailbox.empty():
+                    # Простаивающий актор убирает себя из реестра.
+                    del self.registry[self.key]
+                    return
+                continue
+
+            batch = [asyncio.create_task(self._process(envelope))]
+            group = envelope.media_group_id
+            while group is not None:
+                following = await self._next(self.group_timeout)
+                if following is None:
+                    break
+                if following.media_group_id != group:
+                    self._stash = following
+                    break
+                batch.append(asyncio.create_task(self._process(following)))
+            await asyncio.gather(*batch)
+
+    async def _process(self, envelope: _Envelope) -> None:
+        state = envelope.data.get("state")
+        if isinstance(state, FSMContext):
+            state = envelope.data["state"] = CoalescingFSMContext(state)
+
+        task = asyncio.create_task(self._handle(envelope))
+        await asyncio.wait({task}, timeout=self.hold_timeout)
+        # Следующий апдейт чата должен увидеть состояние этого. Отпущенный
+        # обработчик после flush() пишет в хранилище напрямую.
+        if state is not None:
+            try:
+                await state.flush()
+            except Exception:
+                logger.exception("Не удалось сохранить FSM чата %s", self.key)
+        if task.done():
+            _settle(task, envelope.future)
+        else:
+            logger.debug("Обработчик чата %s отпущен в фон", self.key)
+            task.add_done_callback(lambda done: _settle(done, envelope.future))
+
+    @staticmethod
+    async def _handle(envelope: _Envelope) -> Any:
+        state = envelope.data.get("state")
+        if isinstance(state, CoalescingFSMContext):
+            # FSMContextMiddleware прочитал состояние ещё до очереди - фильтры
+            # состояний должны видеть то, что записал предыдущий апдейт.
+            envelope.data["raw_state"] = await state.get_state()
+        return await envelope.handler(envelope.event, envelope.data)
+
+
+def _settle(task: asyncio.Task, future: asyncio.Future) -> None:
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class ChatActorMiddleware(BaseMiddleware):
+    """Направляет апдейты в акторы по чату (outer middleware на dp.update).
+
+    Апдейты одного чата обрабатываются строго по порядку, разные чаты -
+    параллельно. Изменения FSM одного апдейта пишутся в хранилище одной
+    записью. Заполненный ящик тормозит приём апдейтов этого чата.
+    """
+
+    def __init__(
+        self,
+        mailbox_size: int = 100,
+        idle_timeout: float = 60,
+        hold_timeout: float = 5,
+        group_timeout: float = 0.5,
+    ) -> None:
+        self.mailbox_size = mailbox_size
+        self.idle_timeout = idle_timeout
+        self.hold_timeout = hold_timeout
+        self.group_timeout = group_timeout
+        self.actors: Dict[int, ChatActor] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+
+        actor = self.actors.get(chat.id)
+        if actor is None:
+            actor = self.actors[chat.id] = ChatActor(
+                chat.id,
+                self.actors,
+                self.mailbox_size,
+                self.idle_timeout,
+                self.hold_timeout,
+                self.group_timeout,
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        await actor.mailbox.put(
+            _Envelope(handler, event, data, future, media_group_id(event))
+        )
+        return await future
+
+
+def media_group_id(event: TelegramObject) -> str | None:
+    message = event.message if isinstance(event, Update) else None
+    return message.media_group_id if message is not None else None
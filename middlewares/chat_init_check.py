@@ -17,6 +17,10 @@ class ChatInitMiddleware(BaseMiddleware):
         "setqr",
         "stopqr",
         "startqr",
+        "qrqueue",
+        "qrstats",
+        "loopstats",
+        "apistats",
     }
 
     async def __call__(
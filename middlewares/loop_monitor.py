@@ -0,0 +1,33 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.loop_monitor import LoopMonitor
+
+
+class LoopMonitorMiddleware(BaseMiddleware):
+    """Замеряет время каждого обработчика для LoopMonitor."""
+
+    def __init__(self, monitor: LoopMonitor):
+        self.monitor = monitor
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+
+        callback = handler_object.callback
+        name = f"{callback.__module__}.{callback.__qualname__}"
+        self.monitor.handler_started(name)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.monitor.handler_finished(name, time.perf_counter() - started)
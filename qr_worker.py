@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import time
+from typing import Callable
 
 from aiogram import Bot
 from aiogram.exceptions import (
@@ -11,48 +13,211 @@ from aiogram.types import BufferedInputFile, InputMediaPhoto
 from aio_pika.abc import AbstractIncomingMessage
 
 from config import settings
+from database.connection import close_db, init_db
+from database.repositories import ScheduledDeletionRepo
+from services.api_metrics import api_metrics
+from services.bot_session import create_bot_session
+from services.deletion_scheduler import DeletionScheduler
+from services.qr_cache import QRCache
+from services.qr_metrics import QRMetrics, start_metrics_server
+from services.qr_progress import QRProgressTracker, QueuePosition
 from services.qr_queue import (
+    CLEANUP_DELAY_SECONDS,
     QRCleanupTask,
     QRJob,
     QRQueueClient,
     declare_cleanup_queues,
     declare_generation_queue,
+    open_legacy_generation_queue,
 )
 from utils.generate_qr import (
     AuthenticationError,
+    BrowserSession,
+    FallbackBackend,
+    HTTPBackend,
+    QRBackend,
     QRGenerationError,
+    SeleniumBackend,
     SiteUnavailableError,
     generate_qr,
 )
 from utils.keyboards import get_delete_keyboard
+from utils.timing import StageTimings, stage, start_timings
 
 
 logger = logging.getLogger(__name__)
 RETRY_DELAY_SECONDS = 2
+CoalesceKey = tuple[int, int, int]
+STARTED_TEXT = "⏳ QR-код генерируется..."
+
+
+def format_queue_position(position: QueuePosition) -> str:
+    minutes, seconds = divmod(position.eta_seconds, 60)
+    eta = f"~{minutes} мин. {seconds} сек." if minutes else f"~{seconds} сек."
+    return (
+        "⏳ QR-код в очереди\n"
+        f"Перед вами: {position.ahead}\n"
+        f"Ожидание: {eta}"
+    )
+
+
+class BrowserSessionPool(QRBackend):
+    """Пул тёплых авторизованных сессий Chrome.
+
+    Сессия переиспользуется между заданиями, перед выдачей проверяется на
+    живость и пересоздаётся после ``max_jobs`` заданий или после ошибки.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs: int,
+        session_factory: Callable[[], BrowserSession] = BrowserSession,
+    ) -> None:
+        self.name = "selenium-pool"
+        self.size = size
+        self.max_jobs = max_jobs
+        self._session_factory = session_factory
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[BrowserSession] = []
+
+    async def warm_up(self) -> None:
+        for _ in range(self.size - len(self._idle)):
+            session = self._session_factory()
+            try:
+                await asyncio.to_thread(session.start)
+            except Exception:
+                logger.exception("Не удалось прогреть сессию Chrome")
+                await asyncio.to_thread(session.close)
+                return
+            self._idle.append(session)
+        logger.info("Прогрето сессий Chrome: %s", len(self._idle))
+
+    async def generate(self, amount: int, tab_index: int) -> tuple[bytes, str]:
+        async with self._slots:
+            session = await self._acquire()
+            try:
+                result = await asyncio.to_thread(session.generate, amount, tab_index)
+            except Exception:
+                await self._discard(session)
+                raise
+
+            if session.jobs_done >= self.max_jobs:
+                logger.info(
+                    "Сессия Chrome отработала %s заданий, пересоздаём",
+                    session.jobs_done,
+                )
+                await self._discard(session)
+            else:
+                self._idle.append(session)
+            return result
+
+    async def _acquire(self) -> BrowserSession:
+        while self._idle:
+            session = self._idle.pop()
+            if await asyncio.to_thread(session.is_alive):
+                return session
+            logger.warning("Сессия Chrome не отвечает, пересоздаём")
+            await self._discard(session)
+        return self._session_factory()
+
+    async def _discard(self, session: BrowserSession) -> None:
+        await asyncio.to_thread(session.close)
+
+    async def close(self) -> None:
+        sessions, self._idle = self._idle, []
+        for session in sessions:
+            await self._discard(session)
 
 
 class QRWorker:
-    def __init__(self, bot: Bot, queue_client: QRQueueClient) -> None:
+    def __init__(
+        self,
+        bot: Bot,
+        queue_client: QRQueueClient,
+        backend: QRBackend | None = None,
+        *,
+        concurrency: int = 1,
+        serialize_tabs: bool = False,
+        cache: QRCache | None = None,
+        metrics: QRMetrics | None = None,
+        waiting_buffer: int = 0,
+        coalesce_window: float = 0,
+    ) -> None:
         self.bot = bot
         self.queue_client = queue_client
+        self.backend = backend
+        self.concurrency = concurrency
+        self.serialize_tabs = serialize_tabs
+        self.cache = cache
+        self.metrics = metrics or QRMetrics()
+        self.waiting_buffer = waiting_buffer
+        self.progress = QRProgressTracker(slots=concurrency)
+        self.in_flight = 0
+        self.coalesce_window = coalesce_window
+        self._progress_texts: dict[str, str] = {}
+        self._leaders: dict[CoalesceKey, tuple[QRJob, asyncio.Future]] = {}
+        self._tab_locks: dict[int, asyncio.Lock] = {}
 
     async def run(self) -> None:
         if self.queue_client.connection is None:
             raise RuntimeError("RabbitMQ connection is not initialized")
 
         generation_channel = await self.queue_client.connection.channel()
-        await generation_channel.set_qos(prefetch_count=1)
+        await generation_channel.set_qos(
+            prefetch_count=self.concurrency + self.waiting_buffer
+        )
         generation_queue = await declare_generation_queue(generation_channel)
+        legacy_queue = await open_legacy_generation_queue(
+            self.queue_client.connection,
+            prefetch_count=self.concurrency + self.waiting_buffer,
+        )
 
+        # Новые удаления идут через scheduled_deletions; очередь дочищает
+        # задания, опубликованные до перехода.
         cleanup_channel = await self.queue_client.connection.channel()
         await cleanup_channel.set_qos(prefetch_count=10)
         _, cleanup_queue = await declare_cleanup_queues(cleanup_channel)
 
         await generation_queue.consume(self.process_job, no_ack=False)
+        if legacy_queue is not None:
+            logger.info("Дочитываем старую очередь %s", legacy_queue.name)
+            await legacy_queue.consume(self.process_job, no_ack=False)
         await cleanup_queue.consume(self.process_cleanup, no_ack=False)
-        logger.info("QR worker запущен")
+        logger.info("QR worker запущен, параллельных QR: %s", self.concurrency)
         await asyncio.Future()
 
+    async def report_queue_depth(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                depth = await self.queue_client.get_generation_depth()
+            except Exception:
+                logger.warning("Не удалось получить глубину очереди QR", exc_info=True)
+                continue
+            logger.info(
+                "Очередь QR: ожидают=%s потребителей=%s в работе=%s/%s",
+                depth.messages,
+                depth.consumers,
+                self.in_flight,
+                self.concurrency,
+            )
+
+    async def report_progress(self, interval: float) -> None:
+        """Показывает ожидающим заданиям позицию в очереди и ETA."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.report_progress_once()
+
+    async def report_progress_once(self) -> None:
+        for position in self.progress.positions():
+            job = position.job
+            text = format_queue_position(position)
+            if self._progress_texts.get(job.job_id) == text:
+                continue
+            self._progress_texts[job.job_id] = text
+            await self._edit_progress(job, text)
+
     async def process_job(self, message: AbstractIncomingMessage) -> None:
         async with message.process(requeue=True):
             try:
@@ -69,48 +234,125 @@ class QRWorker:
                 job.attempt,
             )
 
-            try:
-                qr_bytes, data = await self.generate_with_retry(job)
-            except AuthenticationError:
-                await self._edit_error(
-                    job,
-                    "❌ Не удалось авторизоваться у агента",
-                )
-            except SiteUnavailableError:
-                await self._edit_error(job, "❌ Сайт агента недоступен")
-            except QRGenerationError as exc:
-                await self._edit_error(job, f"❌ {exc}")
-            except Exception:
-                logger.exception("Неизвестная ошибка генерации job_id=%s", job.job_id)
-                await self._edit_error(job, "❌ Произошла неизвестная ошибка")
+            timings = start_timings()
+            started = time.perf_counter()
+            leader = self._find_leader(job)
+            if leader is None:
+                qr_result = await self._lead(job, timings)
             else:
-                await self._edit_result(job, qr_bytes, data)
-
-            await self.queue_client.publish_cleanup(
-                QRCleanupTask(
-                    chat_id=job.chat_id,
-                    message_ids=(
-                        job.command_message_id,
-                        job.processing_message_id,
-                    ),
+                logger.info(
+                    "QR job_id=%s присоединён к job_id=%s",
+                    job.job_id,
+                    leader[0].job_id,
                 )
+                qr_result = leader[1]
+                await asyncio.wait((qr_result,))
+
+            failed = True
+            try:
+                qr_bytes, data = qr_result.result()
+            except Exception as exc:
+                await self._edit_error(job, self._error_text(job, exc))
+            else:
+                failed = False
+                with stage("telegram_upload"):
+                    await self._edit_result(job, qr_bytes, data)
+
+            if job.created_at:
+                timings.record("total", max(time.time() - job.created_at, 0.0))
+            else:
+                timings.record("total", time.perf_counter() - started)
+            self.metrics.observe(timings, failed=failed)
+            logger.info("Этапы QR job_id=%s %s", job.job_id, timings.format())
+
+            await ScheduledDeletionRepo.schedule(
+                job.chat_id,
+                (job.command_message_id, job.processing_message_id),
+                CLEANUP_DELAY_SECONDS,
             )
             logger.info("QR-задание завершено job_id=%s", job.job_id)
 
+    def _find_leader(self, job: QRJob) -> tuple[QRJob, asyncio.Future] | None:
+        """Такой же QR в этом чате, запрошенный в пределах окна склейки."""
+        leader = self._leaders.get((job.chat_id, job.amount, job.tab_index))
+        if leader is None or not job.created_at:
+            return None
+        if job.created_at - leader[0].created_at > self.coalesce_window:
+            return None
+        return leader
+
+    async def _lead(self, job: QRJob, timings: StageTimings) -> asyncio.Future:
+        """Генерирует QR и отдаёт результат всем присоединившимся заданиям.
+
+        Результат возвращается завершённым future, чтобы ошибка не терялась,
+        если присоединившихся не было.
+        """
+        key = (job.chat_id, job.amount, job.tab_index)
+        outcome = asyncio.get_running_loop().create_future()
+        cached = self._take_cached(job)
+        if cached is not None:
+            # Готовый QR отдаётся сразу, без очереди за слотом генерации.
+            outcome.set_result(cached)
+            return outcome
+        if self.coalesce_window > 0:
+            self._leaders[key] = (job, outcome)
+        try:
+            await self.progress.wait_turn(job)
+            if job.created_at:
+                timings.record("queue_wait", max(time.time() - job.created_at, 0.0))
+            started = time.perf_counter()
+            self.in_flight += 1
+            try:
+                if self._progress_texts.pop(job.job_id, None) is not None:
+                    await self._edit_progress(job, STARTED_TEXT)
+                outcome.set_result(await self.generate_with_retry(job))
+            except Exception as exc:
+                outcome.set_exception(exc)
+            finally:
+                self.in_flight -= 1
+                self.progress.release(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            outcome.cancel()
+            raise
+        finally:
+            if self._leaders.get(key, (None, None))[1] is outcome:
+                del self._leaders[key]
+        return outcome
+
+    def _error_text(self, job: QRJob, exc: Exception) -> str:
+        if isinstance(exc, AuthenticationError):
+            return "❌ Не удалось авторизоваться у агента"
+        if isinstance(exc, SiteUnavailableError):
+            return "❌ Сайт агента недоступен"
+        if isinstance(exc, QRGenerationError):
+            return f"❌ {exc}"
+        logger.error(
+            "Неизвестная ошибка генерации job_id=%s",
+            job.job_id,
+            exc_info=exc,
+        )
+        return "❌ Произошла неизвестная ошибка"
+
+    def _take_cached(self, job: QRJob) -> tuple[bytes, str] | None:
+        if self.cache is None:
+            return None
+        self.cache.record_request(job.tab_index, job.amount)
+        cached = self.cache.take(job.tab_index, job.amount)
+        if cached is not None:
+            logger.info("QR из кэша job_id=%s", job.job_id)
+        return cached
+
     async def generate_with_retry(self, job: QRJob) -> tuple[bytes, str]:
         while True:
             try:
-                return await asyncio.to_thread(
-                    generate_qr,
-                    job.amount,
-                    job.tab_index,
-                )
+                return await self._generate(job.amount, job.tab_index)
             except AuthenticationError:
                 raise
             except Exception:
                 if job.attempt >= 1:
                     raise
                 job.attempt += 1
+                self.metrics.retries += 1
                 logger.warning(
                     "Повтор QR job_id=%s через %s сек.",
                     job.job_id,
@@ -119,6 +361,53 @@ class QRWorker:
                 )
                 await asyncio.sleep(RETRY_DELAY_SECONDS)
 
+    async def refill_cache(self, interval: float, hot_limit: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refill_cache_once(hot_limit)
+            except Exception:
+                logger.warning("Не удалось пополнить кэш QR", exc_info=True)
+
+    async def refill_cache_once(self, hot_limit: int) -> int:
+        """Догенерирует QR для самых частых сумм на свободных слотах воркера.
+
+        Слот берётся у ``progress`` на один QR и только если заданий не ждёт
+        никто, то есть с самым низким приоритетом. Задание, пришедшее во
+        время догенерации, ждёт в очереди не дольше одной генерации.
+        """
+        generated = 0
+        for tab_index, amount in self.cache.hot_keys(hot_limit):
+            while self.cache.missing(tab_index, amount) > 0:
+                if self.in_flight or not self.progress.try_acquire():
+                    return generated
+                try:
+                    qr_bytes, data = await self._generate(amount, tab_index)
+                finally:
+                    # Без длительности: догенерация не сдвигает ETA заданий.
+                    self.progress.release()
+                self.cache.put(tab_index, amount, qr_bytes, data)
+                generated += 1
+        if generated:
+            logger.info("Кэш QR пополнен на %s шт.", generated)
+        return generated
+
+    async def _generate(self, amount: int, tab_index: int) -> tuple[bytes, str]:
+        if self.serialize_tabs:
+            lock = self._tab_locks.setdefault(tab_index, asyncio.Lock())
+            async with lock:
+                return await self._generate_unlocked(amount, tab_index)
+        return await self._generate_unlocked(amount, tab_index)
+
+    async def _generate_unlocked(
+        self,
+        amount: int,
+        tab_index: int,
+    ) -> tuple[bytes, str]:
+        if self.backend is not None:
+            return await self.backend.generate(amount, tab_index)
+        return await asyncio.to_thread(generate_qr, amount, tab_index)
+
     async def _edit_result(self, job: QRJob, qr_bytes: bytes, data: str) -> None:
         try:
             await self.bot.edit_message_media(
@@ -137,6 +426,20 @@ class QRWorker:
                 exc,
             )
 
+    async def _edit_progress(self, job: QRJob, text: str) -> None:
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=job.chat_id,
+                message_id=job.processing_message_id,
+            )
+        except (TelegramBadRequest, TelegramNetworkError) as exc:
+            logger.debug(
+                "Не удалось обновить статус QR job_id=%s: %s",
+                job.job_id,
+                exc,
+            )
+
     async def _edit_error(self, job: QRJob, text: str) -> None:
         try:
             await self.bot.edit_message_text(
@@ -176,19 +479,109 @@ class QRWorker:
                     raise
 
 
+def build_backend(concurrency: int) -> tuple[QRBackend, BrowserSessionPool | None]:
+    session_pool = None
+    if settings.QR_BROWSER_POOL_SIZE > 0:
+        session_pool = BrowserSessionPool(
+            size=max(settings.QR_BROWSER_POOL_SIZE, concurrency),
+            max_jobs=settings.QR_BROWSER_MAX_JOBS,
+        )
+    selenium_backend = session_pool or SeleniumBackend()
+
+    if settings.QR_BACKEND == "http":
+        if not settings.QR_API_URL:
+            logger.error("QR_BACKEND=http, но QR_API_URL не задан; используется Selenium")
+            return selenium_backend, session_pool
+        http_backend = HTTPBackend(
+            auth_url=settings.AUTH_URL,
+            api_url=settings.QR_API_URL,
+            timeout=settings.QR_HTTP_TIMEOUT_SECONDS,
+        )
+        # Chrome остаётся запасным вариантом и не прогревается заранее.
+        return FallbackBackend(http_backend, selenium_backend), None
+
+    return selenium_backend, session_pool
+
+
 async def main() -> None:
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
-    bot = Bot(token=settings.BOT_TOKEN.get_secret_value())
-    queue_client = QRQueueClient()
+    bot = Bot(
+        token=settings.BOT_TOKEN.get_secret_value(),
+        session=create_bot_session(),
+    )
+    queue_client = QRQueueClient(publish_window=settings.QR_PUBLISH_WINDOW)
+    concurrency = max(settings.QR_WORKER_CONCURRENCY, 1)
+    backend, warm_pool = build_backend(concurrency)
+    logger.info("QR backend: %s", backend.name)
+    cache = None
+    if settings.QR_CACHE_ENABLED:
+        cache = QRCache(
+            ttl=settings.QR_CACHE_TTL_SECONDS,
+            per_key=settings.QR_CACHE_PER_AMOUNT,
+        )
+    worker = QRWorker(
+        bot,
+        queue_client,
+        backend,
+        concurrency=concurrency,
+        serialize_tabs=settings.QR_SERIALIZE_TABS,
+        cache=cache,
+        waiting_buffer=settings.QR_WAITING_BUFFER,
+        coalesce_window=settings.QR_COALESCE_WINDOW_SECONDS,
+    )
+    deletion_scheduler = DeletionScheduler(bot)
+    deletion_task = None
+    metrics_task = None
+    progress_task = None
+    refill_task = None
+    metrics_runner = None
 
     try:
+        await init_db()
         await queue_client.connect()
-        await QRWorker(bot, queue_client).run()
+        deletion_task = asyncio.create_task(
+            deletion_scheduler.run(settings.DELETION_SCHEDULER_INTERVAL_SECONDS)
+        )
+        if warm_pool is not None:
+            await warm_pool.warm_up()
+        metrics_task = asyncio.create_task(
+            worker.report_queue_depth(settings.QR_METRICS_INTERVAL_SECONDS)
+        )
+        progress_task = asyncio.create_task(
+            worker.report_progress(settings.QR_PROGRESS_INTERVAL_SECONDS)
+        )
+        if settings.QR_METRICS_PORT:
+            metrics_runner = await start_metrics_server(
+                worker.metrics,
+                host="0.0.0.0",
+                port=settings.QR_METRICS_PORT,
+                api_metrics=api_metrics,
+            )
+        if cache is not None:
+            refill_task = asyncio.create_task(
+                worker.refill_cache(
+                    settings.QR_CACHE_REFILL_INTERVAL_SECONDS,
+                    settings.QR_CACHE_HOT_AMOUNTS,
+                )
+            )
+        await worker.run()
     finally:
+        if deletion_task is not None:
+            deletion_task.cancel()
+        if metrics_task is not None:
+            metrics_task.cancel()
+        if progress_task is not None:
+            progress_task.cancel()
+        if refill_task is not None:
+            refill_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await backend.close()
         await queue_client.close()
+        await close_db()
         await bot.session.close()
 
 
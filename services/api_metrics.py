@@ -0,0 +1,202 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.types import BufferedInputFile, FSInputFile, InputFile
+from aiohttp import web
+from pydantic import BaseModel
+
+from services.qr_metrics import RollingHistogram, histogram_lines
+
+
+API_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+def iter_uploads(value: Any) -> Iterator[InputFile]:
+    """Файлы запроса, которые уйдут в теле (а не как file_id или URL)."""
+    if isinstance(value, InputFile):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_uploads(item)
+    elif isinstance(value, BaseModel):
+        for name in type(value).model_fields:
+            yield from iter_uploads(getattr(value, name))
+
+
+def upload_size(method: TelegramMethod) -> int:
+    size = 0
+    for upload in iter_uploads(method):
+        if isinstance(upload, BufferedInputFile):
+            size += len(upload.data)
+        elif isinstance(upload, FSInputFile):
+            try:
+                size += os.path.getsize(upload.path)
+            except OSError:
+                pass
+    return size
+
+
+# Счётчики по методам для /metrics: имя метрики и поле MethodStats.
+METHOD_COUNTERS = (
+    ("bot_api_calls_total", "calls"),
+    ("bot_api_errors_total", "errors"),
+    ("bot_api_flood_total", "flood"),
+    ("bot_api_retry_after_seconds_total", "retry_after"),
+    ("bot_api_upload_bytes_total", "bytes_up"),
+)
+
+
+@dataclass(slots=True)
+class MethodStats:
+    latency: RollingHistogram = field(
+        default_factory=lambda: RollingHistogram(size=500, bounds=API_BUCKETS)
+    )
+    calls: int = 0
+    seconds: float = 0.0
+    errors: int = 0
+    flood: int = 0
+    retry_after: float = 0.0
+    bytes_up: int = 0
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 3),
+            "errors": self.errors,
+            "flood": self.flood,
+            "retry_after": self.retry_after,
+            "bytes_up": self.bytes_up,
+            "latency": self.latency.summary(),
+        }
+
+
+class ApiMetrics:
+    """Счётчики вызовов Bot API по методам в пределах процесса.
+
+    Ошибки считаются вместе с 429; ``flood`` и ``retry_after`` - отдельно
+    только ответы TelegramRetryAfter и сумма их пауз в секундах. Выгрузка -
+    размер отправленных файлов, скачивание - байты ``bot.download``.
+    """
+
+    def __init__(self) -> None:
+        self.methods: dict[str, MethodStats] = {}
+        self.downloads = 0
+        self.bytes_down = 0
+
+    def observe(
+        self,
+        method: str,
+        seconds: float,
+        *,
+        uploaded: int = 0,
+        error: BaseException | None = None,
+    ) -> None:
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = self.methods[method] = MethodStats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.bytes_up += uploaded
+        stats.latency.observe(seconds)
+        if error is not None:
+            stats.errors += 1
+            if isinstance(error, TelegramRetryAfter):
+                stats.flood += 1
+                stats.retry_after += error.retry_after
+
+    def observe_download(self, size: int) -> None:
+        self.downloads += 1
+        self.bytes_down += size
+
+    def snapshot(self) -> dict:
+        return {
+            "downloads": self.downloads,
+            "bytes_down": self.bytes_down,
+            "methods": {name: stats.summary() for name, stats in self.methods.items()},
+        }
+
+    def render_text(self) -> str:
+        lines = [
+            "# TYPE bot_api_downloads_total counter",
+            f"bot_api_downloads_total {self.downloads}",
+            "# TYPE bot_api_download_bytes_total counter",
+            f"bot_api_download_bytes_total {self.bytes_down}",
+        ]
+        # Серии одной метрики идут подряд, под одной строкой # TYPE.
+        for metric, attribute in METHOD_COUNTERS:
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in self.methods.items():
+                lines.append(f'{metric}{{method="{name}"}} {getattr(stats, attribute)}')
+        if self.methods:
+            lines.append("# TYPE bot_api_seconds histogram")
+        for name, stats in self.methods.items():
+            lines.extend(histogram_lines("bot_api_seconds", f'method="{name}"', stats.latency))
+        return "\n".join(lines) + "\n"
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии aiogram: замеряет каждый вызов Bot API."""
+
+    def __init__(self, metrics: ApiMetrics) -> None:
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        start = time.perf_counter()
+        error = None
+        try:
+            return await make_request(bot, method)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            self.metrics.observe(
+                method.__api_method__,
+                time.perf_counter() - start,
+                uploaded=upload_size(method),
+                error=error,
+            )
+
+
+def create_api_metrics_app(metrics: ApiMetrics) -> web.Application:
+    async def stats(_request: web.Request) -> web.Response:
+        return web.Response(
+            text=json.dumps(metrics.snapshot()),
+            content_type="application/json",
+        )
+
+    async def prometheus(_request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_text())
+
+    app = web.Application()
+    app.router.add_get("/api_stats", stats)
+    app.router.add_get("/metrics", prometheus)
+    return app
+
+
+async def start_api_metrics_server(
+    metrics: ApiMetrics,
+    host: str,
+    port: int,
+) -> web.AppRunner:
+    runner = web.AppRunner(create_api_metrics_app(metrics))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+api_metrics = ApiMetrics()
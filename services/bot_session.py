@@ -0,0 +1,97 @@
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+
+from config import settings
+from services.api_metrics import ApiMetrics, ApiMetricsMiddleware, api_metrics, iter_uploads
+from services.telegram_files import create_api_server
+
+
+def has_upload(method: TelegramMethod) -> bool:
+    return next(iter_uploads(method), None) is not None
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """AiohttpSession с настраиваемым пулом соединений и классами таймаутов.
+
+    Короткие вызовы (deleteMessage, sendMessage, ...) ограничены ``timeout``,
+    загрузка файлов - ``upload_timeout``, скачивание - ``download_timeout``.
+    Явный ``request_timeout`` вызывающего (например, у getUpdates) важнее.
+    Если передан ``metrics``, вызовы и скачанные байты попадают в него.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        keepalive_timeout: float = 60,
+        dns_cache_ttl: int = 3600,
+        timeout: float = 15,
+        upload_timeout: float = 120,
+        download_timeout: float = 120,
+        metrics: ApiMetrics | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_cache_ttl,
+        )
+        self.upload_timeout = upload_timeout
+        self.download_timeout = download_timeout
+        self.metrics = metrics
+        if metrics is not None:
+            self.middleware(ApiMetricsMiddleware(metrics))
+
+    def method_timeout(self, method: TelegramMethod) -> float:
+        return self.upload_timeout if has_upload(method) else self.timeout
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod,
+        timeout: Optional[int] = None,
+    ) -> Any:
+        if timeout is None:
+            timeout = self.method_timeout(method)
+        return await super().make_request(bot, method, timeout=timeout)
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        # aiogram всегда передаёт свои 30 секунд - для выписок и фото мало.
+        size = 0
+        try:
+            async for chunk in super().stream_content(
+                url,
+                headers=headers,
+                timeout=max(timeout, self.download_timeout),
+                chunk_size=chunk_size,
+                raise_for_status=raise_for_status,
+            ):
+                size += len(chunk)
+                yield chunk
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_download(size)
+
+
+def create_bot_session(**overrides: Any) -> TunedAiohttpSession:
+    options = {
+        "limit": settings.BOT_API_POOL_SIZE,
+        "keepalive_timeout": settings.BOT_API_KEEPALIVE_SECONDS,
+        "dns_cache_ttl": settings.BOT_API_DNS_CACHE_SECONDS,
+        "timeout": settings.BOT_API_TIMEOUT_SECONDS,
+        "upload_timeout": settings.BOT_API_UPLOAD_TIMEOUT_SECONDS,
+        "download_timeout": settings.BOT_API_DOWNLOAD_TIMEOUT_SECONDS,
+        "metrics": api_metrics,
+        "api": create_api_server(),
+    }
+    options.update(overrides)
+    return TunedAiohttpSession(**options)
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from database.repositories import ScheduledDeletionRepo
+
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Bot API deleteMessages.
+MAX_MESSAGES_PER_CALL = 100
+
+
+class DeletionScheduler:
+    """Удаляет сообщения, срок которых наступил, по таблице scheduled_deletions.
+
+    Строки забираются атомарно в аренду на ``lease_seconds``, поэтому
+    планировщик может работать и в боте, и в QR-воркере одновременно.
+    Строка удаляется из таблицы только после ответа Telegram - если процесс
+    упадёт раньше, по окончании аренды её заберёт следующий проход.
+    Удаления одного чата отправляются пачками по ``MAX_MESSAGES_PER_CALL``
+    одним вызовом deleteMessages.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        batch_size: int = 1000,
+        retry_delay: float = 30,
+        lease_seconds: float = 300,
+    ) -> None:
+        self.bot = bot
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+
+    async def run(self, interval: float) -> None:
+        while True:
+            try:
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except Exception:
+                logger.warning("Не удалось удалить отложенные сообщения", exc_info=True)
+            await asyncio.sleep(interval)
+
+    async def run_once(self) -> int:
+        rows = await ScheduledDeletionRepo.claim_due(self.batch_size, self.lease_seconds)
+        by_chat: dict[int, list[tuple[int, int]]] = defaultdict(list)
+        for row in rows:
+            by_chat[row["chat_id"]].append((row["id"], row["message_id"]))
+
+        for chat_id, claimed in by_chat.items():
+            for start in range(0, len(claimed), MAX_MESSAGES_PER_CALL):
+                await self._delete(
+                    chat_id,
+                    claimed[start : start + MAX_MESSAGES_PER_CALL],
+                )
+        return len(rows)
+
+    async def _delete(self, chat_id: int, claimed: list[tuple[int, int]]) -> None:
+        ids = [row_id for row_id, _ in claimed]
+        message_ids = [message_id for _, message_id in claimed]
+        try:
+            await self.bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+        except (TelegramBadRequest, TelegramForbiddenError) as exc:
+            logger.debug(
+                "Сообщения уже недоступны chat_id=%s: %s",
+                chat_id,
+                exc,
+            )
+        except Exception:
+            logger.warning(
+                "Удаление сообщений chat_id=%s отложено на %s сек.",
+                chat_id,
+                self.retry_delay,
+                exc_info=True,
+            )
+            await ScheduledDeletionRepo.reschedule(ids, self.retry_delay)
+            return
+        await ScheduledDeletionRepo.delete(ids)
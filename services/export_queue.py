@@ -0,0 +1,173 @@
+import asyncio
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+from aio_pika import DeliveryMode, Message
+from aio_pika.abc import (
+    AbstractRobustChannel,
+    AbstractRobustConnection,
+    AbstractRobustQueue,
+)
+
+from services.qr_queue import PUBLISH_TIMEOUT_SECONDS, connect_rabbitmq
+
+
+EXPORT_QUEUE = "export.build"
+# Отложенные повторы: сообщение лежит здесь ``expiration`` секунд и по
+# dead-letter возвращается в export.build. TTL проверяется только у головы
+# очереди, поэтому короткий повтор может подождать длинный перед ним.
+EXPORT_RETRY_QUEUE = "export.build.retry"
+EXPORT = "export"
+EXPORT_ALL = "exportall"
+COMPARE_TXT = "compare"
+COMPARE_EXCEL = "compare_exl"
+EXPORT_KINDS = frozenset({EXPORT, EXPORT_ALL, COMPARE_TXT, COMPARE_EXCEL})
+
+
+@dataclass(slots=True)
+class ExportJob:
+    """Отчёт, который строит export_worker и отправляет в чат.
+
+    Даты передаются в ISO-формате; ``file_id`` - файл для сравнения;
+    ``attempt`` - сколько раз отправка уже срывалась из-за сети.
+    """
+
+    job_id: str
+    kind: str
+    chat_id: int
+    status_message_id: int
+    start_date: str | None = None
+    end_date: str | None = None
+    file_id: str | None = None
+    created_at: float = 0.0
+    attempt: int = 0
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(asdict(self), separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "ExportJob":
+        data = json.loads(body)
+        if not isinstance(data, dict):
+            raise ValueError("Export job must be a JSON object")
+        job = cls(**data)
+        if job.kind not in EXPORT_KINDS:
+            raise ValueError(f"Unknown export kind: {job.kind}")
+        if job.kind in (COMPARE_TXT, COMPARE_EXCEL) and not job.file_id:
+            raise ValueError("Compare job requires file_id")
+        return job
+
+    @staticmethod
+    def format_date(value: datetime | None) -> str | None:
+        return value.isoformat() if value is not None else None
+
+    def period(self) -> tuple[datetime | None, datetime | None]:
+        return (
+            datetime.fromisoformat(self.start_date) if self.start_date else None,
+            datetime.fromisoformat(self.end_date) if self.end_date else None,
+        )
+
+
+async def declare_export_queues(
+    channel: AbstractRobustChannel,
+) -> tuple[AbstractRobustQueue, AbstractRobustQueue]:
+    export_queue = await channel.declare_queue(
+        EXPORT_QUEUE,
+        durable=True,
+        arguments={"x-queue-type": "classic"},
+    )
+    retry_queue = await channel.declare_queue(
+        EXPORT_RETRY_QUEUE,
+        durable=True,
+        arguments={
+            "x-queue-type": "classic",
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": EXPORT_QUEUE,
+        },
+    )
+    return retry_queue, export_queue
+
+
+class ExportQueueClient:
+    """Публикует задания отчётов; с ``delay`` - через export.build.retry."""
+
+    def __init__(self) -> None:
+        self.connection: AbstractRobustConnection | None = None
+        self.channel: AbstractRobustChannel | None = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if (
+                self.connection
+                and not self.connection.is_closed
+                and self.channel
+                and not self.channel.is_closed
+            ):
+                return
+
+            if self.connection and not self.connection.is_closed:
+                await self.connection.close()
+
+            connection = await connect_rabbitmq()
+            try:
+                channel = await connection.channel(
+                    publisher_confirms=True,
+                    on_return_raises=True,
+                )
+                await declare_export_queues(channel)
+            except Exception:
+                await connection.close()
+                raise
+
+            self.connection = connection
+            self.channel = channel
+
+    async def publish_job(self, job: ExportJob, delay: float = 0) -> None:
+        await self.connect()
+        message = Message(
+            job.to_bytes(),
+            content_type="application/json",
+            delivery_mode=DeliveryMode.PERSISTENT,
+            message_id=job.job_id,
+            timestamp=datetime.now(timezone.utc),
+            type="export.build",
+            expiration=delay or None,
+        )
+        await asyncio.wait_for(
+            self.channel.default_exchange.publish(
+                message,
+                routing_key=EXPORT_RETRY_QUEUE if delay else EXPORT_QUEUE,
+                mandatory=True,
+            ),
+            timeout=PUBLISH_TIMEOUT_SECONDS,
+        )
+
+    async def close(self) -> None:
+        if self.connection and not self.connection.is_closed:
+            await self.connection.close()
+
+
+_client: ExportQueueClient | None = None
+
+
+async def init_export_queue() -> ExportQueueClient:
+    global _client
+    client = ExportQueueClient()
+    _client = client
+    await client.connect()
+    return client
+
+
+def get_export_queue() -> ExportQueueClient:
+    if _client is None:
+        raise RuntimeError("Export queue is not initialized")
+    return _client
+
+
+async def close_export_queue() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,321 @@
+"""Построение отчётов /export, /exportall, /compare и /compare_exl.
+
+Работает в export_worker: pandas и openpyxl не попадают в процесс бота.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from config import settings
+from database.repositories import BalanceRepo, ChatRepo, OperationRepo
+from services.reconciliation import reconcile
+from utils.excel import (
+    export_comparison_report,
+    export_comparison_report_exl,
+    export_to_excel,
+)
+
+
+logger = logging.getLogger(__name__)
+
+EXCEL_COLUMNS = {
+    "date": ["дата и время регистрации заказа"],
+    "order_id": ["номер заказа"],
+    "status": ["статус заказа"],
+    "amount": ["сумма заказа"],
+}
+
+
+class ExportError(Exception):
+    """Отчёт не построен; текст показывается пользователю."""
+
+
+@dataclass(slots=True)
+class ExportResult:
+    """Текст для пользователя и, если есть, файл; тогда текст - подпись."""
+
+    text: str
+    document: bytes | None = None
+    filename: str | None = None
+    parse_mode: str | None = None
+
+
+def match_window() -> timedelta | None:
+    minutes = settings.RECONCILE_TIME_WINDOW_MINUTES
+    return timedelta(minutes=minutes) if minutes > 0 else None
+
+
+def format_period(start_date: datetime | None, end_date: datetime | None) -> str:
+    if start_date is None:
+        return "за всё время"
+    return f"{start_date.strftime('%d.%m.%Y')}–{end_date.strftime('%d.%m.%Y')}"
+
+
+async def build_chat_export(
+    chat_id: int,
+    start_date: datetime | None,
+    end_date: datetime | None,
+) -> ExportResult:
+    buffer = await export_to_excel(
+        chat_id=chat_id, start_date=start_date, end_date=end_date
+    )
+    balance_id = await ChatRepo.get_balance_id(chat_id)
+    contractor = await BalanceRepo.get_contractor_name(balance_id)
+
+    return ExportResult(
+        text=(
+            f"📊 Отчет для КА: {contractor}\n"
+            f"📅 Период: {format_period(start_date, end_date)}"
+        ),
+        document=buffer.read(),
+        filename=f"report_{contractor}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+    )
+
+
+async def build_full_export(
+    start_date: datetime | None,
+    end_date: datetime | None,
+) -> ExportResult:
+    buffer = await export_to_excel(
+        chat_id=None, start_date=start_date, end_date=end_date
+    )
+    return ExportResult(
+        text=(
+            "📊 Полный отчет по всем чатам и операциям\n"
+            f"📅 Период: {format_period(start_date, end_date)}"
+        ),
+        document=buffer.read(),
+        filename=f"full_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+    )
+
+
+def parse_txt_operations(content: bytes) -> tuple[list[dict], set]:
+    """Строки ``КА;ID;ДД.ММ.ГГГГ ЧЧ:ММ:СС;тип;сумма`` -> операции и их даты."""
+    file_operations = []
+    file_dates = set()
+
+    for line in content.decode("utf-8").strip().split("\n"):
+        if not line.strip():
+            continue
+
+        parts = line.split(";")
+        if len(parts) < 5:
+            continue
+
+        try:
+            file_date = datetime.strptime(parts[2].strip(), "%d.%m.%Y %H:%M:%S")
+            amount = float(parts[4].strip().replace(",", "."))
+        except (ValueError, IndexError):
+            continue
+
+        file_dates.add(file_date.date())
+        file_operations.append({
+            "contractor": parts[0].strip(),
+            "transaction_id": parts[1].strip(),
+            "datetime": file_date,
+            "operation_type": parts[3].strip(),
+            "amount": amount,
+        })
+
+    return file_operations, file_dates
+
+
+async def build_txt_comparison(
+    content: bytes,
+    start_date: datetime,
+    end_date: datetime,
+) -> ExportResult:
+    target_date = start_date
+    file_operations, file_dates = parse_txt_operations(content)
+
+    if not file_operations:
+        raise ExportError("❌ В файле не найдено корректных операций")
+
+    if len(file_dates) == 1 and target_date.date() not in file_dates:
+        file_date_str = next(iter(file_dates)).strftime("%d.%m.%Y")
+        raise ExportError(
+            f"❌ Файл содержит операции за {file_date_str}, "
+            f"а запрошена дата {target_date.strftime('%d.%m.%Y')}\n\n"
+            f"Файл не за тот день!"
+        )
+
+    db_operations_raw = await OperationRepo.get_all_checks_by_date(
+        start_date,
+        end_date
+    )
+
+    result = reconcile(file_operations, db_operations_raw, window=match_window())
+    only_in_file = result.only_in_file
+    only_in_db = result.only_in_db
+
+    if not only_in_file and not only_in_db:
+        total_file = sum(op["amount"] for op in file_operations)
+        total_db = sum(float(op["amount"]) for op in db_operations_raw)
+
+        return ExportResult(
+            text=(
+                f"<b>Все операции совпали!</b>\n\n"
+                f"Статистика:\n"
+                f"• В файле: {len(file_operations)} операций\n"
+                f"• В базе: {len(db_operations_raw)} операций\n"
+                f"• Общая сумма (файл): {total_file:,.2f} ₽\n"
+                f"• Общая сумма (БД): {total_db:,.2f} ₽\n"
+                f"• Дата: {target_date.strftime('%d.%m.%Y')}"
+            ),
+            parse_mode="HTML",
+        )
+
+    buffer = await export_comparison_report(
+        only_in_file=only_in_file,
+        only_in_db=only_in_db,
+    )
+
+    return ExportResult(
+        text=(
+            f"<b>Отчет о расхождениях</b>\n\n"
+            f"🔴 Красным: есть в файле, нет в БД ({len(only_in_file)} шт.)\n"
+            f"🟡 Желтым: есть в БД, нет в файле ({len(only_in_db)} шт.)\n\n"
+            f"Дата: {target_date.strftime('%d.%m.%Y')}\n"
+            f"Всего в файле: {len(file_operations)} операций\n"
+            f"Всего в БД: {len(db_operations_raw)} операций\n"
+            f"Совпало операций: {len(result.matched)}"
+        ),
+        document=buffer.read(),
+        filename=f"compare_{target_date.strftime('%Y%m%d')}.xlsx",
+        parse_mode="HTML",
+    )
+
+
+def parse_excel_operations(content: bytes, target_date) -> list[dict]:
+    """Успешные (captured) заказы за ``target_date`` из выгрузки эквайринга.
+
+    Фильтры считаются по столбцам целиком; в Python-цикл попадают только
+    прошедшие отбор строки - чтобы превратить сумму в ``Decimal``.
+    """
+    import pandas as pd
+    from io import BytesIO
+
+    df = pd.read_excel(BytesIO(content))
+
+    if df.empty:
+        raise ExportError("Пустой файл")
+
+    df.columns = [str(col).strip().lower() for col in df.columns]
+
+    def find_column(names):
+        for col in df.columns:
+            if col in names:
+                return col
+        return None
+
+    col_map = {k: find_column(v) for k, v in EXCEL_COLUMNS.items()}
+
+    if not all(col_map.values()):
+        raise ExportError("Не найдены нужные колонки")
+
+    frame = df[list(col_map.values())].set_axis(list(col_map), axis=1)
+
+    mask = frame["status"].astype(str).str.strip().str.casefold().eq("captured")
+    if frame["date"].dtype == object:
+        # Повторённые строки заголовка в середине выгрузки.
+        mask &= ~frame["date"].astype(str).str.lower().str.contains(
+            "дата и время", regex=False
+        )
+
+    dates = pd.to_datetime(frame["date"].where(mask), errors="coerce", format="mixed")
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    mask &= dates.dt.normalize().eq(pd.Timestamp(target_date))
+
+    amounts = frame["amount"]
+    if amounts.dtype == object:
+        amounts = (
+            amounts.astype(str)
+            .str.replace(r"[\s₽]", "", regex=True)
+            .str.replace(",", ".", regex=False)
+        )
+    numeric = pd.to_numeric(amounts, errors="coerce")
+    mask &= numeric.gt(0)
+
+    selected = pd.DataFrame({
+        "transaction_id": frame["order_id"][mask].astype(str).str.strip(),
+        "amount": amounts[mask],
+        "numeric": numeric[mask],
+        "datetime": dates[mask],
+    }).drop_duplicates(subset=["transaction_id", "numeric"])
+
+    return [
+        {
+            "transaction_id": transaction_id,
+            "amount": Decimal(str(amount)),
+            "datetime": date_val,
+        }
+        for transaction_id, amount, date_val in zip(
+            selected["transaction_id"], selected["amount"], selected["datetime"]
+        )
+    ]
+
+
+async def build_excel_comparison(
+    content: bytes,
+    start_date: datetime,
+    end_date: datetime,
+) -> ExportResult:
+    target_date = start_date
+    file_operations = parse_excel_operations(content, target_date.date())
+
+    if not file_operations:
+        raise ExportError("Нет успешных операций за эту дату")
+
+    db_operations_raw = await OperationRepo.get_all_checks_by_date(
+        start_date,
+        end_date
+    )
+
+    result = reconcile(file_operations, db_operations_raw, window=match_window())
+    only_in_file = result.only_in_file
+    only_in_db = result.only_in_db
+    matched_operations = result.matched_file_operations
+
+    total_file = sum(op["amount"] for op in file_operations)
+    total_db = sum(Decimal(str(op["amount"])) for op in db_operations_raw)
+
+    if not only_in_file and not only_in_db:
+        return ExportResult(
+            text=(
+                f"Все успешные операции совпали!\n\n"
+                f"Excel: {len(file_operations)}\n"
+                f"БД: {len(db_operations_raw)}\n"
+                f"Сумма Excel: {total_file:,.2f}\n"
+                f"Сумма БД: {total_db:,.2f}"
+            ),
+            parse_mode="HTML",
+        )
+
+    matched_count = len(matched_operations)
+    not_matched_count = len(file_operations) - matched_count
+    matched_amount = sum(op["amount"] for op in matched_operations)
+
+    buffer = await export_comparison_report_exl(
+        only_in_file=only_in_file,
+        only_in_db=only_in_db,
+        matched_operations=matched_operations
+    )
+
+    return ExportResult(
+        text=(
+            f"РАСХОЖДЕНИЯ\n\n"
+            f"🔴Красным: есть в файле, нет в БД: {len(only_in_file)} шт.\n"
+            f"🟡Желтым: есть в БД, нет в файле: {len(only_in_db)} шт.\n\n"
+            f"Дата: {target_date.strftime('%d.%m.%Y')}\n\n"
+            f"Общая сумма схождений: {matched_amount:,.2f} ₽\n"
+            f"Кол-во чеков сошлось: {matched_count}\n"
+            f"Кол-во чеков НЕ сошлось (из файла): {not_matched_count}\n\n"
+            f"Общая сумма файла: {total_file:,.2f} ₽\n"
+            f"Общая сумма БД: {total_db:,.2f} ₽"
+        ),
+        document=buffer.read(),
+        filename=f"compare_excel_{target_date.strftime('%Y%m%d')}.xlsx",
+        parse_mode="HTML",
+    )
@@ -0,0 +1,138 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from config import settings
+from services.qr_metrics import RollingHistogram
+
+
+@dataclass(slots=True)
+class HandlerStats:
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    stalls: int = 0
+
+    def observe(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+@dataclass(slots=True)
+class LoopStall:
+    started_at: datetime
+    handler: str | None
+    blocked: float
+    stack: str = field(repr=False)
+
+
+class LoopMonitor:
+    """Следит за блокировками event loop бота.
+
+    Корутина ``_heartbeat`` отмечается каждые ``interval`` секунд и меряет лаг
+    loop. Отдельный поток ``_watch`` замечает, что отметки нет дольше
+    ``threshold``, и снимает стек потока loop прямо во время блокировки -
+    так в стек попадает сам виновник. Последние ``history`` блокировок
+    хранятся в кольцевом буфере ``stalls``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.25,
+        interval: float = 0.05,
+        history: int = 50,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque[LoopStall] = deque(maxlen=history)
+        self.handlers: dict[str, HandlerStats] = {}
+        self.lag = RollingHistogram(size=1000)
+        self._running: dict[asyncio.Task, str] = {}
+        self._last_beat = time.monotonic()
+        self._current_stall: LoopStall | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._watcher: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watcher = threading.Thread(
+            target=self._watch,
+            name="loop-monitor",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+
+    def handler_started(self, name: str) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            self._running[task] = name
+
+    def handler_finished(self, name: str, seconds: float) -> None:
+        self._running.pop(asyncio.current_task(), None)
+        self.handlers.setdefault(name, HandlerStats()).observe(seconds)
+
+    def slowest_handlers(self, limit: int = 10) -> list[tuple[str, HandlerStats]]:
+        return sorted(
+            self.handlers.items(),
+            key=lambda item: (item[1].stalls, item[1].max),
+            reverse=True,
+        )[:limit]
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self.lag.observe(lag)
+            self._last_beat = now
+            stall, self._current_stall = self._current_stall, None
+            if stall is not None:
+                stall.blocked = lag
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            silent = time.monotonic() - self._last_beat
+            if silent > self.threshold and self._current_stall is None:
+                self._record_stall(silent)
+
+    def _record_stall(self, silent: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else ""
+        task = asyncio.current_task(self._loop)
+        handler = self._running.get(task)
+        if handler is not None:
+            self.handlers.setdefault(handler, HandlerStats()).stalls += 1
+        stall = LoopStall(
+            started_at=datetime.now(),
+            handler=handler,
+            blocked=silent,
+            stack=stack,
+        )
+        self._current_stall = stall
+        self.stalls.append(stall)
+
+
+loop_monitor = LoopMonitor(
+    threshold=settings.LOOP_STALL_THRESHOLD_MS / 1000,
+    history=settings.LOOP_STALL_HISTORY,
+)
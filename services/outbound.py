@@ -0,0 +1,232 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, TelegramMethod
+
+from config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+class TokenBucket:
+    """``rate`` токенов в секунду, не больше ``capacity`` в запасе."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, reserve: float = 0.0) -> float:
+        """Забирает токен и возвращает 0 или сколько секунд ждать до него.
+
+        ``reserve`` токенов остаются нетронутыми - запас для важных запросов.
+        """
+        self._refill()
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return 0.0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    async def acquire(self, reserve: float = 0.0) -> None:
+        while (delay := self.take(reserve)) > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass(order=True, slots=True)
+class _Outgoing:
+    priority: int
+    seq: int
+    method: TelegramMethod = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass(slots=True)
+class _ChatQueue:
+    bucket: TokenBucket
+    queue: asyncio.PriorityQueue = field(default_factory=asyncio.PriorityQueue)
+    task: asyncio.Task | None = None
+
+
+class OutboundDispatcher:
+    """Единая точка отправки сообщений с лимитами Telegram.
+
+    У каждого чата своя очередь и своя корзина токенов (группы - около 20
+    сообщений в минуту, личные чаты - около одного в секунду), поверх них
+    общая корзина на ~30 запросов в секунду. Массовые отправки оставляют в
+    общей корзине ``bulk_headroom`` токенов ответам пользователям, а в очереди
+    чата идут после них. ``TelegramRetryAfter`` обрабатывается здесь же:
+    чат ставится на паузу, запрос повторяется.
+
+    Очередь чата обслуживает своя задача; она завершается, если очередь
+    пустует дольше ``idle_timeout`` секунд.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30,
+        group_per_minute: float = 20,
+        private_rate: float = 1,
+        group_burst: float = 5,
+        private_burst: float = 3,
+        bulk_headroom: float = 5,
+        max_retries: int = 3,
+        idle_timeout: float = 60,
+    ) -> None:
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.group_rate = group_per_minute / 60
+        self.private_rate = private_rate
+        self.group_burst = group_burst
+        self.private_burst = private_burst
+        self.bulk_headroom = bulk_headroom
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self._chats: dict[int | str | None, _ChatQueue] = {}
+        self._seq = itertools.count()
+
+    def submit(
+        self,
+        method: TelegramMethod,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> asyncio.Future:
+        """Ставит запрос в очередь чата; future завершится ответом Bot API."""
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_log_failure)
+        self._chat(getattr(method, "chat_id", None)).queue.put_nowait(
+            _Outgoing(priority, next(self._seq), method, future)
+        )
+        return future
+
+    async def send(
+        self,
+        method: TelegramMethod,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Any:
+        return await self.submit(method, priority)
+
+    async def send_message(
+        self,
+        chat_id: int | str,
+        text: str,
+        priority: int = PRIORITY_INTERACTIVE,
+        **kwargs: Any,
+    ) -> Any:
+        return await self.send(
+            SendMessage(chat_id=chat_id, text=text, **kwargs), priority
+        )
+
+    async def close(self) -> None:
+        tasks = [chat.task for chat in self._chats.values() if chat.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for chat in self._chats.values():
+            while not chat.queue.empty():
+                chat.queue.get_nowait().future.cancel()
+        self._chats.clear()
+
+    def _chat(self, chat_id: int | str | None) -> _ChatQueue:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.private_rate, self.private_burst)
+            else:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            chat = self._chats[chat_id] = _ChatQueue(bucket)
+            chat.task = asyncio.create_task(self._drain(chat_id, chat))
+        return chat
+
+    async def _drain(self, chat_id: int | str | None, chat: _ChatQueue) -> None:
+        while True:
+            try:
+                item = await asyncio.wait_for(chat.queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                if chat.queue.empty():
+                    del self._chats[chat_id]
+                    return
+                continue
+
+            if item.future.cancelled():
+                continue
+            try:
+                result = await self._call(chat_id, chat, item)
+            except asyncio.CancelledError:
+                item.future.cancel()
+                raise
+            except Exception as exc:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            else:
+                if not item.future.done():
+                    item.future.set_result(result)
+
+    async def _call(self, chat_id, chat: _ChatQueue, item: _Outgoing) -> Any:
+        reserve = self.bulk_headroom if item.priority == PRIORITY_BULK else 0.0
+        for attempt in range(self.max_retries + 1):
+            await chat.bucket.acquire()
+            await self.global_bucket.acquire(reserve)
+            try:
+                return await self.bot(item.method)
+            except TelegramRetryAfter as exc:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(
+                    "Flood control chat_id=%s: пауза %s сек.",
+                    chat_id,
+                    exc.retry_after,
+                )
+                chat.bucket.pause(exc.retry_after)
+
+
+def _log_failure(future: asyncio.Future) -> None:
+    # Без этого ошибки отправок, которые никто не ждёт, терялись бы молча.
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Отправка не удалась: %r", future.exception())
+
+
+_dispatcher: OutboundDispatcher | None = None
+
+
+def init_outbound(bot: Bot) -> OutboundDispatcher:
+    global _dispatcher
+    _dispatcher = OutboundDispatcher(
+        bot,
+        global_rate=settings.OUTBOUND_GLOBAL_RATE,
+        group_per_minute=settings.OUTBOUND_GROUP_PER_MINUTE,
+        private_rate=settings.OUTBOUND_PRIVATE_RATE,
+    )
+    return _dispatcher
+
+
+def get_outbound() -> OutboundDispatcher:
+    if _dispatcher is None:
+        raise RuntimeError("Outbound dispatcher is not initialized")
+    return _dispatcher
+
+
+async def close_outbound() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.close()
+        _dispatcher = None
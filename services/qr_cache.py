@@ -0,0 +1,76 @@
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Callable
+
+
+CacheKey = tuple[int, int]
+
+
+@dataclass(slots=True)
+class CachedQR:
+    image: bytes
+    data: str
+    expires_at: float
+
+
+class QRCache:
+    """Заранее сгенерированные QR по ключу (tab_index, amount).
+
+    Каждый QR выдаётся только один раз и живёт не дольше ``ttl`` секунд -
+    времени жизни QR у агента. Частота запросов считается в скользящем
+    окне ``window`` секунд и определяет, какие суммы держать готовыми.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        per_key: int = 1,
+        window: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.per_key = per_key
+        self.window = window
+        self._clock = clock
+        self._entries: dict[CacheKey, deque[CachedQR]] = {}
+        self._requests: deque[tuple[float, CacheKey]] = deque()
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, tab_index: int, amount: int) -> tuple[bytes, str] | None:
+        entries = self._fresh_entries((tab_index, amount))
+        if not entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry = entries.popleft()
+        return entry.image, entry.data
+
+    def put(self, tab_index: int, amount: int, image: bytes, data: str) -> None:
+        entries = self._entries.setdefault((tab_index, amount), deque())
+        entries.append(CachedQR(image, data, self._clock() + self.ttl))
+
+    def missing(self, tab_index: int, amount: int) -> int:
+        return max(self.per_key - len(self._fresh_entries((tab_index, amount))), 0)
+
+    def record_request(self, tab_index: int, amount: int) -> None:
+        self._requests.append((self._clock(), (tab_index, amount)))
+
+    def hot_keys(self, limit: int) -> list[CacheKey]:
+        border = self._clock() - self.window
+        while self._requests and self._requests[0][0] < border:
+            self._requests.popleft()
+        counts = Counter(key for _, key in self._requests)
+        return [key for key, _ in counts.most_common(limit)]
+
+    def _fresh_entries(self, key: CacheKey) -> deque[CachedQR]:
+        entries = self._entries.get(key)
+        if entries is None:
+            return deque()
+        now = self._clock()
+        while entries and entries[0].expires_at <= now:
+            entries.popleft()
+        if not entries:
+            del self._entries[key]
+        return entries
@@ -0,0 +1,167 @@
+import json
+from collections import deque
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from utils.timing import StageTimings
+
+if TYPE_CHECKING:
+    from services.api_metrics import ApiMetrics
+
+
+STAGES = (
+    "queue_wait",
+    "chrome_start",
+    "auth",
+    "page_load",
+    "submit",
+    "image_wait",
+    "telegram_upload",
+    "total",
+)
+BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+class RollingHistogram:
+    """Последние ``size`` замеров одного этапа и счётчики за всё время.
+
+    Перцентили считаются по окну, а ``buckets``/``count``/``sum`` только
+    растут - Prometheus ждёт от гистограммы монотонных счётчиков.
+    """
+
+    def __init__(self, size: int = 500, bounds: tuple[float, ...] = BUCKETS) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+        self.bounds = bounds
+        self.count = 0
+        self.sum = 0.0
+        self._bucket_counts = [0] * len(bounds)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.sum += seconds
+        for index, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                self._bucket_counts[index] += 1
+
+    def percentile(self, percent: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def buckets(self) -> list[tuple[float, int]]:
+        return list(zip(self.bounds, self._bucket_counts))
+
+    def summary(self) -> dict:
+        return {
+            "count": len(self.samples),
+            "p50": round(self.percentile(50), 3),
+            "p90": round(self.percentile(90), 3),
+            "p99": round(self.percentile(99), 3),
+            "max": round(max(self.samples, default=0.0), 3),
+        }
+
+
+def histogram_lines(name: str, labels: str, histogram: RollingHistogram) -> list[str]:
+    """Серии ``_bucket``/``_sum``/``_count`` одной гистограммы Prometheus."""
+    lines = [
+        f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        for bound, count in histogram.buckets()
+    ]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.3f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+class QRMetrics:
+    """Скользящая статистика по этапам QR-заданий внутри воркера."""
+
+    def __init__(self, window: int = 500) -> None:
+        self.window = window
+        self.histograms: dict[str, RollingHistogram] = {}
+        self.jobs = 0
+        self.failures = 0
+        self.retries = 0
+
+    def observe(self, timings: StageTimings, *, failed: bool = False) -> None:
+        self.jobs += 1
+        if failed:
+            self.failures += 1
+        for name, seconds in timings.stages.items():
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        known = [name for name in STAGES if name in self.histograms]
+        extra = sorted(set(self.histograms) - set(STAGES))
+        return {
+            "jobs": self.jobs,
+            "failures": self.failures,
+            "retries": self.retries,
+            "stages": {
+                name: self.histograms[name].summary() for name in known + extra
+            },
+        }
+
+    def render_text(self) -> str:
+        lines = [
+            "# TYPE qr_jobs_total counter",
+            f"qr_jobs_total {self.jobs}",
+            "# TYPE qr_job_failures_total counter",
+            f"qr_job_failures_total {self.failures}",
+            "# TYPE qr_job_retries_total counter",
+            f"qr_job_retries_total {self.retries}",
+        ]
+        if self.histograms:
+            lines.append("# TYPE qr_stage_seconds histogram")
+        for name, histogram in self.histograms.items():
+            lines.extend(histogram_lines("qr_stage_seconds", f'stage="{name}"', histogram))
+        return "\n".join(lines) + "\n"
+
+
+def create_metrics_app(
+    metrics: QRMetrics,
+    api_metrics: "ApiMetrics | None" = None,
+) -> web.Application:
+    async def stats(_request: web.Request) -> web.Response:
+        return web.Response(
+            text=json.dumps(metrics.snapshot()),
+            content_type="application/json",
+        )
+
+    async def api_stats(_request: web.Request) -> web.Response:
+        return web.Response(
+            text=json.dumps(api_metrics.snapshot()),
+            content_type="application/json",
+        )
+
+    async def prometheus(_request: web.Request) -> web.Response:
+        text = metrics.render_text()
+        if api_metrics is not None:
+            text += api_metrics.render_text()
+        return web.Response(text=text)
+
+    app = web.Application()
+    app.router.add_get("/stats", stats)
+    if api_metrics is not None:
+        app.router.add_get("/api_stats", api_stats)
+    app.router.add_get("/metrics", prometheus)
+    return app
+
+
+async def start_metrics_server(
+    metrics: QRMetrics,
+    host: str,
+    port: int,
+    api_metrics: "ApiMetrics | None" = None,
+) -> web.AppRunner:
+    runner = web.AppRunner(create_metrics_app(metrics, api_metrics))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
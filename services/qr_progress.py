@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import itertools
+import math
+import statistics
+from collections import deque
+from dataclasses import dataclass, field
+
+from services.qr_queue import QRJob
+
+
+@dataclass(order=True, slots=True)
+class _Waiter:
+    sort_key: tuple[int, float, int]
+    job: QRJob = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass(slots=True)
+class QueuePosition:
+    job: QRJob
+    ahead: int
+    eta_seconds: int
+
+
+class QRProgressTracker:
+    """Очередь ожидания внутри воркера: порядок, позиция и ETA заданий.
+
+    Задания, полученные сверх ``slots``, ждут своей очереди здесь. Первыми
+    выходят задания с большим приоритетом, при равном - более ранние.
+    ETA считается по медиане последних ``window`` длительностей.
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        window: int = 20,
+        default_duration: float = 30.0,
+    ) -> None:
+        self.slots = slots
+        self.default_duration = default_duration
+        self.running = 0
+        self._waiting: list[_Waiter] = []
+        self._durations: deque[float] = deque(maxlen=window)
+        self._sequence = itertools.count()
+
+    def try_acquire(self) -> bool:
+        """Занимает слот, только если он свободен и никто не ждёт."""
+        if self.running < self.slots and not self._waiting:
+            self.running += 1
+            return True
+        return False
+
+    async def wait_turn(self, job: QRJob) -> None:
+        if self.try_acquire():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(
+            (-job.priority, job.created_at, next(self._sequence)),
+            job,
+            future,
+        )
+        heapq.heappush(self._waiting, waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._waiting.remove(waiter)
+                heapq.heapify(self._waiting)
+            raise
+
+    def release(self, duration: float | None = None) -> None:
+        if duration is not None:
+            self._durations.append(duration)
+        self.running -= 1
+        while self._waiting and self.running < self.slots:
+            waiter = heapq.heappop(self._waiting)
+            if not waiter.future.done():
+                self.running += 1
+                waiter.future.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def average_duration(self) -> float:
+        if not self._durations:
+            return self.default_duration
+        return statistics.median(self._durations)
+
+    def positions(self) -> list[QueuePosition]:
+        duration = self.average_duration()
+        result = []
+        for ahead, waiter in enumerate(sorted(self._waiting)):
+            # Сначала освобождается слот, затем генерируется сам QR.
+            rounds = math.ceil((ahead + 1) / self.slots) + 1
+            result.append(
+                QueuePosition(
+                    job=waiter.job,
+                    ahead=ahead + self.running,
+                    eta_seconds=round(rounds * duration),
+                )
+            )
+        return result
@@ -1,7 +1,11 @@
 import asyncio
 import json
+import logging
+from collections.abc import Mapping
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from typing import Protocol
+
 import aio_pika
 from aio_pika import DeliveryMode, Message
 from aio_pika.abc import (
@@ -13,11 +17,29 @@ from aio_pika.abc import (
 from config import settings
 
 
-GENERATION_QUEUE = "qr.generate"
+logger = logging.getLogger(__name__)
+
+# Очередь с приоритетами. Аргументы существующей очереди менять нельзя
+# (PRECONDITION_FAILED), поэтому у неё новое имя, а старую qr.generate без
+# приоритетов воркер дочитывает, пока она есть.
+GENERATION_QUEUE = "qr.generate.priority"
+LEGACY_GENERATION_QUEUE = "qr.generate"
 CLEANUP_DELAY_QUEUE = "qr.cleanup.delay"
 CLEANUP_QUEUE = "qr.cleanup"
-CLEANUP_DELAY_MS = 20 * 60 * 1000
+CLEANUP_DELAY_SECONDS = 20 * 60
+CLEANUP_DELAY_MS = CLEANUP_DELAY_SECONDS * 1000
 PUBLISH_TIMEOUT_SECONDS = 10
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 1
+# Смена значения требует новой очереди (см. GENERATION_QUEUE).
+MAX_PRIORITY = PRIORITY_HIGH
+# Брокер недоступен или не подтвердил публикацию вовремя - сообщение можно
+# отложить в outbox. Отказы брокера (nack, нет очереди) повтор не исправит.
+OUTBOX_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    aio_pika.exceptions.ChannelInvalidStateError,
+)
 
 
 @dataclass(slots=True)
@@ -29,6 +51,8 @@ class QRJob:
     amount: int
     tab_index: int
     attempt: int = 0
+    created_at: float = 0.0
+    priority: int = PRIORITY_NORMAL
 
     def to_bytes(self) -> bytes:
         return json.dumps(asdict(self), separators=(",", ":")).encode()
@@ -63,19 +87,61 @@ class QRCleanupTask:
         )
 
 
+@dataclass(slots=True)
+class QueueDepth:
+    messages: int
+    consumers: int
+
+
+class QROutbox(Protocol):
+    """Локальное хранилище сообщений, которые не удалось отправить в RabbitMQ."""
+
+    async def add(
+        self,
+        routing_key: str,
+        body: bytes,
+        message_type: str,
+        message_id: str | None,
+        priority: int | None,
+    ) -> None: ...
+
+    async def fetch_batch(self, limit: int) -> list[Mapping]: ...
+
+    async def delete(self, ids: list[int]) -> None: ...
+
+
 async def declare_generation_queue(
     channel: AbstractRobustChannel,
 ) -> AbstractRobustQueue:
+    arguments = {"x-queue-type": "classic", "x-max-priority": MAX_PRIORITY}
+    if settings.QR_SINGLE_ACTIVE_CONSUMER:
+        arguments["x-single-active-consumer"] = True
     return await channel.declare_queue(
         GENERATION_QUEUE,
         durable=True,
-        arguments={
-            "x-queue-type": "classic",
-            "x-single-active-consumer": True,
-        },
+        arguments=arguments,
     )
 
 
+async def open_legacy_generation_queue(
+    connection: AbstractRobustConnection,
+    prefetch_count: int,
+) -> AbstractRobustQueue | None:
+    """Старая очередь qr.generate, если она ещё есть на брокере.
+
+    Объявляется пассивно - с её аргументами; на отдельном канале, потому что
+    отсутствие очереди закрывает канал.
+    """
+    channel = await connection.channel()
+    try:
+        queue = await channel.declare_queue(LEGACY_GENERATION_QUEUE, passive=True)
+    except aio_pika.exceptions.ChannelNotFoundEntity:
+        await channel.close()
+        return None
+    await channel.set_qos(prefetch_count=prefetch_count)
+    return queue
+
+
 async def declare_cleanup_queues(
     channel: AbstractRobustChannel,
 ) -> tuple[AbstractRobustQueue, AbstractRobustQueue]:
@@ -97,12 +163,38 @@ async def declare_cleanup_queues(
     return delay_queue, cleanup_queue
 
 
+async def connect_rabbitmq() -> AbstractRobustConnection:
+    return await aio_pika.connect_robust(
+        host=settings.RABBITMQ_HOST,
+        port=settings.RABBITMQ_PORT,
+        login=settings.RABBITMQ_USER,
+        password=settings.RABBITMQ_PASSWORD.get_secret_value(),
+        virtualhost=settings.RABBITMQ_VHOST,
+        timeout=PUBLISH_TIMEOUT_SECONDS,
+    )
+
+
 class QRQueueClient:
-    def __init__(self) -> None:
+    """Публикует сообщения без ожидания подтверждения предыдущих.
+
+    aiormq сопоставляет подтверждения с delivery tag, поэтому публикации
+    на одном канале идут параллельно; ``publish_window`` ограничивает
+    число неподтверждённых сообщений. Если брокер недоступен (``OUTBOX_ERRORS``),
+    а ``outbox`` задан, сообщение сохраняется и отправляется позже
+    ``flush_outbox``; остальные ошибки публикации выбрасываются.
+    """
+
+    def __init__(
+        self,
+        outbox: QROutbox | None = None,
+        publish_window: int = 100,
+    ) -> None:
         self.connection: AbstractRobustConnection | None = None
         self.channel: AbstractRobustChannel | None = None
+        self.outbox = outbox
+        self.outstanding = 0
         self._connect_lock = asyncio.Lock()
-        self._publish_lock = asyncio.Lock()
+        self._publish_window = asyncio.Semaphore(publish_window)
 
     async def connect(self) -> None:
         async with self._connect_lock:
@@ -117,14 +209,7 @@ class QRQueueClient:
             if self.connection and not self.connection.is_closed:
                 await self.connection.close()
 
-            connection = await aio_pika.connect_robust(
-                host=settings.RABBITMQ_HOST,
-                port=settings.RABBITMQ_PORT,
-                login=settings.RABBITMQ_USER,
-                password=settings.RABBITMQ_PASSWORD.get_secret_value(),
-                virtualhost=settings.RABBITMQ_VHOST,
-                timeout=PUBLISH_TIMEOUT_SECONDS,
-            )
+            connection = await connect_rabbitmq()
             try:
                 channel = await connection.channel(
                     publisher_confirms=True,
@@ -140,22 +225,114 @@ class QRQueueClient:
             self.channel = channel
 
     async def publish_job(self, job: QRJob) -> None:
-        await self.connect()
-        await self._publish(
+        await self._publish_or_store(
             routing_key=GENERATION_QUEUE,
             body=job.to_bytes(),
             message_id=job.job_id,
             message_type="qr.generate",
+            priority=job.priority,
         )
 
-    async def publish_cleanup(self, task: QRCleanupTask) -> None:
+    async def get_generation_depth(self) -> QueueDepth:
         await self.connect()
-        await self._publish(
-            routing_key=CLEANUP_DELAY_QUEUE,
-            body=task.to_bytes(),
-            message_type="qr.cleanup",
+        queue = await self.channel.declare_queue(GENERATION_QUEUE, passive=True)
+        result = queue.declaration_result
+        return QueueDepth(
+            messages=result.message_count,
+            consumers=result.consumer_count,
         )
 
+    async def flush_outbox(self, limit: int = 100) -> int:
+        """Отправляет накопленные сообщения; возвращает число отправленных."""
+        rows = await self.outbox.fetch_batch(limit)
+        if not rows:
+            return 0
+
+        await self.connect()
+        results = await asyncio.gather(
+            *(
+                self._publish(
+                    # Задания, сохранённые до переименования очереди.
+                    routing_key=(
+                        GENERATION_QUEUE
+                        if row["routing_key"] == LEGACY_GENERATION_QUEUE
+                        else row["routing_key"]
+                    ),
+                    body=bytes(row["body"]),
+                    message_type=row["message_type"],
+                    message_id=row["message_id"],
+                    priority=row["priority"],
+                )
+                for row in rows
+            ),
+            return_exceptions=True,
+        )
+        sent = []
+        dropped = []
+        for row, result in zip(rows, results):
+            if result is None:
+                sent.append(row["id"])
+            elif not isinstance(result, OUTBOX_ERRORS):
+                logger.error(
+                    "Брокер отклонил %s message_id=%s из outbox, сообщение удалено: %s",
+                    row["message_type"],
+                    row["message_id"],
+                    result,
+                )
+                dropped.append(row["id"])
+        if sent or dropped:
+            await self.outbox.delete([*sent, *dropped])
+        if sent:
+            logger.info("Из outbox отправлено сообщений: %s", len(sent))
+        if len(sent) + len(dropped) < len(rows):
+            logger.warning(
+                "Не отправлено из outbox: %s, повтор позже",
+                len(rows) - len(sent) - len(dropped),
+            )
+        return len(sent)
+
+    async def flush_outbox_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_outbox()
+            except Exception:
+                logger.warning("RabbitMQ недоступен, outbox ждёт", exc_info=True)
+
+    async def _publish_or_store(
+        self,
+        *,
+        routing_key: str,
+        body: bytes,
+        message_type: str,
+        message_id: str | None = None,
+        priority: int | None = None,
+    ) -> None:
+        try:
+            await self.connect()
+            await self._publish(
+                routing_key=routing_key,
+                body=body,
+                message_type=message_type,
+                message_id=message_id,
+                priority=priority,
+            )
+        except OUTBOX_ERRORS:
+            if self.outbox is None:
+                raise
+            logger.warning(
+                "RabbitMQ недоступен, %s сохранено в outbox",
+                message_type,
+                exc_info=True,
+            )
+            await self.outbox.add(
+                routing_key,
+                body,
+                message_type,
+                message_id,
+                priority,
+            )
+
     async def _publish(
         self,
         *,
@@ -163,27 +340,35 @@ class QRQueueClient:
         body: bytes,
         message_type: str,
         message_id: str | None = None,
+        priority: int | None = None,
     ) -> None:
         if not self.channel or self.channel.is_closed:
-            raise RuntimeError("RabbitMQ channel is not available")
+            raise aio_pika.exceptions.ChannelInvalidStateError(
+                "RabbitMQ channel is not available"
+            )
 
         message = Message(
             body,
             content_type="application/json",
             delivery_mode=DeliveryMode.PERSISTENT,
             message_id=message_id,
+            priority=priority,
             timestamp=datetime.now(timezone.utc),
             type=message_type,
         )
-        async with self._publish_lock:
-            await asyncio.wait_for(
-                self.channel.default_exchange.publish(
-                    message,
-                    routing_key=routing_key,
-                    mandatory=True,
-                ),
-                timeout=PUBLISH_TIMEOUT_SECONDS,
-            )
+        async with self._publish_window:
+            self.outstanding += 1
+            try:
+                await asyncio.wait_for(
+                    self.channel.default_exchange.publish(
+                        message,
+                        routing_key=routing_key,
+                        mandatory=True,
+                    ),
+                    timeout=PUBLISH_TIMEOUT_SECONDS,
+                )
+            finally:
+                self.outstanding -= 1
 
     async def close(self) -> None:
         if self.connection and not self.connection.is_closed:
@@ -193,9 +378,12 @@ class QRQueueClient:
 _client: QRQueueClient | None = None
 
 
-async def init_qr_queue() -> QRQueueClient:
+async def init_qr_queue(outbox: QROutbox | None = None) -> QRQueueClient:
     global _client
-    client = QRQueueClient()
+    client = QRQueueClient(
+        outbox=outbox,
+        publish_window=settings.QR_PUBLISH_WINDOW,
+    )
     _client = client
     await client.connect()
     return client
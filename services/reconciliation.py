@@ -0,0 +1,113 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from operator import itemgetter
+from typing import Iterable
+
+
+CENT = Decimal("0.01")
+
+
+@dataclass(slots=True)
+class MatchResult:
+    matched: list[tuple[dict, dict]] = field(default_factory=list)
+    only_in_file: list[dict] = field(default_factory=list)
+    only_in_db: list[dict] = field(default_factory=list)
+
+    @property
+    def matched_file_operations(self) -> list[dict]:
+        return [file_op for file_op, _ in self.matched]
+
+
+def normalize_amount(value) -> Decimal:
+    """1500, 1500.0, "1500,00" и Decimal("1500.00") дают один ключ."""
+    if isinstance(value, str):
+        value = value.replace(" ", "").replace(",", ".")
+    return Decimal(str(value)).quantize(CENT)
+
+
+def _naive(value: datetime | None) -> datetime:
+    if value is None:
+        return datetime.min
+    if value.tzinfo is not None:
+        # Выгрузка банка может прийти с часовым поясом, БД хранит локальное время.
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _bucket(
+    operations: Iterable[dict],
+    time_key: str,
+) -> dict[Decimal, list[tuple[datetime, dict]]]:
+    buckets: dict[Decimal, list[tuple[datetime, dict]]] = defaultdict(list)
+    # Сумм намного меньше, чем операций: нормализуем каждую один раз.
+    keys: dict = {}
+    for op in operations:
+        amount = op["amount"]
+        key = keys.get(amount)
+        if key is None:
+            key = keys[amount] = normalize_amount(amount)
+        buckets[key].append((_naive(op.get(time_key)), op))
+    return buckets
+
+
+def reconcile(
+    file_operations: list[dict],
+    db_operations: list[dict],
+    *,
+    window: timedelta | None = None,
+    file_time_key: str = "datetime",
+    db_time_key: str = "timestamp",
+) -> MatchResult:
+    """Сопоставляет операции выписки и БД по сумме и ближайшему времени.
+
+    Обе стороны один раз раскладываются по нормализованной сумме; внутри
+    суммы операции сортируются по времени и сводятся двумя указателями.
+    Пара засчитывается, если время отличается не больше ``window``
+    (``None`` - сопоставление только по сумме). Сложность O(n log n) из-за
+    сортировки внутри сумм, без повторных проходов по спискам.
+    """
+    result = MatchResult()
+    file_buckets = _bucket(file_operations, file_time_key)
+    db_buckets = _bucket(db_operations, db_time_key)
+
+    for amount, file_side in file_buckets.items():
+        db_side = db_buckets.pop(amount, None)
+        if not db_side:
+            result.only_in_file.extend(op for _, op in file_side)
+            continue
+        _merge(file_side, db_side, window, result)
+
+    for db_side in db_buckets.values():
+        result.only_in_db.extend(op for _, op in db_side)
+
+    return result
+
+
+def _merge(
+    file_side: list[tuple[datetime, dict]],
+    db_side: list[tuple[datetime, dict]],
+    window: timedelta | None,
+    result: MatchResult,
+) -> None:
+    file_side.sort(key=itemgetter(0))
+    db_side.sort(key=itemgetter(0))
+
+    i = j = 0
+    while i < len(file_side) and j < len(db_side):
+        file_time, file_op = file_side[i]
+        db_time, db_op = db_side[j]
+        if window is None or abs(file_time - db_time) <= window:
+            result.matched.append((file_op, db_op))
+            i += 1
+            j += 1
+        elif file_time < db_time:
+            result.only_in_file.append(file_op)
+            i += 1
+        else:
+            result.only_in_db.append(db_op)
+            j += 1
+
+    result.only_in_file.extend(op for _, op in file_side[i:])
+    result.only_in_db.extend(op for _, op in db_side[j:])
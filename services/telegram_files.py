@@ -0,0 +1,72 @@
+import asyncio
+import errno
+import os
+import shutil
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.client.telegram import (
+    PRODUCTION,
+    BareFilesPathWrapper,
+    SimpleFilesPathWrapper,
+    TelegramAPIServer,
+)
+
+from config import settings
+
+
+def create_api_server() -> TelegramAPIServer:
+    """Сервер Bot API из настроек: api.telegram.org или свой ``telegram-bot-api``.
+
+    Если сервер видит файлы по другому пути, чем бот (например, в соседнем
+    контейнере), ``BOT_API_SERVER_FILES_DIR`` переводится в
+    ``BOT_API_LOCAL_FILES_DIR``.
+    """
+    if not settings.BOT_API_SERVER_URL:
+        return PRODUCTION
+    wrapper = BareFilesPathWrapper()
+    if settings.BOT_API_SERVER_FILES_DIR and settings.BOT_API_LOCAL_FILES_DIR:
+        wrapper = SimpleFilesPathWrapper(
+            Path(settings.BOT_API_SERVER_FILES_DIR),
+            Path(settings.BOT_API_LOCAL_FILES_DIR),
+        )
+    return TelegramAPIServer.from_base(
+        settings.BOT_API_SERVER_URL.rstrip("/"),
+        is_local=settings.BOT_API_LOCAL_MODE,
+        wrap_local_file=wrapper,
+    )
+
+
+def place_local_file(source: str | Path, destination: str | Path) -> None:
+    """Кладёт файл локального сервера в наше хранилище без копирования.
+
+    Жёсткая ссылка работает в пределах одной файловой системы; на другой
+    файловой системе файл копируется. Исходный файл остаётся у сервера -
+    он отдаёт тот же путь на повторные ``getFile`` по этому ``file_id``.
+    """
+    try:
+        os.unlink(destination)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(source, destination)
+        return
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+    shutil.copyfile(source, destination)
+
+
+async def save_telegram_file(bot: Bot, file_id: str, destination: str | Path) -> None:
+    """Сохраняет файл Telegram по ``file_id`` в ``destination``.
+
+    С локальным сервером (``--local``) ``getFile`` отдаёт путь на диске -
+    файл забирается оттуда ссылкой, без скачивания по HTTP.
+    """
+    file = await bot.get_file(file_id)
+    api = bot.session.api
+    if api.is_local:
+        source = api.wrap_local_file.to_local(file.file_path)
+        await asyncio.to_thread(place_local_file, source, destination)
+    else:
+        await bot.download_file(file.file_path, destination)
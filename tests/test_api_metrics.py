@@ -0,0 +1,60 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import DeleteMessage, SendDocument
+from aiogram.types import BufferedInputFile
+
+from handlers.admin import format_api_stats
+from services.api_metrics import ApiMetrics, ApiMetricsMiddleware
+
+
+@pytest.mark.asyncio
+async def test_middleware_counts_calls_uploads_and_flood():
+    metrics = ApiMetrics()
+    middleware = ApiMetricsMiddleware(metrics)
+    delete = DeleteMessage(chat_id=1, message_id=2)
+    document = SendDocument(
+        chat_id=1, document=BufferedInputFile(b"x" * 2048, filename="report.xlsx")
+    )
+
+    await middleware(AsyncMock(return_value=True), None, delete)
+    await middleware(AsyncMock(return_value=True), None, document)
+    with pytest.raises(TelegramRetryAfter):
+        await middleware(
+            AsyncMock(side_effect=TelegramRetryAfter(method=delete, message="Flood", retry_after=7)),
+            None,
+            delete,
+        )
+    with pytest.raises(TelegramBadRequest):
+        await middleware(
+            AsyncMock(side_effect=TelegramBadRequest(method=delete, message="not found")),
+            None,
+            delete,
+        )
+
+    stats = metrics.snapshot()["methods"]
+    assert stats["deleteMessage"]["calls"] == 3
+    assert stats["deleteMessage"]["errors"] == 2
+    assert stats["deleteMessage"]["flood"] == 1
+    assert stats["deleteMessage"]["retry_after"] == 7
+    assert stats["sendDocument"]["bytes_up"] == 2048
+
+
+def test_render_text_and_admin_summary():
+    metrics = ApiMetrics()
+    metrics.observe("sendMessage", 0.2)
+    metrics.observe("getUpdates", 10.0)
+    metrics.observe_download(4096)
+
+    text = metrics.render_text()
+    assert 'bot_api_calls_total{method="sendMessage"} 1' in text
+    assert 'bot_api_seconds_bucket{method="sendMessage",le="0.25"} 1' in text
+    assert "bot_api_download_bytes_total 4096" in text
+    assert text.count("# TYPE bot_api_calls_total counter") == 1
+    assert "# TYPE bot_api_seconds histogram" in text
+
+    summary = format_api_stats("Bot API: бот", metrics.snapshot())
+    assert "<code>sendMessage</code>: 1, 200 / 200" in summary
+    assert "getUpdates" not in summary
+    assert "Скачано: 1 файлов, 4 КБ" in summary
@@ -0,0 +1,40 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import DeleteMessage, SendDocument, SendMediaGroup, SendPhoto
+from aiogram.types import BufferedInputFile, InputMediaPhoto
+
+from services.bot_session import TunedAiohttpSession, create_bot_session, has_upload
+
+
+def test_factory_tunes_connector():
+    session = create_bot_session(limit=40, keepalive_timeout=30, dns_cache_ttl=300)
+
+    assert session._connector_init["limit"] == 40
+    assert session._connector_init["keepalive_timeout"] == 30
+    assert session._connector_init["ttl_dns_cache"] == 300
+
+
+def test_has_upload_only_for_file_bodies():
+    upload = BufferedInputFile(b"xlsx", filename="report.xlsx")
+
+    assert has_upload(SendDocument(chat_id=1, document=upload))
+    assert has_upload(SendMediaGroup(chat_id=1, media=[InputMediaPhoto(media=upload)]))
+    assert not has_upload(SendPhoto(chat_id=1, photo="file-id"))
+    assert not has_upload(DeleteMessage(chat_id=1, message_id=2))
+
+
+@pytest.mark.asyncio
+async def test_timeout_class_depends_on_method(monkeypatch):
+    parent = AsyncMock(return_value=True)
+    monkeypatch.setattr(AiohttpSession, "make_request", parent)
+    session = TunedAiohttpSession(timeout=5, upload_timeout=90)
+    upload = BufferedInputFile(b"xlsx", filename="report.xlsx")
+
+    await session.make_request(None, DeleteMessage(chat_id=1, message_id=2))
+    await session.make_request(None, SendDocument(chat_id=1, document=upload))
+    await session.make_request(None, DeleteMessage(chat_id=1, message_id=2), timeout=40)
+
+    timeouts = [call.kwargs["timeout"] for call in parent.await_args_list]
+    assert timeouts == [5, 90, 40]
@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from aiogram.types import Chat, Message, Update, User
+
+from middlewares.chat_actor import ChatActorMiddleware
+from states import CheckStates
+
+
+def chat_data(chat_id: int, storage: MemoryStorage | None = None) -> dict:
+    data = {"event_chat": SimpleNamespace(id=chat_id)}
+    if storage is not None:
+        data["state"] = FSMContext(
+            storage=storage,
+            key=StorageKey(bot_id=42, chat_id=chat_id, user_id=1),
+        )
+    return data
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_run_in_order_other_chats_in_parallel():
+    middleware = ChatActorMiddleware()
+    finished = []
+
+    def handler(name: str, delay: float):
+        async def handle(event, data):
+            await asyncio.sleep(delay)
+            finished.append(name)
+            return name
+        return handle
+
+    results = await asyncio.gather(
+        middleware(handler("a1", 0.05), None, chat_data(-1)),
+        middleware(handler("a2", 0.0), None, chat_data(-1)),
+        middleware(handler("b1", 0.01), None, chat_data(-2)),
+    )
+
+    assert results == ["a1", "a2", "b1"]
+    assert finished == ["b1", "a1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_state_writes_of_one_update_are_coalesced():
+    storage = MemoryStorage()
+    writes = []
+    set_data = storage.set_data
+
+    async def counting_set_data(key, data):
+        writes.append(dict(data))
+        await set_data(key=key, data=data)
+
+    storage.set_data = counting_set_data
+    middleware = ChatActorMiddleware()
+
+    async def handler(event, data):
+        state = data["state"]
+        await state.update_data(queue=[1])
+        await state.update_data(queue=[1, 2], processing=True)
+        await state.set_state(CheckStates.waiting_for_amount)
+        return await state.get_data()
+
+    seen = await middleware(handler, None, chat_data(-1, storage))
+
+    assert seen == {"queue": [1, 2], "processing": True}
+    assert writes == [{"queue": [1, 2], "processing": True}]
+    key = StorageKey(bot_id=42, chat_id=-1, user_id=1)
+    assert await storage.get_state(key) == CheckStates.waiting_for_amount.state
+
+
+@pytest.mark.asyncio
+async def test_slow_handler_is_released_and_idle_actor_removed():
+    middleware = ChatActorMiddleware(idle_timeout=0.05, hold_timeout=0.05)
+    release = asyncio.Event()
+
+    async def slow(event, data):
+        await release.wait()
+        return "slow"
+
+    async def fast(event, data):
+        return "fast"
+
+    slow_call = asyncio.create_task(middleware(slow, None, chat_data(-1)))
+    assert await asyncio.wait_for(middleware(fast, None, chat_data(-1)), timeout=1) == "fast"
+
+    release.set()
+    assert await slow_call == "slow"
+    await asyncio.sleep(0.1)
+    assert middleware.actors == {}
+
+
+@pytest.mark.asyncio
+async def test_handler_error_reaches_dispatcher():
+    middleware = ChatActorMiddleware()
+
+    async def broken(event, data):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        await middleware(broken, None, chat_data(-1))
+
+
+@pytest.mark.asyncio
+async def test_released_handler_writes_are_not_overwritten():
+    storage = MemoryStorage()
+    middleware = ChatActorMiddleware(hold_timeout=0.2)
+    release = asyncio.Event()
+
+    async def slow(event, data):
+        await release.wait()
+        await data["state"].update_data(results_queue=["done"])
+
+    async def fast(event, data):
+        await data["state"].get_data()
+        release.set()
+        await asyncio.sleep(0.05)
+        await data["state"].update_data(queue=[2])
+
+    await asyncio.gather(
+        middleware(slow, None, chat_data(-1, storage)),
+        middleware(fast, None, chat_data(-1, storage)),
+    )
+
+    key = StorageKey(bot_id=42, chat_id=-1, user_id=1)
+    assert await storage.get_data(key) == {"results_queue": ["done"], "queue": [2]}
+
+
+def text_update(update_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=-100, type="supergroup"),
+            from_user=User(id=1, is_bot=False, first_name="Оператор"),
+            text=text,
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_state_filter_sees_state_set_by_previous_update():
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(ChatActorMiddleware())
+    router = Router()
+    handled = []
+
+    @router.message(Command("check"))
+    async def start_check(message: Message, state: FSMContext):
+        await asyncio.sleep(0.1)
+        await state.set_state(CheckStates.waiting_for_file)
+        handled.append("check")
+
+    @router.message(StateFilter(CheckStates.waiting_for_file))
+    async def receive_file(message: Message):
+        handled.append("file")
+
+    @router.message()
+    async def fallback(message: Message):
+        handled.append("fallback")
+
+    dp.include_router(router)
+    bot = Bot(token="42:TEST")
+
+    await asyncio.gather(
+        dp.feed_update(bot, text_update(1, "/check")),
+        dp.feed_update(bot, text_update(2, "чек")),
+    )
+    await bot.session.close()
+
+    assert handled == ["check", "file"]
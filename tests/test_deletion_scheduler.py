@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, call
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+
+from services import deletion_scheduler
+from services.deletion_scheduler import DeletionScheduler
+
+
+def due_rows(*pairs):
+    return [
+        {"id": message_id * 100, "chat_id": chat_id, "message_id": message_id}
+        for chat_id, message_id in pairs
+    ]
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    fake = SimpleNamespace(
+        claim_due=AsyncMock(),
+        schedule=AsyncMock(),
+        reschedule=AsyncMock(),
+        delete=AsyncMock(),
+    )
+    monkeypatch.setattr(deletion_scheduler, "ScheduledDeletionRepo", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_due_messages_are_deleted_in_one_call_per_chat(repo):
+    repo.claim_due.return_value = due_rows((-1, 10), (-2, 20), (-1, 11))
+    bot = SimpleNamespace(delete_messages=AsyncMock())
+
+    assert await DeletionScheduler(bot, lease_seconds=120).run_once() == 3
+
+    repo.claim_due.assert_awaited_once_with(1000, 120)
+    assert bot.delete_messages.await_args_list == [
+        call(chat_id=-1, message_ids=[10, 11]),
+        call(chat_id=-2, message_ids=[20]),
+    ]
+    assert repo.delete.await_args_list == [call([1000, 1100]), call([2000])]
+
+
+@pytest.mark.asyncio
+async def test_large_batches_are_split_by_api_limit(repo):
+    repo.claim_due.return_value = due_rows(*((-1, index) for index in range(150)))
+    bot = SimpleNamespace(delete_messages=AsyncMock())
+
+    await DeletionScheduler(bot).run_once()
+
+    sizes = [
+        len(deletion.kwargs["message_ids"])
+        for deletion in bot.delete_messages.await_args_list
+    ]
+    assert sizes == [100, 50]
+
+
+@pytest.mark.asyncio
+async def test_network_errors_reschedule_deletion(repo):
+    repo.claim_due.return_value = due_rows((-1, 10), (-2, 20))
+    bot = SimpleNamespace(
+        delete_messages=AsyncMock(
+            side_effect=[
+                TelegramNetworkError(method=None, message="timeout"),
+                TelegramForbiddenError(method=None, message="bot was kicked"),
+            ]
+        )
+    )
+
+    await DeletionScheduler(bot, retry_delay=30).run_once()
+
+    repo.reschedule.assert_awaited_once_with([1000], 30)
+    repo.delete.assert_awaited_once_with([2000])
+    repo.schedule.assert_not_awaited()
+
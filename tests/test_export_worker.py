@@ -0,0 +1,338 @@
+import asyncio
+from contextlib import AbstractAsyncContextManager
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+from aiogram.methods import SendDocument
+
+import export_worker
+from services.export_queue import (
+    COMPARE_TXT,
+    EXPORT,
+    EXPORT_QUEUE,
+    EXPORT_RETRY_QUEUE,
+    ExportJob,
+    ExportQueueClient,
+    declare_export_queues,
+)
+from services.exports import (
+    ExportError,
+    ExportResult,
+    build_txt_comparison,
+    parse_excel_operations,
+)
+
+
+class MessageProcessContext(AbstractAsyncContextManager):
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+def incoming_message(body: bytes):
+    return SimpleNamespace(
+        body=body,
+        process=MagicMock(return_value=MessageProcessContext()),
+    )
+
+
+def make_job(kind: str = EXPORT, file_id: str | None = None) -> ExportJob:
+    return ExportJob(
+        job_id="job-id",
+        kind=kind,
+        chat_id=-100,
+        status_message_id=11,
+        start_date=ExportJob.format_date(datetime(2026, 1, 12)),
+        end_date=ExportJob.format_date(datetime(2026, 1, 13)),
+        file_id=file_id,
+    )
+
+
+def test_export_job_round_trip():
+    job = make_job(COMPARE_TXT, file_id="file-id")
+
+    restored = ExportJob.from_bytes(job.to_bytes())
+
+    assert restored == job
+    assert restored.period() == (datetime(2026, 1, 12), datetime(2026, 1, 13))
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"job_id":"x","kind":"drop","chat_id":1,"status_message_id":2}',
+        b'{"job_id":"x","kind":"compare","chat_id":1,"status_message_id":2}',
+        b"[]",
+    ],
+)
+def test_export_job_rejects_invalid_body(body):
+    with pytest.raises(ValueError):
+        ExportJob.from_bytes(body)
+
+
+@pytest.mark.asyncio
+async def test_retry_queue_dead_letters_back_to_export_queue():
+    channel = AsyncMock()
+
+    await declare_export_queues(channel)
+
+    channel.declare_queue.assert_any_await(
+        EXPORT_RETRY_QUEUE,
+        durable=True,
+        arguments={
+            "x-queue-type": "classic",
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": EXPORT_QUEUE,
+        },
+    )
+
+
+@pytest.mark.asyncio
+async def test_delayed_job_is_published_to_retry_queue_with_ttl():
+    publish = AsyncMock()
+    client = ExportQueueClient()
+    client.channel = SimpleNamespace(
+        is_closed=False,
+        default_exchange=SimpleNamespace(publish=publish),
+    )
+    client.connect = AsyncMock()
+
+    await client.publish_job(make_job())
+    await client.publish_job(make_job(), delay=20)
+
+    now, later = publish.await_args_list
+    assert now.kwargs["routing_key"] == EXPORT_QUEUE
+    assert now.args[0].expiration is None
+    assert later.kwargs["routing_key"] == EXPORT_RETRY_QUEUE
+    assert later.args[0].properties.expiration == "20000"
+
+
+@pytest.mark.asyncio
+async def test_worker_sends_document_and_removes_status(monkeypatch):
+    bot = AsyncMock()
+    build = AsyncMock(
+        return_value=ExportResult(
+            text="📊 Отчет",
+            document=b"xlsx",
+            filename="report.xlsx",
+        )
+    )
+    monkeypatch.setattr(export_worker, "build_chat_export", build)
+    worker = export_worker.ExportWorker(bot, SimpleNamespace())
+
+    await worker.process_job(incoming_message(make_job().to_bytes()))
+
+    build.assert_awaited_once_with(
+        -100, datetime(2026, 1, 12), datetime(2026, 1, 13)
+    )
+    sent = bot.send_document.await_args.kwargs
+    assert sent["chat_id"] == -100
+    assert sent["caption"] == "📊 Отчет"
+    assert sent["document"].filename == "report.xlsx"
+    bot.delete_message.assert_awaited_once_with(chat_id=-100, message_id=11)
+
+
+@pytest.mark.asyncio
+async def test_worker_shows_build_error_in_status(monkeypatch):
+    bot = AsyncMock()
+    bot.download.return_value = BytesIO(b"")
+    monkeypatch.setattr(
+        export_worker,
+        "build_txt_comparison",
+        AsyncMock(side_effect=ExportError("❌ В файле не найдено корректных операций")),
+    )
+    worker = export_worker.ExportWorker(bot, SimpleNamespace())
+
+    await worker.process_job(
+        incoming_message(make_job(COMPARE_TXT, file_id="file-id").to_bytes())
+    )
+
+    bot.download.assert_awaited_once_with("file-id")
+    bot.send_document.assert_not_awaited()
+    edited = bot.edit_message_text.await_args.kwargs
+    assert edited["text"] == "❌ В файле не найдено корректных операций"
+    assert edited["message_id"] == 11
+
+
+def report_result() -> ExportResult:
+    return ExportResult(text="📊 Отчет", document=b"xlsx", filename="report.xlsx")
+
+
+@pytest.mark.asyncio
+async def test_worker_acks_job_rejected_by_telegram(monkeypatch):
+    bot = AsyncMock()
+    bot.send_document.side_effect = TelegramForbiddenError(
+        method=SendDocument(chat_id=-100, document="x"),
+        message="Forbidden: bot was kicked from the supergroup chat",
+    )
+    bot.edit_message_text.side_effect = bot.send_document.side_effect
+    monkeypatch.setattr(export_worker, "build_chat_export", AsyncMock(return_value=report_result()))
+    queue_client = SimpleNamespace(publish_job=AsyncMock())
+    worker = export_worker.ExportWorker(bot, queue_client)
+
+    await worker.process_job(incoming_message(make_job().to_bytes()))
+
+    bot.edit_message_text.assert_awaited_once()
+    queue_client.publish_job.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_worker_defers_retry_on_network_error_until_limit(monkeypatch):
+    bot = AsyncMock()
+    bot.send_document.side_effect = TelegramNetworkError(
+        method=SendDocument(chat_id=-100, document="x"), message="timeout"
+    )
+    monkeypatch.setattr(export_worker, "build_chat_export", AsyncMock(return_value=report_result()))
+    queue_client = SimpleNamespace(publish_job=AsyncMock())
+    worker = export_worker.ExportWorker(bot, queue_client)
+
+    # Пауза перед повтором - TTL в очереди, а не sleep внутри обработки.
+    await asyncio.wait_for(
+        worker.process_job(incoming_message(make_job().to_bytes())),
+        timeout=1,
+    )
+
+    retried = queue_client.publish_job.await_args.args[0]
+    assert retried.attempt == 1
+    assert queue_client.publish_job.await_args.kwargs["delay"] == (
+        export_worker.RETRY_DELAY_SECONDS
+    )
+    bot.edit_message_text.assert_not_awaited()
+
+    retried.attempt = export_worker.MAX_ATTEMPTS - 1
+    await worker.process_job(incoming_message(retried.to_bytes()))
+
+    queue_client.publish_job.assert_awaited_once()
+    edited = bot.edit_message_text.await_args.kwargs
+    assert edited["text"] == "❌ Не удалось отправить отчет, попробуйте позже"
+
+
+@pytest.mark.asyncio
+async def test_txt_comparison_rejects_file_for_other_day():
+    content = "КА;tx-1;11.01.2026 10:00:00;check;1500,00\n".encode()
+
+    with pytest.raises(ExportError, match="Файл не за тот день"):
+        await build_txt_comparison(
+            content,
+            datetime(2026, 1, 12),
+            datetime(2026, 1, 13),
+        )
+
+
+@pytest.mark.asyncio
+async def test_txt_comparison_reports_full_match(monkeypatch):
+    content = "КА;tx-1;12.01.2026 10:00:00;check;1500,00\n".encode()
+    monkeypatch.setattr(
+        "services.exports.OperationRepo.get_all_checks_by_date",
+        AsyncMock(return_value=[{"amount": 1500}]),
+    )
+
+    result = await build_txt_comparison(
+        content,
+        datetime(2026, 1, 12),
+        datetime(2026, 1, 13),
+    )
+
+    assert result.document is None
+    assert "Все операции совпали" in result.text
+
+
+def test_parse_excel_operations_filters_and_deduplicates():
+    import pandas as pd
+
+    buffer = BytesIO()
+    pd.DataFrame({
+        "Дата и время регистрации заказа": [
+            "2026-01-12 10:00:00",
+            "Дата и время регистрации заказа",
+            "2026-01-12 11:00:00",
+            "2026-01-12 12:00:00",
+            "2026-01-13 09:00:00",
+            "2026-01-12 10:00:00",
+        ],
+        "Номер заказа": ["a", "Номер заказа", "b", "c", "d", "a "],
+        "Статус заказа": ["CAPTURED", "Статус заказа", "declined", "captured", "captured", "captured"],
+        "Сумма заказа": ["1 500,50 ₽", "Сумма заказа", "200", "abc", "300", "1500.5"],
+    }).to_excel(buffer, index=False)
+
+    operations = parse_excel_operations(buffer.getvalue(), date(2026, 1, 12))
+
+    assert [(op["transaction_id"], op["amount"]) for op in operations] == [
+        ("a", Decimal("1500.50")),
+    ]
+    assert operations[0]["datetime"] == datetime(2026, 1, 12, 10)
+
+
+@pytest.mark.asyncio
+async def test_comparison_report_takes_contractor_from_rows(monkeypatch):
+    from openpyxl import load_workbook
+
+    from utils import excel
+
+    lookup = AsyncMock()
+    monkeypatch.setattr(excel.BalanceRepo, "get_contractor_name", lookup)
+    only_in_db = [
+        {
+            "operation_id": i,
+            "balance_id": i,
+            "username": "operator",
+            "amount": Decimal("1500.00"),
+            "timestamp": datetime(2026, 1, 12, 10),
+            "contractor": f"КА {i}",
+        }
+        for i in range(3)
+    ]
+
+    buffer = await excel.export_comparison_report(only_in_file=[], only_in_db=only_in_db)
+
+    sheet = load_workbook(buffer).active
+    assert [sheet.cell(row=row, column=4).value for row in range(2, 5)] == [
+        "КА 0",
+        "КА 1",
+        "КА 2",
+    ]
+    lookup.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_full_export_loads_commissions_in_one_query(monkeypatch):
+    from openpyxl import load_workbook
+
+    from utils import excel
+
+    balances = [
+        {
+            "id": i,
+            "name": f"КА {i}",
+            "commission_percent": Decimal("1.5"),
+            "balance_rub": Decimal("100"),
+            "balance_usdt": Decimal("1"),
+            "created_at": datetime(2026, 1, 1),
+            "updated_at": datetime(2026, 1, 2),
+        }
+        for i in range(3)
+    ]
+    monkeypatch.setattr(excel.BalanceRepo, "get_all", AsyncMock(return_value=balances))
+    monkeypatch.setattr(excel.OperationRepo, "get_operations", AsyncMock(return_value=[]))
+    per_balance = AsyncMock()
+    monkeypatch.setattr(excel.OperationRepo, "get_commissions_operations", per_balance)
+    grouped = AsyncMock(return_value={0: 12.5, 2: 3.0})
+    monkeypatch.setattr(excel.OperationRepo, "get_commissions_by_balance", grouped)
+
+    buffer = await excel.export_to_excel(chat_id=None)
+
+    grouped.assert_awaited_once_with(None, None)
+    per_balance.assert_not_awaited()
+    sheets = load_workbook(buffer).worksheets
+    commissions = [
+        row[4] for sheet in sheets for row in sheet.iter_rows(min_row=2, values_only=True)
+        if row and row[0] in {"КА 0", "КА 1", "КА 2"}
+    ]
+    assert commissions == [12.5, 0, 3.0]
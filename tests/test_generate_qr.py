@@ -0,0 +1,183 @@
+import base64
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from aiohttp import BasicAuth, web
+from aiohttp.test_utils import TestServer
+
+from utils.generate_qr import (
+    AuthenticationError,
+    FallbackBackend,
+    HTTPBackend,
+    QRBackend,
+    QRGenerationError,
+    SiteUnavailableError,
+)
+
+
+PNG = b"\x89PNG fake image"
+SESSION_COOKIE = "agent_session"
+
+
+class AgentStub:
+    """Имитирует эндпоинты страницы агента: вход и создание QR."""
+
+    def __init__(self) -> None:
+        self.logins = 0
+        self.requests: list[dict] = []
+        self.expire_next_request = False
+        self.status = 200
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/lk/login", self.login)
+        app.router.add_post("/api/lk/qr", self.create_qr)
+        return app
+
+    async def login(self, request: web.Request) -> web.Response:
+        header = request.headers.get("Authorization", "")
+        if BasicAuth.decode(header) != BasicAuth("login", "pass"):
+            raise web.HTTPUnauthorized()
+        self.logins += 1
+        response = web.Response(text="ok")
+        response.set_cookie(SESSION_COOKIE, f"token-{self.logins}")
+        return response
+
+    async def create_qr(self, request: web.Request) -> web.Response:
+        if self.status != 200:
+            return web.Response(status=self.status)
+        if self.expire_next_request or SESSION_COOKIE not in request.cookies:
+            self.expire_next_request = False
+            raise web.HTTPUnauthorized()
+        form = await request.post()
+        self.requests.append(dict(form))
+        return web.json_response(
+            {
+                "image": "data:image/png;base64," + base64.b64encode(PNG).decode(),
+                "url": f"https://qr.nspk.ru/pay?sum={form['amount']}",
+            }
+        )
+
+
+@pytest_asyncio.fixture
+async def agent():
+    stub = AgentStub()
+    server = TestServer(stub.app())
+    await server.start_server()
+    stub.server = server
+    yield stub
+    await server.close()
+
+
+def make_backend(agent, password: str = "pass") -> HTTPBackend:
+    base = agent.server.make_url("")
+    return HTTPBackend(
+        auth_url=str(
+            base.with_user("login").with_password(password) / "api/lk/login"
+        ),
+        api_url=str(base / "api/lk/qr"),
+    )
+
+
+@pytest.mark.asyncio
+async def test_http_backend_generates_qr_without_browser(agent):
+    backend = make_backend(agent)
+
+    try:
+        image, data = await backend.generate(15_000, 4)
+    finally:
+        await backend.close()
+
+    assert image == PNG
+    assert data == "https://qr.nspk.ru/pay?sum=15000"
+    assert agent.requests == [{"amount": "15000", "tab": "4"}]
+    assert agent.logins == 1
+
+
+@pytest.mark.asyncio
+async def test_http_backend_reuses_session_between_jobs(agent):
+    backend = make_backend(agent)
+
+    try:
+        await backend.generate(5_000, 2)
+        await backend.generate(10_000, 2)
+    finally:
+        await backend.close()
+
+    assert agent.logins == 1
+    assert len(agent.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_http_backend_reauthenticates_on_expired_session(agent):
+    backend = make_backend(agent)
+
+    try:
+        await backend.generate(5_000, 2)
+        agent.expire_next_request = True
+        await backend.generate(10_000, 2)
+    finally:
+        await backend.close()
+
+    assert agent.logins == 2
+    assert len(agent.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_http_backend_rejects_wrong_credentials(agent):
+    backend = make_backend(agent, password="wrong")
+
+    try:
+        with pytest.raises(AuthenticationError):
+            await backend.generate(5_000, 2)
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_http_backend_reports_server_errors(agent):
+    agent.status = 502
+    backend = make_backend(agent)
+
+    try:
+        with pytest.raises(SiteUnavailableError):
+            await backend.generate(5_000, 2)
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_http_backend_validates_tab_index(agent):
+    backend = make_backend(agent)
+
+    try:
+        with pytest.raises(QRGenerationError):
+            await backend.generate(5_000, 9)
+    finally:
+        await backend.close()
+
+    assert agent.logins == 0
+
+
+@pytest.mark.asyncio
+async def test_fallback_backend_uses_selenium_when_http_fails():
+    primary = AsyncMock()
+    primary.name = "http"
+    primary.generate.side_effect = SiteUnavailableError("down")
+    fallback = AsyncMock()
+    fallback.name = "selenium"
+    fallback.generate.return_value = (b"qr-image", "QR data")
+
+    backend = FallbackBackend(primary, fallback)
+
+    assert await backend.generate(15_000, 2) == (b"qr-image", "QR data")
+    fallback.generate.assert_awaited_once_with(15_000, 2)
+
+
+def test_backend_must_implement_generate():
+    class NoGenerate(QRBackend):
+        name = "broken"
+
+    with pytest.raises(TypeError):
+        NoGenerate()
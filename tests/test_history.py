@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from database.repositories import OperationRepo
+from handlers import history
+
+
+T0 = datetime(2026, 1, 12, 18, 30, 15, 123456)
+
+
+def check(i: int) -> dict:
+    return {
+        "id": i,
+        "operation_id": f"op{i:06d}",
+        "username": "operator",
+        "amount": Decimal("1500.00"),
+        "timestamp": T0 - timedelta(minutes=i),
+        "description": "Плательщик: Иван И.",
+        "exchange_rate": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_goes_older_with_row_comparison(monkeypatch):
+    fetch = AsyncMock(return_value=[check(i) for i in range(3, 6)])
+    monkeypatch.setattr(OperationRepo, "_fetch", fetch)
+
+    rows, has_more = await OperationRepo.get_checks_page(
+        7, T0, T0, limit=2, before=(T0, 2)
+    )
+
+    query, *params = fetch.await_args.args
+    assert "(timestamp, id) < ($4, $5)" in query
+    assert "ORDER BY timestamp DESC, id DESC" in query
+    assert params == [7, T0, T0, T0, 2, 3]
+    assert [row["id"] for row in rows] == [3, 4]
+    assert has_more
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_goes_newer_and_keeps_newest_first(monkeypatch):
+    # ASC-выборка: ближайшие к курсору новые строки идут первыми.
+    fetch = AsyncMock(return_value=[check(i) for i in (4, 3)])
+    monkeypatch.setattr(OperationRepo, "_fetch", fetch)
+
+    rows, has_more = await OperationRepo.get_history_page(7, limit=2, after=(T0, 5))
+
+    query, *_ = fetch.await_args.args
+    assert "timestamp IS NOT NULL" in query
+    assert "(timestamp, id) > ($2, $3)" in query
+    assert "ORDER BY timestamp ASC, id ASC" in query
+    assert [row["id"] for row in rows] == [3, 4]
+    assert not has_more
+
+
+@pytest.mark.asyncio
+async def test_history_count_skips_rows_without_timestamp(monkeypatch):
+    fetchval = AsyncMock(return_value=3)
+    monkeypatch.setattr(OperationRepo, "_fetchval", fetchval)
+
+    assert await OperationRepo.count_history(7) == 3
+
+    query, *_ = fetchval.await_args.args
+    assert "timestamp IS NOT NULL" in query
+
+
+def test_page_cursor_fits_callback_data_and_round_trips():
+    cursor = history.HistoryPage(
+        view="sv",
+        day=20260112,
+        page=12,
+        ts=history.encode_timestamp(T0),
+        id=2_147_483_647,
+        newer=False,
+    )
+
+    packed = cursor.pack()
+
+    assert len(packed.encode()) <= 64
+    restored = history.HistoryPage.unpack(packed)
+    assert history.decode_timestamp(restored.ts) == T0
+    assert restored == cursor
+
+
+@pytest.mark.asyncio
+async def test_checks_page_callback_edits_message(monkeypatch):
+    rows = [check(i) for i in range(history.SV_PAGE_SIZE)]
+    page = AsyncMock(return_value=(rows, True))
+    monkeypatch.setattr(history.OperationRepo, "get_checks_page", page)
+    monkeypatch.setattr(
+        history.OperationRepo,
+        "get_checks_summary",
+        AsyncMock(return_value={"count": 40, "total": Decimal("60000")}),
+    )
+    monkeypatch.setattr(history.ChatRepo, "get_balance_id", AsyncMock(return_value=7))
+    monkeypatch.setattr(
+        history.BalanceRepo, "get_contractor_name", AsyncMock(return_value="ООО <Ромашка>")
+    )
+    callback = SimpleNamespace(
+        message=SimpleNamespace(chat=SimpleNamespace(id=-100), edit_text=AsyncMock()),
+        from_user=SimpleNamespace(id=1),
+        answer=AsyncMock(),
+    )
+    cursor = history.HistoryPage(
+        view="sv", day=20260112, page=1, ts=history.encode_timestamp(T0), id=99, newer=False
+    )
+
+    await history.history_page(callback, cursor)
+
+    kwargs = page.await_args.kwargs
+    assert kwargs["before"] == (T0, 99)
+    assert kwargs["start_date"] == datetime(2026, 1, 12)
+    text = callback.message.edit_text.await_args.args[0]
+    assert "Найдено чеков: 40" in text
+    assert "Страница 2 из 3" in text
+    assert "ООО &lt;Ромашка&gt;" in text
+    assert f"{history.SV_PAGE_SIZE + 1}. <code>op000000</code>" in text
+    markup = callback.message.edit_text.await_args.kwargs["reply_markup"]
+    assert [button.text for button in markup.inline_keyboard[0]] == ["◀️ Новее", "Старее ▶️"]
+
+
+@pytest.mark.asyncio
+async def test_checks_for_day_query_covers_that_day(monkeypatch):
+    page = AsyncMock(return_value=([check(1)], False))
+    monkeypatch.setattr(history.OperationRepo, "get_checks_page", page)
+    monkeypatch.setattr(
+        history.OperationRepo,
+        "get_checks_summary",
+        AsyncMock(return_value={"count": 1, "total": Decimal("1500")}),
+    )
+    monkeypatch.setattr(
+        history.BalanceRepo, "get_contractor_name", AsyncMock(return_value="КА")
+    )
+    message = SimpleNamespace(answer=AsyncMock())
+    state = SimpleNamespace(clear=AsyncMock())
+
+    await history.show_checks_for_period(
+        message, 7, datetime(2026, 1, 11), "11.01.2026", state
+    )
+
+    kwargs = page.await_args.kwargs
+    assert kwargs["start_date"] == datetime(2026, 1, 11)
+    assert kwargs["end_date"] == datetime(2026, 1, 12)
+    assert "11.01.2026" in message.answer.await_args.args[0]
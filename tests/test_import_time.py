@@ -0,0 +1,43 @@
+import pytest
+
+from benchmarks.import_time import find_regressions, measure, parse_importtime
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   config
+import time:       300 |        300 |     pandas
+import time:        50 |        350 |   handlers.export
+import time:        40 |        510 | main
+"""
+
+
+def test_parse_importtime_reads_cumulative_times():
+    sample = parse_importtime(IMPORTTIME_OUTPUT, "main")
+
+    assert sample.total_us == 510
+    assert sample.modules["handlers.export"] == 350
+    assert sample.heavy() == ["pandas"]
+    assert sample.slowest(2) == [("main", 510), ("handlers.export", 350)]
+
+
+def test_find_regressions_reports_heavy_modules_and_slow_start():
+    report = {
+        "main": {"total_ms": 1300.0, "heavy_modules": ["pandas"]},
+        "qr_worker": {"total_ms": 900.0, "heavy_modules": []},
+    }
+    baseline = {
+        "main": {"total_ms": 1000.0},
+        "qr_worker": {"total_ms": 800.0},
+    }
+
+    problems = find_regressions(report, baseline, tolerance=0.2)
+
+    assert len(problems) == 2
+    assert "pandas" in problems[0]
+    assert "1300.0" in problems[1]
+
+
+@pytest.mark.parametrize("entrypoint", ["main", "qr_worker"])
+def test_entrypoints_do_not_import_heavy_libraries(entrypoint):
+    assert measure(entrypoint).heavy() == []
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.admin import format_loop_stats
+from middlewares.loop_monitor import LoopMonitorMiddleware
+from services.loop_monitor import LoopMonitor
+
+
+def blocking_export():
+    time.sleep(0.3)
+
+
+async def export_handler(event, data):
+    blocking_export()
+    return "done"
+
+
+@pytest.mark.asyncio
+async def test_blocking_handler_is_recorded_with_stack():
+    monitor = LoopMonitor(threshold=0.1, interval=0.02)
+    middleware = LoopMonitorMiddleware(monitor)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        result = await middleware(
+            export_handler,
+            SimpleNamespace(),
+            {"handler": SimpleNamespace(callback=export_handler)},
+        )
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    assert result == "done"
+    name = f"{__name__}.export_handler"
+    stats = monitor.handlers[name]
+    assert stats.calls == 1
+    assert stats.stalls == 1
+    assert stats.max >= 0.3
+    [stall] = monitor.stalls
+    assert stall.handler == name
+    assert "blocking_export" in stall.stack
+    assert stall.blocked >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_fast_handlers_do_not_produce_stalls():
+    monitor = LoopMonitor(threshold=0.1, interval=0.02)
+    middleware = LoopMonitorMiddleware(monitor)
+
+    async def fast_handler(event, data):
+        await asyncio.sleep(0.15)
+
+    monitor.start()
+    try:
+        await middleware(
+            fast_handler,
+            SimpleNamespace(),
+            {"handler": SimpleNamespace(callback=fast_handler)},
+        )
+    finally:
+        await monitor.stop()
+
+    assert not monitor.stalls
+    assert "fast_handler" in format_loop_stats(monitor)
@@ -0,0 +1,135 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from handlers import check
+from utils.media_group import MAX_MEDIA_GROUP_SIZE, MediaGroupAggregator
+
+
+def photo_message(message_id: int, media_group_id: str | None = "album") -> SimpleNamespace:
+    return SimpleNamespace(
+        message_id=message_id,
+        media_group_id=media_group_id,
+        chat=SimpleNamespace(id=-100),
+        from_user=SimpleNamespace(id=1, username="operator", first_name="Оператор"),
+        photo=[SimpleNamespace(file_id=f"photo-{message_id}")],
+        document=None,
+        bot=AsyncMock(),
+    )
+
+
+class CopyingStorage(MemoryStorage):
+    """Как Redis: каждое чтение отдаёт новую копию данных."""
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return copy.deepcopy(await super().get_data(key))
+
+
+def make_state() -> FSMContext:
+    return FSMContext(
+        storage=CopyingStorage(),
+        key=StorageKey(bot_id=42, chat_id=-100, user_id=1),
+    )
+
+
+@pytest.mark.asyncio
+async def test_aggregator_returns_album_once_in_order():
+    aggregator = MediaGroupAggregator(idle_timeout=0.05)
+
+    results = await asyncio.gather(
+        *(aggregator.collect(photo_message(i)) for i in (3, 1, 2))
+    )
+
+    albums = [result for result in results if result is not None]
+    assert len(albums) == 1
+    assert [message.message_id for message in albums[0]] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_aggregator_flushes_full_album_without_idle_wait():
+    aggregator = MediaGroupAggregator(idle_timeout=5)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            *(aggregator.collect(photo_message(i)) for i in range(MAX_MEDIA_GROUP_SIZE))
+        ),
+        timeout=1,
+    )
+
+    assert len(results[0]) == MAX_MEDIA_GROUP_SIZE
+
+
+@pytest.mark.asyncio
+async def test_single_message_passes_through():
+    message = photo_message(1, media_group_id=None)
+
+    assert await MediaGroupAggregator().collect(message) == [message]
+
+
+@pytest.mark.asyncio
+async def test_album_lands_in_queue_with_one_update(monkeypatch):
+    monkeypatch.setattr(check, "media_groups", MediaGroupAggregator(idle_timeout=0.05))
+    start = AsyncMock()
+    monkeypatch.setattr(check, "start_processing", start)
+    state = make_state()
+    await state.update_data(queue=[], initial_msg_id=7)
+
+    await asyncio.gather(
+        *(check.receive_files(photo_message(i), state) for i in range(1, 6)),
+        check.receive_files(photo_message(10, media_group_id=None), state),
+    )
+
+    data = await state.get_data()
+    assert sorted(item["msg_id"] for item in data["queue"]) == [1, 2, 3, 4, 5, 10]
+    assert data["processing"] is True
+    start.assert_awaited_once()
+    assert start.await_args.args[3] == 7
+
+
+@pytest.mark.asyncio
+async def test_photo_arriving_during_amount_save_stays_in_queue(monkeypatch):
+    state = make_state()
+    first = check.queue_item(photo_message(1, media_group_id=None))
+    await state.update_data(
+        queue=[first],
+        current_file=first,
+        total_files=1,
+        processing=True,
+        results_queue=[],
+    )
+
+    async def save_file(bot, file_id, destination):
+        # Пока чек скачивается, пользователь присылает ещё одно фото.
+        await check.add_to_queue([photo_message(2, media_group_id=None)], state)
+
+    monkeypatch.setattr(check, "save_telegram_file", save_file)
+    monkeypatch.setattr(check, "delete_message", AsyncMock())
+    monkeypatch.setattr(
+        check.BalanceRepo,
+        "get_by_chat",
+        AsyncMock(return_value={"id": 5, "name": "КА"}),
+    )
+    monkeypatch.setattr(check.BalanceRepo, "add", AsyncMock())
+    monkeypatch.setattr(check.OperationRepo, "log_operation", AsyncMock(return_value=77))
+    next_file = AsyncMock()
+    monkeypatch.setattr(check, "process_next_in_queue", next_file)
+    message = SimpleNamespace(
+        text="5 000 Иванов Иван",
+        chat=SimpleNamespace(id=-100),
+        from_user=SimpleNamespace(id=1, username="operator", first_name="Оператор"),
+        bot=AsyncMock(),
+    )
+
+    await check.receive_amount_and_payer(message, state)
+
+    data = await state.get_data()
+    assert [item["msg_id"] for item in data["queue"]] == [2]
+    assert data["total_files"] == 2
+    assert [result["op_id"] for result in data["results_queue"]] == [77]
+    next_file.assert_awaited_once()
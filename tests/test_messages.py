@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from handlers import check
+from utils.messages import MESSAGE_LIMIT, pack_messages, split_html
+
+
+def test_pack_messages_fills_messages_greedily():
+    entries = ["a" * 40, "b" * 40, "c" * 40, "d" * 10]
+
+    messages = pack_messages(entries, limit=100, separator="\n")
+
+    assert messages == ["a" * 40 + "\n" + "b" * 40, "c" * 40 + "\n" + "d" * 10]
+    assert "\n".join(messages) == "\n".join(entries)
+
+
+def test_pack_messages_keeps_entries_whole():
+    entries = [f"<b>Чек {i}</b>\n<code>op{i:04d}</code>" for i in range(500)]
+
+    messages = pack_messages(entries)
+
+    assert len(messages) < len(entries) // 50
+    assert all(len(text) <= MESSAGE_LIMIT for text in messages)
+    assert [part for text in messages for part in text.split("\n\n")] == entries
+
+
+def test_split_html_reopens_tags_and_keeps_entities():
+    text = "<b>Итого &amp; <i>" + "слово " * 40 + "</i></b>\nконец"
+
+    parts = split_html(text, limit=60)
+
+    assert len(parts) > 1
+    for part in parts:
+        assert len(part) <= 60
+        assert part.count("<b>") == part.count("</b>")
+        assert part.count("<i>") == part.count("</i>")
+    assert "&amp;" in parts[0]
+    assert parts[1].startswith("<b><i>")
+    assert parts[-1].endswith("конец")
+
+
+def test_pack_messages_splits_oversized_entry():
+    entries = ["<code>" + "x" * 150 + "</code>", "хвост"]
+
+    messages = pack_messages(entries, limit=100)
+
+    assert all(len(text) <= 100 for text in messages)
+    assert all(text.count("<code>") == text.count("</code>") for text in messages)
+    assert messages[-1].endswith("хвост")
+
+
+@pytest.mark.asyncio
+async def test_show_all_results_sends_one_message_for_batch(monkeypatch):
+    bot = AsyncMock()
+    outbound = SimpleNamespace(send_message=AsyncMock())
+    monkeypatch.setattr(check, "get_outbound", lambda: outbound)
+    state = SimpleNamespace(
+        get_data=AsyncMock(return_value={
+            "results_queue": [
+                {
+                    "amount": 1500.0,
+                    "file_type": "PDF",
+                    "op_id": f"op{i}",
+                    "payer": "Иван И.",
+                    "username": "operator",
+                    "contractor": "КА",
+                }
+                for i in range(10)
+            ],
+        }),
+        clear=AsyncMock(),
+    )
+
+    await check.show_all_results(bot, -100, state)
+
+    outbound.send_message.assert_awaited_once()
+    chat_id, text = outbound.send_message.await_args.args
+    assert chat_id == -100
+    assert text.count("Баланс пополнен") == 10
@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from handlers import admin
+from services.outbound import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    OutboundDispatcher,
+    TokenBucket,
+)
+
+
+class RecordingBot:
+    def __init__(self, failures: dict | None = None) -> None:
+        self.calls: list[SendMessage] = []
+        self.failures = failures or {}
+
+    async def __call__(self, method):
+        self.calls.append(method)
+        failure = self.failures.pop(method.text, None)
+        if failure is not None:
+            raise failure
+        return method.text
+
+
+def test_token_bucket_keeps_reserve_for_interactive():
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    assert bucket.take(reserve=2) == 0
+    assert bucket.take(reserve=2) > 0
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() > 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_reply_overtakes_queued_bulk():
+    bot = RecordingBot()
+    dispatcher = OutboundDispatcher(bot, private_rate=1000, private_burst=1000)
+    try:
+        bulk = [
+            dispatcher.submit(SendMessage(chat_id=1, text=f"bulk {i}"), PRIORITY_BULK)
+            for i in range(3)
+        ]
+        reply = dispatcher.submit(
+            SendMessage(chat_id=1, text="reply"), PRIORITY_INTERACTIVE
+        )
+
+        await asyncio.gather(reply, *bulk)
+    finally:
+        await dispatcher.close()
+
+    assert [call.text for call in bot.calls] == ["reply", "bulk 0", "bulk 1", "bulk 2"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_retries():
+    method = SendMessage(chat_id=-100, text="report")
+    bot = RecordingBot({
+        "report": TelegramRetryAfter(method=method, message="Flood", retry_after=0.05)
+    })
+    dispatcher = OutboundDispatcher(bot, group_per_minute=60_000, group_burst=10)
+    try:
+        started = asyncio.get_running_loop().time()
+        result = await dispatcher.send(method)
+        elapsed = asyncio.get_running_loop().time() - started
+    finally:
+        await dispatcher.close()
+
+    assert result == "report"
+    assert len(bot.calls) == 2
+    assert elapsed >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_failed_send_reaches_caller():
+    bot = RecordingBot({"x": RuntimeError("chat not found")})
+    dispatcher = OutboundDispatcher(bot)
+    try:
+        with pytest.raises(RuntimeError, match="chat not found"):
+            await dispatcher.send(SendMessage(chat_id=5, text="x"))
+    finally:
+        await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_newsletter_goes_through_bulk_queue(monkeypatch):
+    bot = RecordingBot()
+    dispatcher = OutboundDispatcher(bot, group_per_minute=60_000)
+    monkeypatch.setattr(admin, "get_outbound", lambda: dispatcher)
+    monkeypatch.setattr(
+        admin.ChatRepo,
+        "get_all_active_chats",
+        AsyncMock(return_value=[{"chat_id": -i, "contractor_name": f"КА {i}"} for i in range(1, 4)]),
+    )
+    message = SimpleNamespace(
+        answer=AsyncMock(return_value=SimpleNamespace(delete=AsyncMock())),
+    )
+    state = SimpleNamespace(
+        get_data=AsyncMock(return_value={"content_type": "text", "text": "Новости"}),
+        clear=AsyncMock(),
+    )
+
+    try:
+        await admin.send_newsletter(message, state)
+    finally:
+        await dispatcher.close()
+
+    assert sorted(call.chat_id for call in bot.calls) == [-3, -2, -1]
+    report = message.answer.await_args.args[0]
+    assert "Успешно: 3" in report
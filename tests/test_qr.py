@@ -4,6 +4,7 @@ from unittest.mock import AsyncMock, MagicMock
 import pytest
 
 from handlers import qr
+from services.qr_queue import PRIORITY_HIGH, PRIORITY_NORMAL, QueueDepth
 
 
 def make_message(text: str = "/qr 15 000"):
@@ -26,10 +27,7 @@ def make_message(text: str = "/qr 15 000"):
 @pytest.mark.asyncio
 async def test_qr_command_publishes_job_with_selected_tab(monkeypatch):
     message, processing_message = make_message()
-    queue_client = SimpleNamespace(
-        publish_job=AsyncMock(),
-        publish_cleanup=AsyncMock(),
-    )
+    queue_client = SimpleNamespace(publish_job=AsyncMock())
     monkeypatch.setattr(
         qr.QRSettingsRepo,
         "get_settings",
@@ -48,23 +46,41 @@ async def test_qr_command_publishes_job_with_selected_tab(monkeypatch):
     assert job.processing_message_id == 200
     assert job.amount == 15_000
     assert job.tab_index == 4
+    assert job.priority == PRIORITY_NORMAL
     processing_message.edit_text.assert_not_awaited()
 
 
+@pytest.mark.asyncio
+async def test_super_admin_qr_jobs_are_prioritized(monkeypatch):
+    message, _ = make_message()
+    queue_client = SimpleNamespace(publish_job=AsyncMock())
+    monkeypatch.setattr(
+        qr.QRSettingsRepo,
+        "get_settings",
+        AsyncMock(return_value=(4, True)),
+    )
+    monkeypatch.setattr(qr, "get_qr_queue", lambda: queue_client)
+    monkeypatch.setattr(qr, "is_super_admin", lambda _user_id: True)
+
+    await qr.cmd_new(message)
+
+    job = queue_client.publish_job.await_args.args[0]
+    assert job.priority == PRIORITY_HIGH
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize("amount", ["2 499", "150 001"])
 async def test_qr_command_rejects_amount_outside_allowed_range(monkeypatch, amount):
     message, _ = make_message(f"/qr {amount}")
-    queue_client = SimpleNamespace(
-        publish_job=AsyncMock(),
-        publish_cleanup=AsyncMock(),
-    )
+    queue_client = SimpleNamespace(publish_job=AsyncMock())
+    schedule_deletion = AsyncMock()
     send_temporary_message = AsyncMock()
     monkeypatch.setattr(
         qr.QRSettingsRepo,
         "get_settings",
         AsyncMock(return_value=(2, True)),
     )
+    monkeypatch.setattr(qr.ScheduledDeletionRepo, "schedule", schedule_deletion)
     monkeypatch.setattr(qr, "get_qr_queue", lambda: queue_client)
     monkeypatch.setattr(qr, "temp_msg", send_temporary_message)
 
@@ -72,9 +88,11 @@ async def test_qr_command_rejects_amount_outside_allowed_range(monkeypatch, amou
 
     message.answer.assert_not_awaited()
     queue_client.publish_job.assert_not_awaited()
-    queue_client.publish_cleanup.assert_awaited_once()
-    cleanup = queue_client.publish_cleanup.await_args.args[0]
-    assert cleanup.message_ids == (100,)
+    schedule_deletion.assert_awaited_once_with(
+        -1000,
+        (100,),
+        qr.CLEANUP_DELAY_SECONDS,
+    )
     send_temporary_message.assert_awaited_once_with(
         message,
         "❌ Сумма должна быть от 2 500 до 150 000",
@@ -84,23 +102,22 @@ async def test_qr_command_rejects_amount_outside_allowed_range(monkeypatch, amou
 @pytest.mark.asyncio
 async def test_qr_command_is_blocked_when_disabled(monkeypatch):
     message, _ = make_message()
-    queue_client = SimpleNamespace(
-        publish_job=AsyncMock(),
-        publish_cleanup=AsyncMock(),
-    )
+    queue_client = SimpleNamespace(publish_job=AsyncMock())
+    schedule_deletion = AsyncMock()
     send_temporary_message = AsyncMock()
     monkeypatch.setattr(
         qr.QRSettingsRepo,
         "get_settings",
         AsyncMock(return_value=(4, False)),
     )
+    monkeypatch.setattr(qr.ScheduledDeletionRepo, "schedule", schedule_deletion)
     monkeypatch.setattr(qr, "get_qr_queue", lambda: queue_client)
     monkeypatch.setattr(qr, "temp_msg", send_temporary_message)
 
     await qr.cmd_new(message)
 
     queue_client.publish_job.assert_not_awaited()
-    queue_client.publish_cleanup.assert_awaited_once()
+    schedule_deletion.assert_awaited_once()
     send_temporary_message.assert_awaited_once_with(message, "Временно выключено")
 
 
@@ -110,14 +127,14 @@ async def test_qr_command_handles_unavailable_queue(monkeypatch):
     queue_client = SimpleNamespace(
         publish_job=AsyncMock(side_effect=RuntimeError("RabbitMQ unavailable")),
     )
-    local_cleanup = MagicMock()
+    schedule_cleanup = AsyncMock()
     monkeypatch.setattr(
         qr.QRSettingsRepo,
         "get_settings",
         AsyncMock(return_value=(2, True)),
     )
     monkeypatch.setattr(qr, "get_qr_queue", lambda: queue_client)
-    monkeypatch.setattr(qr, "schedule_local_cleanup", local_cleanup)
+    monkeypatch.setattr(qr, "schedule_cleanup", schedule_cleanup)
 
     await qr.cmd_new(message)
 
@@ -125,7 +142,23 @@ async def test_qr_command_handles_unavailable_queue(monkeypatch):
     assert processing_message.edit_text.await_args.args[0] == (
         "❌ Очередь QR временно недоступна"
     )
-    local_cleanup.assert_called_once_with(message, (100, 200))
+    schedule_cleanup.assert_awaited_once_with(message, (100, 200))
+
+
+@pytest.mark.asyncio
+async def test_cleanup_falls_back_to_local_timer_without_database(monkeypatch):
+    message, _ = make_message()
+    local_cleanup = MagicMock()
+    monkeypatch.setattr(
+        qr.ScheduledDeletionRepo,
+        "schedule",
+        AsyncMock(side_effect=RuntimeError("Database pool is not initialized")),
+    )
+    monkeypatch.setattr(qr, "schedule_local_cleanup", local_cleanup)
+
+    await qr.schedule_cleanup(message, (100,))
+
+    local_cleanup.assert_called_once_with(message, (100,))
 
 
 @pytest.mark.asyncio
@@ -208,3 +241,40 @@ async def test_super_admin_can_toggle_qr(monkeypatch, handler, enabled):
     await handler(message)
 
     set_enabled.assert_awaited_once_with(enabled)
+
+
+@pytest.mark.asyncio
+async def test_qr_queue_command_shows_depth(monkeypatch):
+    message = SimpleNamespace(
+        from_user=SimpleNamespace(id=100),
+        answer=AsyncMock(),
+    )
+    queue_client = SimpleNamespace(
+        get_generation_depth=AsyncMock(
+            return_value=QueueDepth(messages=7, consumers=2)
+        ),
+    )
+    monkeypatch.setattr(qr, "is_super_admin", lambda _user_id: True)
+    monkeypatch.setattr(qr, "delete_message", AsyncMock())
+    monkeypatch.setattr(qr, "get_qr_queue", lambda: queue_client)
+
+    await qr.cmd_qr_queue(message)
+
+    text = message.answer.await_args.args[0]
+    assert "Ожидают: 7" in text
+    assert "Воркеров: 2" in text
+
+
+def test_qr_stats_are_formatted_by_stage():
+    text = qr.format_qr_stats(
+        {
+            "jobs": 3,
+            "failures": 1,
+            "retries": 0,
+            "stages": {"auth": {"p50": 2.5, "p90": 4.0, "p99": 4.05, "max": 4.1}},
+        }
+    )
+
+    assert "Заданий: 3, ошибок: 1" in text
+    assert "p50 / p90 / p99 / max" in text
+    assert "Авторизация: 2.50 / 4.00 / 4.05 / 4.10" in text
@@ -0,0 +1,50 @@
+from services.qr_cache import QRCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_qr_is_handed_out_once():
+    cache = QRCache(ttl=600, clock=Clock())
+    cache.put(2, 10_000, b"qr-image", "QR data")
+
+    assert cache.take(2, 10_000) == (b"qr-image", "QR data")
+    assert cache.take(2, 10_000) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cached_qr_expires_after_ttl():
+    clock = Clock()
+    cache = QRCache(ttl=600, clock=clock)
+    cache.put(2, 10_000, b"qr-image", "QR data")
+
+    clock.now += 600
+
+    assert cache.take(2, 10_000) is None
+    assert cache.missing(2, 10_000) == 1
+
+
+def test_cache_key_includes_tab_index():
+    cache = QRCache(ttl=600, clock=Clock())
+    cache.put(2, 10_000, b"qr-image", "QR data")
+
+    assert cache.take(3, 10_000) is None
+    assert cache.missing(2, 10_000) == 0
+
+
+def test_hot_keys_follow_recent_requests():
+    clock = Clock()
+    cache = QRCache(ttl=600, window=3600, clock=clock)
+    for _ in range(3):
+        cache.record_request(2, 5_000)
+    clock.now += 3601
+    for _ in range(2):
+        cache.record_request(2, 10_000)
+    cache.record_request(2, 15_000)
+
+    assert cache.hot_keys(limit=2) == [(2, 10_000), (2, 15_000)]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from services.qr_metrics import QRMetrics, RollingHistogram
+from utils.timing import StageTimings, stage, start_timings, timed_stage
+
+
+def test_rolling_histogram_keeps_only_recent_samples():
+    histogram = RollingHistogram(size=3)
+    for seconds in (100, 1, 2, 3):
+        histogram.observe(seconds)
+
+    assert histogram.summary() == {
+        "count": 3,
+        "p50": 2,
+        "p90": 3,
+        "p99": 3,
+        "max": 3,
+    }
+
+
+def test_exported_histogram_is_cumulative_beyond_window():
+    metrics = QRMetrics(window=2)
+    for seconds in (0.05, 3, 3):
+        timings = StageTimings()
+        timings.record("auth", seconds)
+        metrics.observe(timings)
+
+    text = metrics.render_text()
+    assert metrics.histograms["auth"].summary()["count"] == 2
+    assert "# TYPE qr_stage_seconds histogram" in text
+    assert "# TYPE qr_jobs_total counter" in text
+    assert 'qr_stage_seconds_bucket{stage="auth",le="0.1"} 1' in text
+    assert 'qr_stage_seconds_bucket{stage="auth",le="+Inf"} 3' in text
+    assert 'qr_stage_seconds_sum{stage="auth"} 6.050' in text
+    assert text.count("# TYPE qr_stage_seconds histogram") == 1
+
+
+def test_metrics_snapshot_orders_pipeline_stages():
+    metrics = QRMetrics()
+    timings = StageTimings()
+    timings.record("total", 12.0)
+    timings.record("auth", 3.0)
+    timings.record("queue_wait", 5.0)
+
+    metrics.observe(timings)
+    metrics.observe(StageTimings(), failed=True)
+
+    snapshot = metrics.snapshot()
+    assert list(snapshot["stages"]) == ["queue_wait", "auth", "total"]
+    assert (snapshot["jobs"], snapshot["failures"]) == (2, 1)
+    assert 'qr_stage_seconds_count{stage="auth"} 1' in metrics.render_text()
+
+
+@pytest.mark.asyncio
+async def test_stages_are_recorded_from_worker_threads():
+    @timed_stage("auth")
+    def blocking_auth():
+        pass
+
+    async def job():
+        timings = start_timings()
+        await asyncio.to_thread(blocking_auth)
+        with stage("telegram_upload"):
+            await asyncio.sleep(0)
+        return timings
+
+    timings = await asyncio.create_task(job())
+
+    assert set(timings.stages) == {"auth", "telegram_upload"}
+
+
+def test_stage_without_active_timings_is_noop():
+    with stage("auth"):
+        pass
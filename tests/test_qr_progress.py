@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from services.qr_progress import QRProgressTracker
+from services.qr_queue import PRIORITY_HIGH, QRJob
+
+
+def make_job(job_id: str, created_at: float, priority: int = 0) -> QRJob:
+    return QRJob(
+        job_id=job_id,
+        chat_id=-100,
+        command_message_id=10,
+        processing_message_id=11,
+        amount=15_000,
+        tab_index=2,
+        created_at=created_at,
+        priority=priority,
+    )
+
+
+@pytest.mark.asyncio
+async def test_high_priority_job_overtakes_waiting_jobs():
+    tracker = QRProgressTracker(slots=1)
+    await tracker.wait_turn(make_job("running", 1))
+    started = []
+
+    async def run(job):
+        await tracker.wait_turn(job)
+        started.append(job.job_id)
+
+    tasks = [
+        asyncio.create_task(run(make_job("first", 2))),
+        asyncio.create_task(run(make_job("second", 3))),
+        asyncio.create_task(run(make_job("admin", 4, PRIORITY_HIGH))),
+    ]
+    await asyncio.sleep(0)
+    for _ in tasks:
+        tracker.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    assert started == ["admin", "first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_positions_estimate_wait_from_recent_durations():
+    tracker = QRProgressTracker(slots=1)
+    for duration in (10, 20, 30):
+        await tracker.wait_turn(make_job("done", 0))
+        tracker.release(duration)
+    await tracker.wait_turn(make_job("running", 1))
+    waiting = [
+        asyncio.create_task(tracker.wait_turn(make_job(job_id, created_at)))
+        for job_id, created_at in (("first", 2), ("second", 3))
+    ]
+    await asyncio.sleep(0)
+
+    positions = tracker.positions()
+
+    assert [(p.job.job_id, p.ahead, p.eta_seconds) for p in positions] == [
+        ("first", 1, 40),
+        ("second", 2, 60),
+    ]
+    for task in waiting:
+        task.cancel()
+    await asyncio.gather(*waiting, return_exceptions=True)
+    assert tracker.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_free_slot_is_taken_without_waiting():
+    tracker = QRProgressTracker(slots=2)
+
+    await tracker.wait_turn(make_job("first", 1))
+    await tracker.wait_turn(make_job("second", 2))
+
+    assert tracker.running == 2
+    assert tracker.positions() == []
@@ -1,15 +1,23 @@
+import asyncio
+from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
 import pytest
+from aio_pika.exceptions import DeliveryError
+from pamqp.commands import Basic
 
+from services import qr_queue
 from services.qr_queue import (
     CLEANUP_DELAY_MS,
     CLEANUP_QUEUE,
     GENERATION_QUEUE,
+    LEGACY_GENERATION_QUEUE,
+    MAX_PRIORITY,
     QRCleanupTask,
     QRJob,
     declare_cleanup_queues,
     declare_generation_queue,
+    open_legacy_generation_queue,
 )
 
 
@@ -43,11 +51,44 @@ async def test_generation_queue_is_single_active_consumer():
         durable=True,
         arguments={
             "x-queue-type": "classic",
+            "x-max-priority": MAX_PRIORITY,
             "x-single-active-consumer": True,
         },
     )
 
 
+@pytest.mark.asyncio
+async def test_generation_queue_allows_parallel_consumers(monkeypatch):
+    monkeypatch.setattr(qr_queue.settings, "QR_SINGLE_ACTIVE_CONSUMER", False)
+    channel = AsyncMock()
+
+    await declare_generation_queue(channel)
+
+    channel.declare_queue.assert_awaited_once_with(
+        GENERATION_QUEUE,
+        durable=True,
+        arguments={"x-queue-type": "classic", "x-max-priority": MAX_PRIORITY},
+    )
+
+
+@pytest.mark.asyncio
+async def test_legacy_generation_queue_is_drained_only_if_present():
+    legacy = SimpleNamespace(name=LEGACY_GENERATION_QUEUE)
+    channel = AsyncMock()
+    channel.declare_queue.return_value = legacy
+    connection = SimpleNamespace(channel=AsyncMock(return_value=channel))
+
+    assert await open_legacy_generation_queue(connection, prefetch_count=3) is legacy
+    channel.declare_queue.assert_awaited_once_with(LEGACY_GENERATION_QUEUE, passive=True)
+    channel.set_qos.assert_awaited_once_with(prefetch_count=3)
+
+    channel.declare_queue.side_effect = qr_queue.aio_pika.exceptions.ChannelNotFoundEntity(
+        "NOT_FOUND - no queue 'qr.generate'"
+    )
+    assert await open_legacy_generation_queue(connection, prefetch_count=3) is None
+    channel.close.assert_awaited_once()
+
+
 @pytest.mark.asyncio
 async def test_cleanup_delay_is_twenty_minutes_and_dead_letters():
     channel = AsyncMock()
@@ -64,3 +105,140 @@ async def test_cleanup_delay_is_twenty_minutes_and_dead_letters():
         "x-dead-letter-routing-key": CLEANUP_QUEUE,
     }
     assert CLEANUP_DELAY_MS == 20 * 60 * 1000
+
+
+class FakeOutbox:
+    def __init__(self) -> None:
+        self.rows: list[dict] = []
+
+    async def add(self, routing_key, body, message_type, message_id, priority):
+        self.rows.append(
+            {
+                "id": len(self.rows) + 1,
+                "routing_key": routing_key,
+                "body": body,
+                "message_type": message_type,
+                "message_id": message_id,
+                "priority": priority,
+            }
+        )
+
+    async def fetch_batch(self, limit):
+        return self.rows[:limit]
+
+    async def delete(self, ids):
+        self.rows = [row for row in self.rows if row["id"] not in ids]
+
+
+def connected_client(publish, outbox=None) -> qr_queue.QRQueueClient:
+    client = qr_queue.QRQueueClient(outbox=outbox, publish_window=2)
+    client.channel = SimpleNamespace(
+        is_closed=False,
+        default_exchange=SimpleNamespace(publish=publish),
+    )
+    client.connect = AsyncMock()
+    return client
+
+
+def make_job(job_id: str = "job-id") -> QRJob:
+    return QRJob(
+        job_id=job_id,
+        chat_id=-100,
+        command_message_id=10,
+        processing_message_id=11,
+        amount=15_000,
+        tab_index=2,
+    )
+
+
+@pytest.mark.asyncio
+async def test_publishes_do_not_wait_for_previous_confirms():
+    confirms = asyncio.Event()
+    published = []
+
+    async def publish(message, routing_key, mandatory):
+        published.append(message.message_id)
+        await confirms.wait()
+
+    client = connected_client(publish)
+    tasks = [
+        asyncio.create_task(client.publish_job(make_job(job_id)))
+        for job_id in ("first", "second", "third")
+    ]
+    await asyncio.sleep(0)
+
+    assert published == ["first", "second"]
+    assert client.outstanding == 2
+
+    confirms.set()
+    await asyncio.gather(*tasks)
+    assert published == ["first", "second", "third"]
+    assert client.outstanding == 0
+
+
+@pytest.mark.asyncio
+async def test_job_is_kept_in_outbox_while_broker_is_down():
+    outbox = FakeOutbox()
+    publish = AsyncMock(side_effect=ConnectionError("broker is down"))
+    client = connected_client(publish, outbox)
+    job = make_job()
+    job.priority = qr_queue.PRIORITY_HIGH
+
+    await client.publish_job(job)
+
+    assert [row["body"] for row in outbox.rows] == [job.to_bytes()]
+
+    publish.side_effect = None
+    assert await client.flush_outbox() == 1
+    assert outbox.rows == []
+    message = publish.await_args.args[0]
+    assert message.body == job.to_bytes()
+    assert message.priority == qr_queue.PRIORITY_HIGH
+    assert publish.await_args.kwargs["routing_key"] == GENERATION_QUEUE
+
+
+@pytest.mark.asyncio
+async def test_publish_error_is_raised_without_outbox():
+    client = connected_client(AsyncMock(side_effect=ConnectionError("down")))
+
+    with pytest.raises(ConnectionError):
+        await client.publish_job(make_job())
+
+
+@pytest.mark.asyncio
+async def test_outbox_jobs_for_legacy_queue_go_to_priority_queue():
+    outbox = FakeOutbox()
+    await outbox.add(LEGACY_GENERATION_QUEUE, make_job().to_bytes(), "qr.generate", "job-id", 0)
+    publish = AsyncMock()
+    client = connected_client(publish, outbox)
+
+    assert await client.flush_outbox() == 1
+    assert publish.await_args.kwargs["routing_key"] == GENERATION_QUEUE
+
+
+@pytest.mark.asyncio
+async def test_rejected_publish_is_not_stored_in_outbox():
+    outbox = FakeOutbox()
+    client = connected_client(AsyncMock(side_effect=DeliveryError(None, Basic.Nack())), outbox)
+
+    with pytest.raises(DeliveryError):
+        await client.publish_job(make_job())
+
+    assert outbox.rows == []
+
+
+@pytest.mark.asyncio
+async def test_outbox_drops_rejected_rows_and_keeps_unsent():
+    outbox = FakeOutbox()
+    await outbox.add(GENERATION_QUEUE, make_job("rejected").to_bytes(), "qr.generate", "rejected", 0)
+    await outbox.add(GENERATION_QUEUE, make_job("timeout").to_bytes(), "qr.generate", "timeout", 0)
+
+    async def publish(message, routing_key, mandatory):
+        if message.message_id == "rejected":
+            raise DeliveryError(None, Basic.Nack())
+        raise asyncio.TimeoutError
+
+    client = connected_client(publish, outbox)
+
+    assert await client.flush_outbox() == 0
+    assert [row["message_id"] for row in outbox.rows] == ["timeout"]
@@ -6,6 +6,7 @@ from unittest.mock import AsyncMock, MagicMock, call
 import pytest
 
 import qr_worker
+from services.qr_cache import QRCache
 from services.qr_queue import QRCleanupTask, QRJob
 from utils.generate_qr import AuthenticationError, SiteUnavailableError
 
@@ -25,6 +26,13 @@ def incoming_message(body: bytes):
     )
 
 
+@pytest.fixture(autouse=True)
+def schedule_deletion(monkeypatch):
+    schedule = AsyncMock()
+    monkeypatch.setattr(qr_worker.ScheduledDeletionRepo, "schedule", schedule)
+    return schedule
+
+
 def make_job() -> QRJob:
     return QRJob(
         job_id="job-id",
@@ -49,8 +57,15 @@ async def test_worker_consumes_only_one_generation_at_a_time(monkeypatch):
         set_qos=AsyncMock(),
         declare_queue=AsyncMock(side_effect=[cleanup_queue, delay_queue]),
     )
+    legacy_queue = SimpleNamespace(name="qr.generate", consume=AsyncMock())
+    legacy_channel = SimpleNamespace(
+        set_qos=AsyncMock(),
+        declare_queue=AsyncMock(return_value=legacy_queue),
+    )
     connection = SimpleNamespace(
-        channel=AsyncMock(side_effect=[generation_channel, cleanup_channel])
+        channel=AsyncMock(
+            side_effect=[generation_channel, legacy_channel, cleanup_channel]
+        )
     )
     queue_client = SimpleNamespace(connection=connection)
     worker = qr_worker.QRWorker(AsyncMock(), queue_client)
@@ -66,6 +81,7 @@ async def test_worker_consumes_only_one_generation_at_a_time(monkeypatch):
         worker.process_job,
         no_ack=False,
     )
+    legacy_queue.consume.assert_awaited_once_with(worker.process_job, no_ack=False)
 
 
 @pytest.mark.asyncio
@@ -115,9 +131,12 @@ async def test_worker_stops_after_one_retry(monkeypatch):
 
 
 @pytest.mark.asyncio
-async def test_worker_edits_result_and_schedules_both_messages(monkeypatch):
+async def test_worker_edits_result_and_schedules_both_messages(
+    monkeypatch,
+    schedule_deletion,
+):
     bot = SimpleNamespace(edit_message_media=AsyncMock())
-    queue_client = SimpleNamespace(publish_cleanup=AsyncMock())
+    queue_client = SimpleNamespace()
     worker = qr_worker.QRWorker(bot, queue_client)
     monkeypatch.setattr(
         worker,
@@ -129,8 +148,10 @@ async def test_worker_edits_result_and_schedules_both_messages(monkeypatch):
     await worker.process_job(incoming_message(job.to_bytes()))
 
     bot.edit_message_media.assert_awaited_once()
-    queue_client.publish_cleanup.assert_awaited_once_with(
-        QRCleanupTask(chat_id=-100, message_ids=(10, 11))
+    schedule_deletion.assert_awaited_once_with(
+        -100,
+        (10, 11),
+        qr_worker.CLEANUP_DELAY_SECONDS,
     )
 
 
@@ -146,3 +167,371 @@ async def test_cleanup_deletes_all_messages():
         call(chat_id=-100, message_id=10),
         call(chat_id=-100, message_id=11),
     ]
+
+
+class FakeSession:
+    def __init__(self, *, alive: bool = True, error: Exception | None = None):
+        self.alive = alive
+        self.error = error
+        self.jobs_done = 0
+        self.closed = False
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return self.alive
+
+    def generate(self, amount, tab_index):
+        if self.error:
+            raise self.error
+        self.jobs_done += 1
+        return b"qr-image", f"{amount}:{tab_index}"
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_session_pool_reuses_warm_session():
+    sessions = []
+
+    def factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    pool = qr_worker.BrowserSessionPool(size=1, max_jobs=10, session_factory=factory)
+
+    assert await pool.generate(15_000, 2) == (b"qr-image", "15000:2")
+    assert await pool.generate(20_000, 3) == (b"qr-image", "20000:3")
+
+    assert len(sessions) == 1
+    assert sessions[0].jobs_done == 2
+
+
+@pytest.mark.asyncio
+async def test_session_pool_recycles_after_max_jobs():
+    sessions = []
+
+    def factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    pool = qr_worker.BrowserSessionPool(size=1, max_jobs=2, session_factory=factory)
+
+    for _ in range(3):
+        await pool.generate(15_000, 2)
+
+    assert len(sessions) == 2
+    assert sessions[0].closed is True
+    assert sessions[1].closed is False
+
+
+@pytest.mark.asyncio
+async def test_session_pool_discards_session_after_error():
+    broken = FakeSession(error=SiteUnavailableError("temporary"))
+    healthy = FakeSession()
+    pool = qr_worker.BrowserSessionPool(
+        size=1,
+        max_jobs=10,
+        session_factory=MagicMock(side_effect=[broken, healthy]),
+    )
+
+    with pytest.raises(SiteUnavailableError):
+        await pool.generate(15_000, 2)
+    assert await pool.generate(15_000, 2) == (b"qr-image", "15000:2")
+
+    assert broken.closed is True
+
+
+@pytest.mark.asyncio
+async def test_session_pool_replaces_dead_idle_session():
+    dead = FakeSession(alive=False)
+    healthy = FakeSession()
+    pool = qr_worker.BrowserSessionPool(
+        size=1,
+        max_jobs=10,
+        session_factory=MagicMock(return_value=healthy),
+    )
+    pool._idle.append(dead)
+
+    await pool.generate(15_000, 2)
+
+    assert dead.closed is True
+    assert healthy.jobs_done == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_generates_through_session_pool(monkeypatch):
+    generator = MagicMock()
+    monkeypatch.setattr(qr_worker, "generate_qr", generator)
+    session_pool = SimpleNamespace(
+        generate=AsyncMock(return_value=(b"qr-image", "QR data"))
+    )
+    worker = qr_worker.QRWorker(AsyncMock(), AsyncMock(), session_pool)
+
+    assert await worker.generate_with_retry(make_job()) == (b"qr-image", "QR data")
+
+    session_pool.generate.assert_awaited_once_with(15_000, 2)
+    generator.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_worker_prefetches_configured_concurrency(monkeypatch):
+    generation_queue = SimpleNamespace(consume=AsyncMock())
+    generation_channel = SimpleNamespace(
+        set_qos=AsyncMock(),
+        declare_queue=AsyncMock(return_value=generation_queue),
+    )
+    cleanup_channel = SimpleNamespace(
+        set_qos=AsyncMock(),
+        declare_queue=AsyncMock(
+            side_effect=[SimpleNamespace(consume=AsyncMock()), SimpleNamespace()]
+        ),
+    )
+    connection = SimpleNamespace(
+        channel=AsyncMock(side_effect=[generation_channel, cleanup_channel])
+    )
+    worker = qr_worker.QRWorker(
+        AsyncMock(),
+        SimpleNamespace(connection=connection),
+        concurrency=3,
+    )
+    monkeypatch.setattr(
+        qr_worker, "open_legacy_generation_queue", AsyncMock(return_value=None)
+    )
+    cancelled_future = asyncio.get_running_loop().create_future()
+    cancelled_future.cancel()
+    monkeypatch.setattr(qr_worker.asyncio, "Future", lambda: cancelled_future)
+
+    with pytest.raises(asyncio.CancelledError):
+        await worker.run()
+
+    generation_channel.set_qos.assert_awaited_once_with(prefetch_count=3)
+
+
+@pytest.mark.asyncio
+async def test_worker_serializes_jobs_on_same_tab():
+    active = 0
+    max_active = 0
+
+    async def generate(amount, tab_index):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0)
+        active -= 1
+        return b"qr-image", "QR data"
+
+    session_pool = SimpleNamespace(generate=generate)
+    worker = qr_worker.QRWorker(
+        AsyncMock(),
+        AsyncMock(),
+        session_pool,
+        concurrency=2,
+        serialize_tabs=True,
+    )
+
+    await asyncio.gather(
+        worker.generate_with_retry(make_job()),
+        worker.generate_with_retry(make_job()),
+    )
+
+    assert max_active == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_answers_from_cache_without_waiting_for_slot():
+    cache = QRCache(ttl=600)
+    cache.put(2, 15_000, b"cached-image", "cached data")
+    backend = SimpleNamespace(generate=AsyncMock())
+    bot = SimpleNamespace(edit_message_media=AsyncMock())
+    worker = qr_worker.QRWorker(bot, AsyncMock(), backend, cache=cache)
+    # Единственный слот занят долгой генерацией.
+    assert worker.progress.try_acquire()
+
+    await asyncio.wait_for(
+        worker.process_job(incoming_message(make_job().to_bytes())),
+        timeout=1,
+    )
+
+    bot.edit_message_media.assert_awaited_once()
+    backend.generate.assert_not_awaited()
+    assert worker.progress.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_refills_hot_amounts():
+    cache = QRCache(ttl=600, per_key=2)
+    cache.record_request(2, 15_000)
+    backend = SimpleNamespace(
+        generate=AsyncMock(return_value=(b"qr-image", "QR data"))
+    )
+    worker = qr_worker.QRWorker(AsyncMock(), AsyncMock(), backend, cache=cache)
+
+    assert await worker.refill_cache_once(hot_limit=5) == 2
+
+    assert backend.generate.await_args_list == [call(15_000, 2), call(15_000, 2)]
+    assert cache.missing(2, 15_000) == 0
+
+
+@pytest.mark.asyncio
+async def test_job_arriving_during_refill_takes_next_slot():
+    cache = QRCache(ttl=600, per_key=3)
+    cache.record_request(2, 15_000)
+    release = asyncio.Event()
+
+    async def generate(amount, tab_index):
+        await release.wait()
+        return b"qr-image", "QR data"
+
+    backend = SimpleNamespace(generate=generate)
+    worker = qr_worker.QRWorker(AsyncMock(), AsyncMock(), backend, cache=cache)
+    refill = asyncio.create_task(worker.refill_cache_once(hot_limit=5))
+    await asyncio.sleep(0)
+
+    turn = asyncio.create_task(worker.progress.wait_turn(make_job()))
+    await asyncio.sleep(0)
+    assert worker.progress.waiting == 1
+
+    release.set()
+    assert await refill == 1
+    await turn
+    assert worker.progress.running == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_refill_while_jobs_are_running():
+    cache = QRCache(ttl=600)
+    cache.record_request(2, 15_000)
+    backend = SimpleNamespace(generate=AsyncMock())
+    worker = qr_worker.QRWorker(AsyncMock(), AsyncMock(), backend, cache=cache)
+    worker.in_flight = 1
+
+    assert await worker.refill_cache_once(hot_limit=5) == 0
+    backend.generate.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_worker_records_stage_timings(monkeypatch):
+    bot = SimpleNamespace(edit_message_media=AsyncMock())
+    queue_client = SimpleNamespace()
+    worker = qr_worker.QRWorker(bot, queue_client)
+    monkeypatch.setattr(
+        worker,
+        "generate_with_retry",
+        AsyncMock(return_value=(b"qr-image", "QR data")),
+    )
+    job = make_job()
+    job.created_at = qr_worker.time.time() - 3
+
+    await worker.process_job(incoming_message(job.to_bytes()))
+
+    stages = worker.metrics.snapshot()["stages"]
+    assert stages["queue_wait"]["p50"] >= 3
+    assert stages["telegram_upload"]["count"] == 1
+    assert stages["total"]["p50"] >= stages["queue_wait"]["p50"]
+
+
+@pytest.mark.asyncio
+async def test_worker_shows_queue_position_to_waiting_jobs(monkeypatch):
+    bot = SimpleNamespace(
+        edit_message_text=AsyncMock(),
+        edit_message_media=AsyncMock(),
+    )
+    queue_client = SimpleNamespace()
+    worker = qr_worker.QRWorker(bot, queue_client)
+    release_generation = asyncio.Event()
+
+    async def generate(job):
+        await release_generation.wait()
+        return b"qr-image", "QR data"
+
+    monkeypatch.setattr(worker, "generate_with_retry", generate)
+    running = make_job()
+    waiting = make_job()
+    waiting.job_id = "waiting-job"
+    waiting.processing_message_id = 21
+    tasks = [
+        asyncio.create_task(worker.process_job(incoming_message(job.to_bytes())))
+        for job in (running, waiting)
+    ]
+    await asyncio.sleep(0)
+
+    await worker.report_progress_once()
+    await worker.report_progress_once()
+
+    bot.edit_message_text.assert_awaited_once()
+    progress = bot.edit_message_text.await_args.kwargs
+    assert progress["message_id"] == 21
+    assert "Перед вами: 1" in progress["text"]
+
+    release_generation.set()
+    await asyncio.gather(*tasks)
+    assert bot.edit_message_text.await_args.kwargs["text"] == qr_worker.STARTED_TEXT
+
+
+@pytest.mark.asyncio
+async def test_worker_coalesces_identical_requests(monkeypatch):
+    bot = SimpleNamespace(edit_message_media=AsyncMock())
+    queue_client = SimpleNamespace()
+    worker = qr_worker.QRWorker(bot, queue_client, coalesce_window=15)
+    release_generation = asyncio.Event()
+    generated = []
+
+    async def generate(job):
+        generated.append(job.job_id)
+        await release_generation.wait()
+        return b"qr-image", "QR data"
+
+    monkeypatch.setattr(worker, "generate_with_retry", generate)
+    first = make_job()
+    first.created_at = 1_000
+    duplicate = make_job()
+    duplicate.job_id = "duplicate-job"
+    duplicate.processing_message_id = 21
+    duplicate.created_at = 1_005
+    tasks = [
+        asyncio.create_task(worker.process_job(incoming_message(job.to_bytes())))
+        for job in (first, duplicate)
+    ]
+    await asyncio.sleep(0)
+    release_generation.set()
+    await asyncio.gather(*tasks)
+
+    assert generated == ["job-id"]
+    assert sorted(
+        edit.kwargs["message_id"] for edit in bot.edit_message_media.await_args_list
+    ) == [11, 21]
+    assert worker._leaders == {}
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_coalesce_outside_window(monkeypatch):
+    bot = SimpleNamespace(edit_message_text=AsyncMock())
+    queue_client = SimpleNamespace()
+    worker = qr_worker.QRWorker(bot, queue_client, coalesce_window=15)
+    release_generation = asyncio.Event()
+    generated = []
+
+    async def generate(job):
+        generated.append(job.job_id)
+        await release_generation.wait()
+        raise SiteUnavailableError("down")
+
+    monkeypatch.setattr(worker, "generate_with_retry", generate)
+    first = make_job()
+    first.created_at = 1_000
+    late = make_job()
+    late.job_id = "late-job"
+    late.created_at = 1_020
+    tasks = [
+        asyncio.create_task(worker.process_job(incoming_message(job.to_bytes())))
+        for job in (first, late)
+    ]
+    await asyncio.sleep(0)
+    release_generation.set()
+    await asyncio.gather(*tasks)
+
+    assert generated == ["job-id", "late-job"]
+    assert bot.edit_message_text.await_args.kwargs["text"] == "❌ Сайт агента недоступен"
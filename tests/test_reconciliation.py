@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from services.reconciliation import normalize_amount, reconcile
+
+
+T0 = datetime(2026, 1, 12, 10, 0)
+
+
+def file_op(amount, minutes: int = 0, tx: str = "tx") -> dict:
+    return {"transaction_id": tx, "amount": amount, "datetime": T0 + timedelta(minutes=minutes)}
+
+
+def db_op(amount, minutes: int = 0, operation_id: int = 1) -> dict:
+    return {"operation_id": operation_id, "amount": amount, "timestamp": T0 + timedelta(minutes=minutes)}
+
+
+def test_normalize_amount_unifies_float_decimal_and_string():
+    assert normalize_amount(1500.0) == normalize_amount(Decimal("1500.00"))
+    assert normalize_amount("1 500,5") == Decimal("1500.50")
+
+
+def test_reconcile_by_amount_counts_duplicates():
+    file_ops = [file_op(1500.0, tx="a"), file_op(1500.0, tx="b"), file_op(700.0, tx="c")]
+    db_ops = [db_op(Decimal("1500.00"), operation_id=1), db_op(Decimal("900.00"), operation_id=2)]
+
+    result = reconcile(file_ops, db_ops)
+
+    assert len(result.matched) == 1
+    assert {op["transaction_id"] for op in result.only_in_file} == {"b", "c"}
+    assert [op["operation_id"] for op in result.only_in_db] == [2]
+
+
+def test_reconcile_pairs_nearest_time_within_window():
+    file_ops = [file_op(1500.0, 0, "morning"), file_op(1500.0, 300, "evening")]
+    db_ops = [db_op(Decimal("1500"), 305, 1), db_op(Decimal("1500"), 3, 2)]
+
+    result = reconcile(file_ops, db_ops, window=timedelta(minutes=10))
+
+    pairs = {(f["transaction_id"], d["operation_id"]) for f, d in result.matched}
+    assert pairs == {("morning", 2), ("evening", 1)}
+    assert result.only_in_file == [] and result.only_in_db == []
+
+
+def test_reconcile_leaves_pairs_outside_window_unmatched():
+    aware = T0.replace(tzinfo=timezone(timedelta(hours=3)))
+    file_ops = [{"transaction_id": "a", "amount": 1500.0, "datetime": aware}]
+    db_ops = [db_op(Decimal("1500"), 120)]
+
+    result = reconcile(file_ops, db_ops, window=timedelta(minutes=15))
+
+    assert result.matched == []
+    assert len(result.only_in_file) == 1
+    assert len(result.only_in_db) == 1
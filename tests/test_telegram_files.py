@@ -0,0 +1,120 @@
+import errno
+import os
+
+import pytest
+import pytest_asyncio
+from aiogram import Bot
+from aiogram.client.telegram import SimpleFilesPathWrapper, TelegramAPIServer
+from aiohttp import web
+
+from services import telegram_files
+from services.bot_session import create_bot_session
+from services.telegram_files import save_telegram_file
+
+
+@pytest_asyncio.fixture
+async def fake_api(tmp_path):
+    """Фейковый Bot API: getFile отдаёт ``file_path``, /file/ - содержимое."""
+    server = {"file_path": "photos/file_1.jpg", "http_downloads": 0}
+
+    async def get_file(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "ok": True,
+                "result": {
+                    "file_id": "photo-1",
+                    "file_unique_id": "u1",
+                    "file_path": server["file_path"],
+                },
+            }
+        )
+
+    async def download(request: web.Request) -> web.Response:
+        server["http_downloads"] += 1
+        return web.Response(body=b"http-bytes")
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/getFile", get_file)
+    app.router.add_get("/file/bot{token}/{path:.+}", download)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    server["url"] = f"http://127.0.0.1:{port}"
+    yield server
+    await runner.cleanup()
+
+
+async def save(api: TelegramAPIServer, destination) -> None:
+    bot = Bot(token="42:TEST", session=create_bot_session(api=api))
+    try:
+        await save_telegram_file(bot, "photo-1", destination)
+    finally:
+        await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_local_mode_links_file_without_http(fake_api, tmp_path):
+    source = tmp_path / "server" / "photos" / "file_1.jpg"
+    source.parent.mkdir(parents=True)
+    source.write_bytes(b"local-bytes")
+    fake_api["file_path"] = str(source)
+    destination = tmp_path / "check.jpg"
+
+    await save(TelegramAPIServer.from_base(fake_api["url"], is_local=True), destination)
+
+    assert destination.read_bytes() == b"local-bytes"
+    assert os.path.samefile(source, destination)
+    assert fake_api["http_downloads"] == 0
+
+    # Тот же чек сохраняется повторно: сервер отдаёт прежний путь.
+    again = tmp_path / "check-again.jpg"
+    await save(TelegramAPIServer.from_base(fake_api["url"], is_local=True), again)
+    assert again.read_bytes() == b"local-bytes"
+    assert source.exists()
+
+
+@pytest.mark.asyncio
+async def test_local_mode_maps_server_directory(fake_api, tmp_path):
+    mounted = tmp_path / "mounted"
+    (mounted / "photos").mkdir(parents=True)
+    (mounted / "photos" / "file_1.jpg").write_bytes(b"local-bytes")
+    fake_api["file_path"] = "/var/lib/telegram-bot-api/photos/file_1.jpg"
+    api = TelegramAPIServer.from_base(
+        fake_api["url"],
+        is_local=True,
+        wrap_local_file=SimpleFilesPathWrapper("/var/lib/telegram-bot-api", mounted),
+    )
+    destination = tmp_path / "check.jpg"
+
+    await save(api, destination)
+
+    assert destination.read_bytes() == b"local-bytes"
+
+
+@pytest.mark.asyncio
+async def test_remote_server_downloads_over_http(fake_api, tmp_path):
+    destination = tmp_path / "check.jpg"
+
+    await save(TelegramAPIServer.from_base(fake_api["url"]), destination)
+
+    assert destination.read_bytes() == b"http-bytes"
+    assert fake_api["http_downloads"] == 1
+
+
+def test_place_local_file_copies_across_filesystems(monkeypatch, tmp_path):
+    source = tmp_path / "file_1.jpg"
+    source.write_bytes(b"local-bytes")
+    destination = tmp_path / "check.jpg"
+    destination.write_bytes(b"old")
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(telegram_files.os, "link", cross_device)
+    telegram_files.place_local_file(source, destination)
+
+    assert destination.read_bytes() == b"local-bytes"
+    assert source.exists()
+
@@ -1,6 +1,4 @@
 from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment
 from io import BytesIO
 from typing import List
 from database.repositories import ChatRepo, OperationRepo, BalanceRepo
@@ -58,9 +56,11 @@ async def export_to_excel(
         else:
             operations = await OperationRepo.get_operations()
 
+        commissions = await OperationRepo.get_commissions_by_balance(start_date, end_date)
+
         balance_data = []
         for balance in all_balances:
-            balance_commissions = await OperationRepo.get_commissions_operations(balance["id"], start_date, end_date)
+            balance_commissions = commissions.get(balance["id"], 0)
             balance_data.append(
                 {
                     "Контрагент": balance["name"] or "Не установлено",
@@ -399,6 +399,8 @@ async def export_comparison_report(
         only_in_file: List[dict],
         only_in_db: List[dict],
 ) -> BytesIO:
+    from openpyxl import Workbook
+    from openpyxl.styles import PatternFill, Font, Alignment
 
     wb = Workbook()
     ws = wb.active
@@ -438,12 +440,12 @@ async def export_comparison_report(
 
     if only_in_db:
         for op in only_in_db:
-            conteractor = await BalanceRepo.get_contractor_name(op['balance_id'])
+            # Название КА приходит из get_all_checks_by_date одним запросом.
             ws.append([
                 "БД (нет в файле)",
                 float(op['amount']),
                 op['timestamp'].strftime('%d.%m.%Y %H:%M:%S'),
-                f"{conteractor}",
+                f"{op['contractor']}",
                 op['username'],
                 f"{op['operation_id']}"
             ])
@@ -473,6 +475,9 @@ async def export_comparison_report(
 
 
 async def export_comparison_report_exl(only_in_file, only_in_db, matched_operations):
+    from openpyxl import Workbook
+    from openpyxl.styles import PatternFill
+
     wb = Workbook()
 
     # Удаляем дефолтный лист
@@ -1,22 +1,27 @@
+import asyncio
 import base64
 import logging
 import time
+from abc import ABC, abstractmethod
 
-import undetected_chromedriver as uc
+from typing import TYPE_CHECKING
 
-from selenium.common.exceptions import (
-    TimeoutException,
-    WebDriverException,
-)
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+import aiohttp
+from yarl import URL
 
 from config import settings
+from utils.timing import stage, timed_stage
+
+if TYPE_CHECKING:
+    import undetected_chromedriver as uc
+    from selenium.webdriver.support.ui import WebDriverWait
 
 
 logger = logging.getLogger(__name__)
 
+AUTH_SETTLE_SECONDS = 2
+PAGE_READY_TIMEOUT_SECONDS = 5
+
 
 class QRGeneratorError(Exception):
     """Базовая ошибка генерации QR."""
@@ -34,374 +39,455 @@ class QRGenerationError(QRGeneratorError):
     """Ошибка генерации QR."""
 
 
-
-def generate_qr(value: float, tab_index: int = 2) -> tuple[bytes, str]:
+def validate_tab_index(tab_index: int) -> None:
     if tab_index not in range(1, 7):
         raise QRGenerationError("Некорректный режим генерации QR")
 
-    driver = None
 
-    logger.info(
-        "Начало генерации QR. amount=%s",
-        value,
-    )
+@timed_stage("chrome_start")
+def start_browser() -> "uc.Chrome":
+    # Selenium грузится только при первом запуске браузера: HTTP-бэкенду и
+    # боту он не нужен, а импорт занимает заметную часть холодного старта.
+    import undetected_chromedriver as uc
+
+    logger.info("Запуск Chrome")
 
     try:
-        # 1. Запуск Chrome
+        options = uc.ChromeOptions()
+
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-software-rasterizer")
+        options.add_argument("--window-size=1920,1080")
+
+        driver = uc.Chrome(
+            options=options,
+            use_subprocess=True,
+            version_main=151,
+        )
 
-        logger.info("Запуск Chrome")
+        driver.set_page_load_timeout(60)
 
-        try:
-            options = uc.ChromeOptions()
-
-            options.add_argument("--headless=new")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--disable-software-rasterizer")
-            options.add_argument("--window-size=1920,1080")
-
-            driver = uc.Chrome(
-                options=options,
-                use_subprocess=True,
-                version_main=151,
-            )
+    except Exception as e:
+        logger.exception(
+            "Не удалось запустить Chrome"
+        )
 
-            driver.set_page_load_timeout(60)
+        raise SiteUnavailableError(
+            "Не удалось запустить браузер"
+        ) from e
 
-        except Exception as e:
-            logger.exception(
-                "Не удалось запустить Chrome"
-            )
+    logger.info("Chrome успешно запущен")
+    return driver
 
-            raise SiteUnavailableError(
-                "Не удалось запустить браузер"
-            ) from e
 
-        logger.info("Chrome успешно запущен")
+@timed_stage("auth")
+def authenticate(driver) -> None:
+    """Открывает AUTH_URL с Basic Auth и ждёт завершения авторизации."""
+    from selenium.common.exceptions import TimeoutException, WebDriverException
 
-        # Ожидание элементов страницы.
-        wait = WebDriverWait(driver, 20)
+    logger.info(
+        "Открытие страницы авторизации агента"
+    )
 
-        # 2. Открываем URL с Basic Auth
+    start_time = time.perf_counter()
 
-        logger.info(
-            "Открытие страницы авторизации агента"
+    try:
+        driver.get(settings.AUTH_URL)
+
+    except TimeoutException:
+        elapsed = time.perf_counter() - start_time
+
+        logger.warning(
+            "Timeout при загрузке AUTH_URL "
+            "через %.2f сек. "
+            "Продолжаем работу.",
+            elapsed,
         )
 
-        start_time = time.perf_counter()
+    except WebDriverException as e:
+        logger.exception(
+            "Ошибка при открытии AUTH_URL"
+        )
 
-        try:
-            driver.get(settings.AUTH_URL)
+        raise SiteUnavailableError(
+            "Сайт агента недоступен"
+        ) from e
 
-        except TimeoutException:
-            elapsed = time.perf_counter() - start_time
+    elapsed = time.perf_counter() - start_time
 
-            logger.warning(
-                "Timeout при загрузке AUTH_URL "
-                "через %.2f сек. "
-                "Продолжаем работу.",
-                elapsed,
-            )
+    logger.info(
+        "AUTH_URL обработан за %.2f сек.",
+        elapsed,
+    )
 
-        except WebDriverException as e:
-            logger.exception(
-                "Ошибка при открытии AUTH_URL"
-            )
+    logger.info(
+        "После AUTH_URL current_url=%s",
+        driver.current_url,
+    )
+
+    logger.info(
+        "Ожидание завершения авторизации"
+    )
+
+    time.sleep(AUTH_SETTLE_SECONDS)
 
-            raise SiteUnavailableError(
-                "Сайт агента недоступен"
-            ) from e
 
+@timed_stage("page_load")
+def open_agent_page(driver) -> None:
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    logger.info(
+        "Открытие рабочей страницы агента"
+    )
+
+    start_time = time.perf_counter()
+
+    try:
+        driver.get(settings.PAGE_URL)
+
+    except TimeoutException:
         elapsed = time.perf_counter() - start_time
 
-        logger.info(
-            "AUTH_URL обработан за %.2f сек.",
+        logger.warning(
+            "Timeout при загрузке PAGE_URL "
+            "через %.2f сек. "
+            "Проверяем, успела ли загрузиться страница.",
             elapsed,
         )
 
-        logger.info(
-            "После AUTH_URL current_url=%s",
-            driver.current_url,
+    except WebDriverException as e:
+        logger.exception(
+            "Ошибка при открытии PAGE_URL"
         )
 
-        logger.info(
-            "Ожидание завершения авторизации"
-        )
+        raise SiteUnavailableError(
+            "Не удалось открыть страницу агента"
+        ) from e
 
-        time.sleep(2)
+    elapsed = time.perf_counter() - start_time
 
-        # 3. Переходим на обычную страницу
+    logger.info(
+        "PAGE_URL обработан за %.2f сек.",
+        elapsed,
+    )
 
-        logger.info(
-            "Открытие рабочей страницы агента"
-        )
+    logger.info(
+        "current_url=%s",
+        driver.current_url,
+    )
 
-        start_time = time.perf_counter()
+    logger.info(
+        "title=%s",
+        driver.title,
+    )
 
-        try:
-            driver.get(settings.PAGE_URL)
 
-        except TimeoutException:
-            elapsed = time.perf_counter() - start_time
+def is_agent_page_ready(driver, timeout: float = PAGE_READY_TIMEOUT_SECONDS) -> bool:
+    """Проверяет, что открыта рабочая страница, а не форма входа."""
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
 
-            logger.warning(
-                "Timeout при загрузке PAGE_URL "
-                "через %.2f сек. "
-                "Проверяем, успела ли загрузиться страница.",
-                elapsed,
-            )
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.ID, "kassaTabs"))
+        )
+    except (TimeoutException, WebDriverException):
+        return False
+    return True
 
-        except WebDriverException as e:
-            logger.exception(
-                "Ошибка при открытии PAGE_URL"
-            )
 
-            raise SiteUnavailableError(
-                "Не удалось открыть страницу агента"
-            ) from e
+def create_qr(driver, value: float, tab_index: int) -> tuple[bytes, str]:
+    """Заполняет форму на открытой странице агента и забирает готовый QR."""
+    from selenium.webdriver.support.ui import WebDriverWait
 
-        elapsed = time.perf_counter() - start_time
+    # Ожидание элементов страницы.
+    wait = WebDriverWait(driver, 20)
 
-        logger.info(
-            "PAGE_URL обработан за %.2f сек.",
-            elapsed,
-        )
+    with stage("submit"):
+        _submit_form(driver, wait, value, tab_index)
 
-        logger.info(
-            "current_url=%s",
-            driver.current_url,
-        )
+    with stage("image_wait"):
+        return _read_qr(driver, wait)
 
-        logger.info(
-            "title=%s",
-            driver.title,
-        )
-        # 4. Выбор Р/С
-        try:
-            tab_button = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        f'//*[@id="kassaTabs"]/button[{tab_index}]',
-                    )
+
+def _submit_form(driver, wait: "WebDriverWait", value: float, tab_index: int) -> None:
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
+    # 1. Выбор Р/С
+    try:
+        tab_button = wait.until(
+            EC.element_to_be_clickable(
+                (
+                    By.XPATH,
+                    f'//*[@id="kassaTabs"]/button[{tab_index}]',
                 )
             )
-            tab_button.click()
+        )
+        tab_button.click()
 
-        except (TimeoutException, WebDriverException) as e:
-            raise QRGenerationError(
-                "Не удалось выбрать Р/С"
-            ) from e
+    except (TimeoutException, WebDriverException) as e:
+        raise QRGenerationError(
+            "Не удалось выбрать Р/С"
+        ) from e
 
-        logger.info(
-            "Р/С выбран. tab_index=%s",
-            tab_index,
-        )
+    logger.info(
+        "Р/С выбран. tab_index=%s",
+        tab_index,
+    )
 
-        # 5. Ввод суммы
-        try:
-            amount_input = wait.until(
-                EC.presence_of_element_located(
-                    (
-                        By.ID,
-                        "qr_amount",
-                    )
+    # 2. Ввод суммы
+    try:
+        amount_input = wait.until(
+            EC.presence_of_element_located(
+                (
+                    By.ID,
+                    "qr_amount",
                 )
             )
+        )
 
-            # Устанавливаем значение напрямую через JS.
-            driver.execute_script(
-                """
-                const input = arguments[0];
-                const value = arguments[1];
-
-                const setter = Object.getOwnPropertyDescriptor(
-                    HTMLInputElement.prototype,
-                    'value'
-                ).set;
-
-                setter.call(input, value);
-
-                input.dispatchEvent(
-                    new Event('input', {
-                        bubbles: true
-                    })
-                );
-
-                input.dispatchEvent(
-                    new Event('change', {
-                        bubbles: true
-                    })
-                );
-
-                input.dispatchEvent(
-                    new Event('blur', {
-                        bubbles: true
-                    })
-                );
-                """,
-                amount_input,
-                str(value),
-            )
+        # Устанавливаем значение напрямую через JS.
+        driver.execute_script(
+            """
+            const input = arguments[0];
+            const value = arguments[1];
+
+            const setter = Object.getOwnPropertyDescriptor(
+                HTMLInputElement.prototype,
+                'value'
+            ).set;
+
+            setter.call(input, value);
+
+            input.dispatchEvent(
+                new Event('input', {
+                    bubbles: true
+                })
+            );
+
+            input.dispatchEvent(
+                new Event('change', {
+                    bubbles: true
+                })
+            );
+
+            input.dispatchEvent(
+                new Event('blur', {
+                    bubbles: true
+                })
+            );
+            """,
+            amount_input,
+            str(value),
+        )
 
-        except WebDriverException as e:
-            raise QRGenerationError(
-                "Не удалось ввести сумму"
-            ) from e
+    except WebDriverException as e:
+        raise QRGenerationError(
+            "Не удалось ввести сумму"
+        ) from e
 
-        logger.info(
-            "Сумма успешно введена"
-        )
+    logger.info(
+        "Сумма успешно введена"
+    )
 
-        # 6. Нажимаем кнопку создания QR
+    # 3. Нажимаем кнопку создания QR
 
-        try:
-            create_btn = wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        '//*[@id="qrSubmit"]'
-                    )
+    try:
+        create_btn = wait.until(
+            EC.element_to_be_clickable(
+                (
+                    By.XPATH,
+                    '//*[@id="qrSubmit"]'
                 )
             )
+        )
 
-            create_btn.click()
+        create_btn.click()
 
-        except TimeoutException as e:
-            raise QRGenerationError(
-                "Не удалось нажать кнопку создания QR"
-            ) from e
+    except TimeoutException as e:
+        raise QRGenerationError(
+            "Не удалось нажать кнопку создания QR"
+        ) from e
 
-        except WebDriverException as e:
-            raise QRGenerationError(
-                "Не удалось нажать кнопку создания QR"
-            ) from e
+    except WebDriverException as e:
+        raise QRGenerationError(
+            "Не удалось нажать кнопку создания QR"
+        ) from e
 
-        logger.info(
-            "Кнопка создания QR нажата"
-        )
+    logger.info(
+        "Кнопка создания QR нажата"
+    )
 
-        # 7. Ожидаем готовый QR
 
-        logger.info(
-            "Ожидание генерации QR"
+def _read_qr(driver, wait: "WebDriverWait") -> tuple[bytes, str]:
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
+    # 4. Ожидаем готовый QR
+
+    logger.info(
+        "Ожидание генерации QR"
+    )
+
+    try:
+        wait.until(
+            lambda d: (
+                d.find_element(
+                    By.XPATH,
+                    '//*[@id="qrImage"]'
+                )
+                .get_attribute("src") or ""
+            ).startswith("data:image/")
         )
 
-        try:
-            wait.until(
-                lambda d: (
-                    d.find_element(
-                        By.XPATH,
-                        '//*[@id="qrImage"]'
-                    )
-                    .get_attribute("src") or ""
-                ).startswith("data:image/")
-            )
+    except TimeoutException as e:
+        raise QRGenerationError(
+            "Агент не сгенерировал QR"
+        ) from e
 
-        except TimeoutException as e:
-            raise QRGenerationError(
-                "Агент не сгенерировал QR"
-            ) from e
+    except WebDriverException as e:
+        raise QRGenerationError(
+            "Агент не сгенерировал QR"
+        ) from e
 
-        except WebDriverException as e:
-            raise QRGenerationError(
-                "Агент не сгенерировал QR"
-            ) from e
+    logger.info(
+        "QR успешно сгенерирован"
+    )
 
-        logger.info(
-            "QR успешно сгенерирован"
+    # 5. Получаем изображение QR
+
+    try:
+        qr_image = driver.find_element(
+            By.XPATH,
+            '//*[@id="qrImage"]'
         )
 
-        # 8. Получаем изображение QR
+        src = qr_image.get_attribute("src")
 
-        try:
-            qr_image = driver.find_element(
-                By.XPATH,
-                '//*[@id="qrImage"]'
-            )
+    except WebDriverException as e:
+        raise QRGenerationError(
+            "Не удалось получить изображение QR"
+        ) from e
 
-            src = qr_image.get_attribute("src")
+    image_data = decode_qr_image(src)
 
-        except WebDriverException as e:
-            raise QRGenerationError(
-                "Не удалось получить изображение QR"
-            ) from e
+    logger.info(
+        "Изображение QR получено."
+    )
 
-        if not src:
-            raise QRGenerationError(
-                "Агент не сгенерировал QR"
-            )
+    # 6. Получаем данные для подписи
 
-        if not src.startswith("data:image/"):
-            raise QRGenerationError(
-                "Агент вернул некорректное изображение QR"
+    try:
+        data_field = wait.until(
+            EC.presence_of_element_located(
+                (
+                    By.XPATH,
+                    '//*[ @ id = "qrUrlField"]'
+                )
             )
+        )
 
-        if "," not in src:
-            raise QRGenerationError(
-                "Агент вернул некорректное изображение QR"
-            )
+        data = data_field.get_attribute(
+            "value"
+        )
 
-        # 9. Base64 -> bytes
+    except TimeoutException as e:
+        raise QRGenerationError(
+            "QR создан, но данные не получены"
+        ) from e
 
-        try:
-            _, base64_data = src.split(",", 1)
+    except WebDriverException as e:
+        raise QRGenerationError(
+            "QR создан, но данные не получены"
+        ) from e
 
-            image_data = base64.b64decode(
-                base64_data,
-            )
+    if not data:
+        raise QRGenerationError(
+            "QR создан, но данные пустые"
+        )
 
-        except Exception as e:
-            raise QRGenerationError(
-                "Не удалось получить изображение QR"
-            ) from e
+    logger.info(
+        "QR полностью сформирован"
+    )
 
-        if not image_data:
-            raise QRGenerationError(
-                "Изображение QR пустое"
-            )
+    return image_data, data
 
-        logger.info(
-            "Изображение QR получено."
+
+def decode_qr_image(src: str | None) -> bytes:
+    """Base64 data URL из ``#qrImage`` -> bytes."""
+    if not src:
+        raise QRGenerationError(
+            "Агент не сгенерировал QR"
         )
 
-        # 10. Получаем данные для подписи
+    if not src.startswith("data:image/"):
+        raise QRGenerationError(
+            "Агент вернул некорректное изображение QR"
+        )
 
-        try:
-            data_field = wait.until(
-                EC.presence_of_element_located(
-                    (
-                        By.XPATH,
-                        '//*[ @ id = "qrUrlField"]'
-                    )
-                )
-            )
+    if "," not in src:
+        raise QRGenerationError(
+            "Агент вернул некорректное изображение QR"
+        )
 
-            data = data_field.get_attribute(
-                "value"
-            )
+    try:
+        _, base64_data = src.split(",", 1)
 
-        except TimeoutException as e:
-            raise QRGenerationError(
-                "QR создан, но данные не получены"
-            ) from e
+        image_data = base64.b64decode(
+            base64_data,
+        )
 
-        except WebDriverException as e:
-            raise QRGenerationError(
-                "QR создан, но данные не получены"
-            ) from e
+    except Exception as e:
+        raise QRGenerationError(
+            "Не удалось получить изображение QR"
+        ) from e
 
-        if not data:
-            raise QRGenerationError(
-                "QR создан, но данные пустые"
-            )
+    if not image_data:
+        raise QRGenerationError(
+            "Изображение QR пустое"
+        )
 
-        logger.info(
-            "QR полностью сформирован"
+    return image_data
+
+
+def quit_browser(driver) -> None:
+    logger.info(
+        "Закрытие Chrome"
+    )
+
+    try:
+        driver.quit()
+
+    except Exception:
+        logger.exception(
+            "Ошибка при закрытии Chrome"
         )
 
-        return image_data, data
+
+def generate_qr(value: float, tab_index: int = 2) -> tuple[bytes, str]:
+    """Одноразовая генерация: свой Chrome на каждый QR."""
+    validate_tab_index(tab_index)
+
+    driver = None
+
+    logger.info(
+        "Начало генерации QR. amount=%s",
+        value,
+    )
+
+    try:
+        driver = start_browser()
+        authenticate(driver)
+        open_agent_page(driver)
+        return create_qr(driver, value, tab_index)
 
     # ошибки
 
@@ -432,19 +518,241 @@ def generate_qr(value: float, tab_index: int = 2) -> tuple[bytes, str]:
 
     finally:
         if driver:
-            logger.info(
-                "Закрытие Chrome"
-            )
+            quit_browser(driver)
 
-            try:
-                driver.quit()
+        logger.info(
+            "Завершение generate_qr. amount=%s",
+            value,
+        )
 
-            except Exception:
-                logger.exception(
-                    "Ошибка при закрытии Chrome"
-                )
+
+class BrowserSession:
+    """Авторизованный Chrome, который переиспользуется между заданиями.
+
+    Методы блокирующие: вызывать из отдельного потока и не более чем из
+    одного потока одновременно.
+    """
+
+    def __init__(self) -> None:
+        self.driver = None
+        self.jobs_done = 0
+
+    @property
+    def is_started(self) -> bool:
+        return self.driver is not None
+
+    def start(self) -> None:
+        self.driver = start_browser()
+        try:
+            authenticate(self.driver)
+            open_agent_page(self.driver)
+        except Exception:
+            self.close()
+            raise
+
+    def is_alive(self) -> bool:
+        if self.driver is None:
+            return True
+        try:
+            self.driver.current_url
+        except Exception:
+            return False
+        return True
+
+    def generate(self, value: float, tab_index: int = 2) -> tuple[bytes, str]:
+        validate_tab_index(tab_index)
 
         logger.info(
-            "Завершение generate_qr. amount=%s",
+            "Генерация QR в тёплой сессии. amount=%s jobs_done=%s",
             value,
+            self.jobs_done,
         )
+
+        try:
+            if self.driver is None:
+                self.start()
+            else:
+                # Перезагрузка сбрасывает форму и старый #qrImage.
+                open_agent_page(self.driver)
+
+            if not is_agent_page_ready(self.driver):
+                logger.info("Сессия агента истекла, повторная авторизация")
+                authenticate(self.driver)
+                open_agent_page(self.driver)
+                if not is_agent_page_ready(self.driver):
+                    raise AuthenticationError(
+                        "Агент не пустил после авторизации"
+                    )
+
+            result = create_qr(self.driver, value, tab_index)
+
+        except QRGeneratorError:
+            logger.exception(
+                "Ошибка при генерации QR. amount=%s",
+                value,
+            )
+            raise
+
+        except Exception as e:
+            logger.exception(
+                "Непредвиденная ошибка при генерации QR. amount=%s",
+                value,
+            )
+
+            raise QRGenerationError(
+                "Произошла ошибка при генерации QR"
+            ) from e
+
+        self.jobs_done += 1
+        return result
+
+    def close(self) -> None:
+        if self.driver is not None:
+            quit_browser(self.driver)
+            self.driver = None
+
+
+class QRBackend(ABC):
+    """Способ получить QR у агента: ``generate`` -> (PNG, данные для подписи)."""
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, value: float, tab_index: int = 2) -> tuple[bytes, str]:
+        """Возвращает PNG с QR и данные для подписи на сумму ``value``."""
+
+    async def close(self) -> None:
+        pass
+
+
+class SeleniumBackend(QRBackend):
+    """Одноразовый Chrome на каждый QR (``generate_qr`` в отдельном потоке)."""
+
+    name = "selenium"
+
+    async def generate(self, value: float, tab_index: int = 2) -> tuple[bytes, str]:
+        return await asyncio.to_thread(generate_qr, value, tab_index)
+
+
+class HTTPBackend(QRBackend):
+    """Повторяет запросы страницы агента напрямую, без браузера.
+
+    Авторизация - Basic Auth из ``AUTH_URL`` и cookie сессии. Форма
+    ``#qr_amount``/``#qrSubmit`` отправляется POST-ом на ``api_url``
+    с полями ``amount`` и ``tab``; агент отвечает JSON с data URL
+    картинки в ``image`` и строкой оплаты в ``url``.
+    """
+
+    name = "http"
+
+    def __init__(self, auth_url: str, api_url: str, timeout: float = 15) -> None:
+        auth = URL(auth_url)
+        self.auth_url = auth.with_user(None)
+        self.api_url = URL(api_url)
+        self.basic_auth = (
+            aiohttp.BasicAuth(auth.user, auth.password or "")
+            if auth.user
+            else None
+        )
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: aiohttp.ClientSession | None = None
+        self._authenticated = False
+        self._auth_lock = asyncio.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+            self._authenticated = False
+        return self._session
+
+    async def authenticate(self) -> None:
+        async with self._auth_lock:
+            if self._authenticated:
+                return
+            session = self._get_session()
+            try:
+                with stage("auth"):
+                    response = await session.get(self.auth_url, auth=self.basic_auth)
+                async with response:
+                    if response.status in (401, 403):
+                        raise AuthenticationError("Агент отклонил логин/пароль")
+                    if response.status >= 400:
+                        raise SiteUnavailableError(
+                            f"Сайт агента ответил {response.status}"
+                        )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise SiteUnavailableError("Сайт агента недоступен") from e
+            self._authenticated = True
+
+    async def generate(self, value: float, tab_index: int = 2) -> tuple[bytes, str]:
+        validate_tab_index(tab_index)
+
+        for attempt in range(2):
+            await self.authenticate()
+            try:
+                with stage("submit"):
+                    response = await self._get_session().post(
+                        self.api_url,
+                        data={"amount": str(value), "tab": str(tab_index)},
+                        auth=self.basic_auth,
+                    )
+                async with response:
+                    if response.status in (401, 403) and attempt == 0:
+                        logger.info("HTTP-сессия агента истекла, повторная авторизация")
+                        self._authenticated = False
+                        continue
+                    if response.status in (401, 403):
+                        raise AuthenticationError("Агент не пустил после авторизации")
+                    if response.status >= 500:
+                        raise SiteUnavailableError(
+                            f"Сайт агента ответил {response.status}"
+                        )
+                    if response.status >= 400:
+                        raise QRGenerationError("Агент не сгенерировал QR")
+                    payload = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise SiteUnavailableError("Сайт агента недоступен") from e
+            except ValueError as e:
+                raise QRGenerationError("Агент вернул некорректный ответ") from e
+            break
+
+        if not isinstance(payload, dict):
+            raise QRGenerationError("Агент вернул некорректный ответ")
+
+        image_data = decode_qr_image(payload.get("image"))
+        data = payload.get("url")
+        if not data:
+            raise QRGenerationError("QR создан, но данные пустые")
+        return image_data, data
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class FallbackBackend(QRBackend):
+    """Пробует основной backend, при его ошибке - запасной."""
+
+    def __init__(self, primary: QRBackend, fallback: QRBackend) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    async def generate(self, value: float, tab_index: int = 2) -> tuple[bytes, str]:
+        try:
+            return await self.primary.generate(value, tab_index)
+        except Exception:
+            logger.warning(
+                "QR backend %s не справился, используем %s",
+                self.primary.name,
+                self.fallback.name,
+                exc_info=True,
+            )
+        return await self.fallback.generate(value, tab_index)
+
+    async def close(self) -> None:
+        await self.primary.close()
+        await self.fallback.close()
@@ -0,0 +1,52 @@
+import asyncio
+from dataclasses import dataclass, field
+
+from aiogram.types import Message
+
+
+# Больше 10 элементов Telegram в альбом не собирает.
+MAX_MEDIA_GROUP_SIZE = 10
+
+
+@dataclass(slots=True)
+class _PendingGroup:
+    messages: list[Message] = field(default_factory=list)
+    updated: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class MediaGroupAggregator:
+    """Собирает сообщения одного альбома (``media_group_id``) в список.
+
+    Первый обработчик альбома ждёт, пока придут остальные элементы: до
+    ``MAX_MEDIA_GROUP_SIZE`` штук или пока новых нет ``idle_timeout`` секунд,
+    и получает весь альбом по порядку. Остальные обработчики получают
+    ``None`` - их сообщения уже у первого. Сообщение не из альбома
+    возвращается сразу.
+    """
+
+    def __init__(self, idle_timeout: float = 0.5) -> None:
+        self.idle_timeout = idle_timeout
+        self._groups: dict[tuple[int, str], _PendingGroup] = {}
+
+    async def collect(self, message: Message) -> list[Message] | None:
+        if message.media_group_id is None:
+            return [message]
+
+        key = (message.chat.id, message.media_group_id)
+        group = self._groups.get(key)
+        if group is not None:
+            group.messages.append(message)
+            group.updated.set()
+            return None
+
+        group = self._groups[key] = _PendingGroup([message])
+        try:
+            while len(group.messages) < MAX_MEDIA_GROUP_SIZE:
+                group.updated.clear()
+                try:
+                    await asyncio.wait_for(group.updated.wait(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            del self._groups[key]
+        return sorted(group.messages, key=lambda item: item.message_id)
@@ -0,0 +1,108 @@
+"""Упаковка длинных HTML-отчётов в минимум сообщений Telegram."""
+import re
+from typing import Iterable
+
+
+MESSAGE_LIMIT = 4096
+
+_TOKEN_RE = re.compile(r"<[^>]*>|&#?\w+;|\n|[^<&\n]+|[<&]")
+_TAG_RE = re.compile(r"<\s*(/)?\s*([\w-]+)")
+
+
+def _closing(stack: list[tuple[str, str]]) -> str:
+    return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+
+def split_html(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Режет одну HTML-запись длиннее ``limit`` на части.
+
+    Разрез проходит между тегами и сущностями (``&amp;`` и т.п.), строки по
+    возможности не рвутся. Теги, открытые на месте разреза, закрываются в
+    конце части и открываются заново в начале следующей.
+    """
+    parts = []
+    stack: list[tuple[str, str]] = []
+    current = start = ""
+
+    def flush() -> None:
+        nonlocal current, start
+        if current != start:
+            parts.append(current + _closing(stack))
+        current = start = "".join(tag for _, tag in stack)
+
+    def room() -> int:
+        return limit - len(current) - len(_closing(stack))
+
+    for token in _TOKEN_RE.findall(text):
+        tag = _TAG_RE.match(token)
+        if tag and tag.group(1):
+            name = tag.group(2).lower()
+            current += token
+            for index in range(len(stack) - 1, -1, -1):
+                if stack[index][0] == name:
+                    del stack[index]
+                    break
+            continue
+
+        if tag:
+            name = tag.group(2).lower()
+            if len(token) + len(f"</{name}>") > room():
+                flush()
+                if len(token) + len(f"</{name}>") > room():
+                    raise ValueError("Лимит сообщения меньше вложенных тегов записи")
+            current += token
+            stack.append((name, token))
+            continue
+
+        if token == "\n" or token.startswith("&"):
+            if len(token) > room():
+                flush()
+            current += token
+            continue
+
+        while len(token) > room():
+            if current != start and len(token) <= limit - len(start) - len(_closing(stack)):
+                # Строка целиком влезет в следующую часть - не рвём её.
+                flush()
+                continue
+            cut = token.rfind(" ", 0, room())
+            cut = cut + 1 if cut > 0 else room()
+            if cut <= 0:
+                raise ValueError("Лимит сообщения меньше вложенных тегов записи")
+            current += token[:cut]
+            token = token[cut:]
+            flush()
+        current += token
+
+    if current != start:
+        parts.append(current + _closing(stack))
+    return parts
+
+
+def pack_messages(
+    entries: Iterable[str],
+    limit: int = MESSAGE_LIMIT,
+    separator: str = "\n\n",
+) -> list[str]:
+    """Жадно собирает записи в сообщения не длиннее ``limit``.
+
+    Каждая запись - законченный HTML-фрагмент; записи не делятся между
+    сообщениями, кроме тех, что сами длиннее лимита (см. ``split_html``).
+    """
+    messages = []
+    current = None
+
+    for entry in entries:
+        pieces = [entry] if len(entry) <= limit else split_html(entry, limit)
+        for piece in pieces:
+            if current is None:
+                current = piece
+            elif len(current) + len(separator) + len(piece) <= limit:
+                current += separator + piece
+            else:
+                messages.append(current)
+                current = piece
+
+    if current is not None:
+        messages.append(current)
+    return messages
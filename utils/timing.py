@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, TypeVar
+
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    """Длительность этапов одной операции в секундах."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def format(self) -> str:
+        return " ".join(
+            f"{name}={seconds:.2f}" for name, seconds in self.stages.items()
+        )
+
+
+_current_timings: ContextVar[StageTimings | None] = ContextVar(
+    "current_timings",
+    default=None,
+)
+
+
+def start_timings() -> StageTimings:
+    """Создаёт замер для текущей задачи.
+
+    ``asyncio.to_thread`` копирует контекст, поэтому ``stage`` работает и в
+    блокирующем коде, запущенном из этой задачи.
+    """
+    timings = StageTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def current_timings() -> StageTimings | None:
+    return _current_timings.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.measure(name):
+        yield
+
+
+def timed_stage(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Декоратор: весь вызов функции пишется в этап ``name``."""
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator